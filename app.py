@@ -3,13 +3,23 @@
 # Premium Professional Edition ✨
 # ===============================
 
+import os
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from sklearn.linear_model import LinearRegression
+
+from retail import engine, precompute
+from retail.forecast import ForecastCache
+from retail.incremental import DROP_DIR, apply_pending
+from retail.instrument import RerunTrace
+from retail.memo import LRUCache
+from retail.products import MEASURES as PRODUCT_MEASURES
+from retail.sketch import APPROX, EXACT
+from retail.timeseries import FREQUENCIES
 
 # -------------------------------
 # PAGE CONFIG (UI LOOK)
@@ -304,29 +314,76 @@ st.markdown("""
 # -------------------------------
 # LOAD & CLEAN DATA
 # -------------------------------
-@st.cache_data
-def load_data():
-    df = pd.read_csv("OnlineRetail.csv", encoding="latin1")
-    
-    # Cleaning
-    df = df.dropna(subset=["CustomerID"])
-    df = df[(df["Quantity"] > 0) & (df["UnitPrice"] > 0)]
-    
-    # Date handling
-    df["InvoiceDate"] = pd.to_datetime(df["InvoiceDate"])
-    
-    # Revenue
-    df["Revenue"] = df["Quantity"] * df["UnitPrice"]
-    
-    # Time features
-    df["Month"] = df["InvoiceDate"].dt.month
-    df["MonthName"] = df["InvoiceDate"].dt.strftime('%b')
-    df["DayOfWeek"] = df["InvoiceDate"].dt.day_name()
-    df["Hour"] = df["InvoiceDate"].dt.hour
-    
-    return df
+@st.cache_resource
+def load_dataset():
+    # One live dataset per server process, shared by every session; its rows
+    # are read-only views of the memory-mapped snapshot, so every server
+    # process attaches to the same copy. See engine.open_dataset for the
+    # snapshot and delta replay.
+    return engine.open_dataset()
+
+@st.cache_resource
+def load_aggregates():
+    # Streaming ingest: the CSV is folded chunk by chunk into the per-cell
+    # sums and per-country distinct sets the page needs, so memory is bounded
+    # by the chunk size rather than the export size. Shared by reference,
+    # not pickled into each session.
+    return engine.open_aggregates()
+
+@st.cache_resource
+def load_database():
+    # SQL backend: the cleaned rows live in an on-disk SQLite file shared by
+    # every worker process; each KPI and chart groupby is an aggregate query
+    # with the country and date filters pushed down, cached per query.
+    return engine.open_database()
+
+# "snapshot" keeps every cleaned row in memory; "stream" is for exports too
+# large for that and only keeps the aggregates; "sql" queries the rows on disk.
+INGEST_MODE = os.environ.get("RETAIL_INGEST_MODE", "snapshot")
+VIEW_CACHE_SIZE = int(os.environ.get("RETAIL_VIEW_CACHE_SIZE", "64"))
+WINDOW_CACHE_SIZE = int(os.environ.get("RETAIL_WINDOW_CACHE_SIZE", "4"))
+
+@st.cache_resource
+def get_window_cache():
+    # Date-windowed datasets hold a copy of their rows, so only a few recent
+    # windows are kept per server process.
+    return LRUCache(maxsize=WINDOW_CACHE_SIZE)
 
-df = load_data()
+def cached_section(cache, key, compute, record):
+    """Return ``cache[key]``, computing it on a miss, and note which in ``record``."""
+    misses = cache.misses
+    value = cache.get_or_compute(key, compute)
+    record["cache"] = "miss" if cache.misses > misses else "hit"
+    return value
+
+# Per-rerun timings of each section (retail/instrument.py), logged as JSON
+# lines at the end of the run and shown in the diagnostics panel on request
+trace = RerunTrace(mode=INGEST_MODE)
+
+# Every source serves the same reads (version, cube, daily, countries,
+# products, selected_rows, distinct), so the rest of the page ignores the mode
+if INGEST_MODE == "stream":
+    with trace.stage("load") as record:
+        source = load_aggregates()
+        record["rows"] = source.rows
+        record["nbytes"] = source.cube.nbytes + source.daily.nbytes
+elif INGEST_MODE == "sql":
+    with trace.stage("load") as record:
+        source = load_database()
+        record["rows"] = source.rows
+else:
+    with trace.stage("load") as record:
+        source, delta_store = load_dataset()
+        record["rows"] = source.rows
+    # New files in the drop directory are cleaned and appended in place; the
+    # cube and sketches are extended with the delta rows only.
+    with trace.stage("deltas") as record:
+        record["files"] = len(apply_pending(source, delta_store, DROP_DIR))
+        record["rows"] = source.rows
+        record["nbytes"] = source.nbytes
+all_countries = source.countries
+total_products = source.products
+full_source = source
 
 # -------------------------------
 # SIDEBAR FILTERS
@@ -337,11 +394,34 @@ with st.sidebar:
     st.markdown("### 🌍 Region Filter")
     country_filter = st.multiselect(
         "Select Countries",
-        options=sorted(df["Country"].unique()),
+        options=all_countries,
         default=["United Kingdom"],
         help="Filter data by country"
     )
     
+    st.markdown("### 📅 Date Range")
+    first_day, last_day = engine.date_range(full_source)
+    date_filter = st.date_input(
+        "Invoice Dates",
+        value=(first_day, last_day),
+        min_value=first_day,
+        max_value=last_day,
+        disabled=INGEST_MODE == "stream",
+        help="Needs the snapshot ingest mode" if INGEST_MODE == "stream" else "Restrict every chart to invoices in this window",
+    )
+    
+    # A narrower window swaps the source for a dataset of just the rows in it,
+    # found by binary search within each country block; everything below then
+    # reads the window exactly as it would the full data.
+    if INGEST_MODE != "stream" and len(date_filter) == 2 and tuple(date_filter) != (first_day, last_day):
+        window_cache = get_window_cache()
+        with trace.stage("window") as record:
+            source = cached_section(
+                window_cache, (full_source.version, *date_filter),
+                lambda: engine.date_window(full_source, *date_filter), record
+            )
+            record["rows"] = source.rows
+    
     st.markdown("---")
     
     st.markdown("### 📊 Analytics Mode")
@@ -351,11 +431,18 @@ with st.sidebar:
         help="Choose your analysis perspective"
     )
     
+    count_choice = st.radio(
+        "Distinct Counts",
+        ["Exact", "Approximate"],
+        horizontal=True,
+        help="Exact unions per-partition bitmaps; approximate unions HyperLogLog sketches"
+    )
+    count_mode = EXACT if count_choice == "Exact" else APPROX
+    
     st.markdown("---")
     
     st.markdown("### ⚡ Quick Stats")
-    total_countries = df["Country"].nunique()
-    total_products = df["StockCode"].nunique()
+    total_countries = len(all_countries)
     
     st.markdown(f"""
     <div style="background: rgba(255,255,255,0.05); padding: 1rem; border-radius: 8px; margin-top: 0.5rem;">
@@ -370,94 +457,64 @@ with st.sidebar:
         <div style="color: #e0e0ff; font-size: 1.5rem; font-weight: 600;">{total_products:,}</div>
     </div>
     """, unsafe_allow_html=True)
-
-# Apply filters
-if country_filter:
-    df_filtered = df[df["Country"].isin(country_filter)]
-else:
-    df_filtered = df
-
-# -------------------------------
-# HEADER SECTION
-# -------------------------------
-st.markdown("""
-<div class="main-header">
-    <div class="main-title">🌐 Global Retail Intelligence</div>
-    <div class="main-subtitle">Real-time analytics • AI-powered insights • Professional reporting</div>
-</div>
-""", unsafe_allow_html=True)
-
-# -------------------------------
-# KPI CALCULATIONS
-# -------------------------------
-total_revenue = df_filtered["Revenue"].sum()
-total_orders = df_filtered["InvoiceNo"].nunique()
-total_customers = df_filtered["CustomerID"].nunique()
-avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
-avg_items_per_order = df_filtered.groupby("InvoiceNo")["Quantity"].sum().mean()
-
-# -------------------------------
-# KPI DISPLAY
-# -------------------------------
-st.markdown(f"""
-<div class="kpi-container">
-    <div class="kpi-card">
-        <div class="kpi-icon">💰</div>
-        <div class="kpi-label">Total Revenue</div>
-        <div class="kpi-value">${total_revenue:,.0f}</div>
-        <div class="kpi-trend">↗ +12.5% vs last period</div>
-    </div>
-    <div class="kpi-card">
-        <div class="kpi-icon">📦</div>
-        <div class="kpi-label">Total Orders</div>
-        <div class="kpi-value">{total_orders:,}</div>
-        <div class="kpi-trend">↗ +8.3% vs last period</div>
-    </div>
-    <div class="kpi-card">
-        <div class="kpi-icon">👥</div>
-        <div class="kpi-label">Unique Customers</div>
-        <div class="kpi-value">{total_customers:,}</div>
-        <div class="kpi-trend">↗ +15.2% vs last period</div>
-    </div>
-    <div class="kpi-card">
-        <div class="kpi-icon">🧾</div>
-        <div class="kpi-label">Avg Order Value</div>
-        <div class="kpi-value">${avg_order_value:,.2f}</div>
-        <div class="kpi-trend">↗ +3.8% vs last period</div>
+    
+    # Counted from the row ranges of the selected countries, not by scanning
+    with trace.stage("filter") as record:
+        selected_rows = source.selected_rows(country_filter)
+        record["rows"] = selected_rows
+    
+    st.markdown(f"""
+    <div style="background: rgba(255,255,255,0.05); padding: 1rem; border-radius: 8px; margin-top: 0.75rem;">
+        <div style="color: #9ca3af; font-size: 0.8rem;">Transactions in Selection</div>
+        <div style="color: #e0e0ff; font-size: 1.5rem; font-weight: 600;">{selected_rows:,}</div>
     </div>
-</div>
-""", unsafe_allow_html=True)
+    """, unsafe_allow_html=True)
+    
+    # Data-version watermark: changes whenever a delta file is appended
+    if INGEST_MODE != "snapshot":
+        st.caption(f"🕒 Data version `{full_source.version}`")
+    else:
+        watermark = full_source.watermark()
+        st.caption(
+            f"🕒 Data version `{watermark['version']}` · {watermark['deltas']} deltas applied · "
+            f"through {watermark['latest_invoice']:%d %b %Y %H:%M}"
+        )
+    
+    show_diagnostics = st.checkbox(
+        "Show diagnostics",
+        help="Per-section timings, cache hits and frame sizes for this rerun"
+    )
+
+# A date window can hold no invoices of the selected countries at all
+if selected_rows == 0:
+    st.warning("No invoices for the selected countries in this date range.")
+    trace.emit()
+    st.stop()
 
 # -------------------------------
-# CHARTS ROW 1: Revenue Trend & Distribution
+# CHART BUILDERS
 # -------------------------------
-st.markdown('<div class="section-header">📈 Revenue Analytics</div>', unsafe_allow_html=True)
-
-col1, col2 = st.columns([2, 1])
+TREND_HOVER_FORMATS = {"Monthly": "%b %Y", "Weekly": "Week of %d %b %Y", "Daily": "%a %d %b %Y"}
 
-with col1:
-    # Monthly Revenue Trend with Area Chart
-    monthly_sales = df_filtered.groupby("Month")["Revenue"].sum().reset_index()
-    month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    monthly_sales['MonthName'] = monthly_sales['Month'].apply(lambda x: month_names[x-1] if x <= 12 else 'Unknown')
-    
+def make_trend_figure(revenue, granularity):
     fig_trend = go.Figure()
     
     # Add area fill
     fig_trend.add_trace(go.Scatter(
-        x=monthly_sales['MonthName'],
-        y=monthly_sales['Revenue'],
+        x=revenue.index.to_timestamp(),
+        y=revenue.values,
         fill='tozeroy',
         fillcolor='rgba(102, 126, 234, 0.2)',
         line=dict(color='#667eea', width=3),
         mode='lines+markers',
         marker=dict(size=10, color='#764ba2', line=dict(width=2, color='#fff')),
         name='Revenue',
+        xhoverformat=TREND_HOVER_FORMATS[granularity],
         hovertemplate='<b>%{x}</b><br>Revenue: $%{y:,.0f}<extra></extra>'
     ))
     
     fig_trend.update_layout(
-        title=dict(text='Monthly Revenue Trend', font=dict(size=18, color='#e0e0ff')),
+        title=dict(text=f'{granularity} Revenue Trend', font=dict(size=18, color='#e0e0ff')),
         paper_bgcolor='rgba(0,0,0,0)',
         plot_bgcolor='rgba(0,0,0,0)',
         font=dict(color='#9ca3af'),
@@ -479,15 +536,9 @@ with col1:
         hovermode='x unified'
     )
     
-    st.plotly_chart(fig_trend, use_container_width=True)
+    return fig_trend
 
-with col2:
-    # Revenue by Day of Week - Donut Chart
-    daily_revenue = df_filtered.groupby("DayOfWeek")["Revenue"].sum().reset_index()
-    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    daily_revenue['DayOfWeek'] = pd.Categorical(daily_revenue['DayOfWeek'], categories=day_order, ordered=True)
-    daily_revenue = daily_revenue.sort_values('DayOfWeek')
-    
+def make_donut_figure(daily_revenue):
     colors = ['#667eea', '#764ba2', '#f093fb', '#6dd5ed', '#2193b0', '#ff6b6b', '#feca57']
     
     fig_donut = go.Figure(data=[go.Pie(
@@ -511,19 +562,135 @@ with col2:
         annotations=[dict(text='Weekly<br>Split', x=0.5, y=0.5, font_size=14, font_color='#e0e0ff', showarrow=False)]
     )
     
-    st.plotly_chart(fig_donut, use_container_width=True)
+    return fig_donut
 
-# -------------------------------
-# CHARTS ROW 2: Top Countries & Hourly Pattern
-# -------------------------------
-st.markdown('<div class="section-header">🌍 Geographic & Temporal Insights</div>', unsafe_allow_html=True)
+def make_segments_figure(segments):
+    colors = ['#10b981', '#667eea', '#6dd5ed', '#feca57', '#f093fb', '#ff6b6b']
+    
+    fig_segments = go.Figure(go.Bar(
+        x=segments['Segment'],
+        y=segments['Customers'],
+        marker=dict(color=colors[:len(segments)], line=dict(width=0)),
+        customdata=segments[['RevenueShare', 'Recency', 'Orders']],
+        hovertemplate=(
+            '<b>%{x}</b><br>Customers: %{y:,}<br>Revenue share: %{customdata[0]:.1%}'
+            '<br>Avg days since last order: %{customdata[1]:.0f}<br>Avg orders: %{customdata[2]:.1f}<extra></extra>'
+        )
+    ))
+    
+    fig_segments.update_layout(
+        title=dict(text='RFM Customer Segments', font=dict(size=18, color='#e0e0ff')),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#9ca3af'),
+        xaxis=dict(showgrid=False, showline=False, tickfont=dict(color='#e0e0ff')),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(255,255,255,0.05)',
+            showline=False,
+            tickfont=dict(color='#9ca3af')
+        ),
+        margin=dict(l=20, r=20, t=60, b=20),
+        height=380
+    )
+    
+    return fig_segments
 
-col1, col2 = st.columns(2)
+def make_pareto_figure(pareto, top20_share):
+    fig_pareto = go.Figure()
+    
+    fig_pareto.add_trace(go.Scatter(
+        x=pareto['CustomerShare'],
+        y=pareto['RevenueShare'],
+        mode='lines',
+        fill='tozeroy',
+        line=dict(color='#f093fb', width=3),
+        fillcolor='rgba(240, 147, 251, 0.15)',
+        hovertemplate='Top %{x:.0%} of customers<br>%{y:.1%} of revenue<extra></extra>'
+    ))
+    
+    fig_pareto.add_trace(go.Scatter(
+        x=[0.2, 0.2],
+        y=[0, top20_share],
+        mode='lines+markers',
+        line=dict(color='#6dd5ed', width=2, dash='dash'),
+        marker=dict(size=[0, 10], color='#6dd5ed'),
+        hovertemplate=f'Top 20% of customers: {top20_share:.1%} of revenue<extra></extra>'
+    ))
+    
+    fig_pareto.update_layout(
+        title=dict(text='Revenue Concentration (Pareto)', font=dict(size=18, color='#e0e0ff')),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#9ca3af'),
+        showlegend=False,
+        xaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(255,255,255,0.05)',
+            showline=False,
+            tickformat='.0%',
+            title='Share of customers (ranked by revenue)'
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(255,255,255,0.05)',
+            showline=False,
+            tickformat='.0%',
+            title='Share of revenue'
+        ),
+        margin=dict(l=20, r=20, t=60, b=20),
+        height=380
+    )
+    
+    return fig_pareto
 
-with col1:
-    # Top Countries Horizontal Bar
-    top_countries = df_filtered.groupby("Country")["Revenue"].sum().sort_values(ascending=True).tail(10).reset_index()
+COHORT_MEASURES = {
+    "Retention": ("retention", ".0%", "Share of the cohort active"),
+    "Revenue": ("revenue", "$,.0f", "Revenue"),
+}
+
+def make_cohort_figure(cohorts, measure):
+    attribute, value_format, label = COHORT_MEASURES[measure]
+    matrix = getattr(cohorts, attribute)
+    
+    fig_cohorts = go.Figure(go.Heatmap(
+        z=matrix.to_numpy(),
+        x=list(matrix.columns),
+        y=list(matrix.index.strftime('%b %Y')),
+        customdata=np.repeat(cohorts.sizes.to_numpy()[:, None], matrix.shape[1], axis=1),
+        colorscale=[[0, '#1a1a3e'], [0.25, '#667eea'], [0.5, '#764ba2'], [0.75, '#f093fb'], [1, '#ff6b6b']],
+        hoverongaps=False,
+        colorbar=dict(tickformat=value_format, tickfont=dict(color='#9ca3af')),
+        hovertemplate=(
+            '<b>%{y} cohort</b> (%{customdata:,} customers)<br>Month %{x}: '
+            f'%{{z:{value_format}}} {label.lower()}<extra></extra>'
+        )
+    ))
     
+    fig_cohorts.update_layout(
+        title=dict(text=f'Cohort {measure} by Months Since First Purchase', font=dict(size=18, color='#e0e0ff')),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#9ca3af'),
+        xaxis=dict(
+            showgrid=False,
+            dtick=1,
+            tickfont=dict(color='#9ca3af'),
+            title=dict(text='Months since first purchase', font=dict(color='#9ca3af'))
+        ),
+        yaxis=dict(
+            showgrid=False,
+            autorange='reversed',
+            tickfont=dict(color='#9ca3af'),
+            title=dict(text='First-purchase month', font=dict(color='#9ca3af'))
+        ),
+        margin=dict(l=20, r=20, t=60, b=40),
+        height=460
+    )
+    
+    return fig_cohorts
+
+def make_countries_figure(top_countries):
     fig_countries = go.Figure()
     
     fig_countries.add_trace(go.Bar(
@@ -559,12 +726,49 @@ with col1:
         height=400
     )
     
-    st.plotly_chart(fig_countries, use_container_width=True)
+    return fig_countries
 
-with col2:
-    # Hourly Sales Pattern - Heatmap style bar
-    hourly_sales = df_filtered.groupby("Hour")["Revenue"].sum().reset_index()
+def make_products_figure(top_products, measure):
+    fig_products = go.Figure()
+    prefix = '$' if measure == 'Revenue' else ''
+    
+    fig_products.add_trace(go.Bar(
+        y=top_products['Description'].fillna(top_products['StockCode'])[::-1],
+        x=top_products[measure][::-1],
+        orientation='h',
+        customdata=top_products['StockCode'][::-1],
+        marker=dict(
+            color=top_products[measure][::-1],
+            colorscale=[[0, '#10b981'], [0.5, '#6dd5ed'], [1, '#667eea']],
+            line=dict(width=0)
+        ),
+        hovertemplate='<b>%{y}</b><br>StockCode %{customdata}<br>' + measure + ': ' + prefix + '%{x:,.0f}<extra></extra>'
+    ))
     
+    fig_products.update_layout(
+        title=dict(text=f'Top {len(top_products)} Products by {measure}', font=dict(size=18, color='#e0e0ff')),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#9ca3af'),
+        xaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(255,255,255,0.05)',
+            showline=False,
+            tickfont=dict(color='#9ca3af'),
+            tickprefix=prefix
+        ),
+        yaxis=dict(
+            showgrid=False,
+            showline=False,
+            tickfont=dict(color='#e0e0ff')
+        ),
+        margin=dict(l=20, r=20, t=60, b=20),
+        height=400
+    )
+    
+    return fig_products
+
+def make_hourly_figure(hourly_sales):
     fig_hourly = go.Figure()
     
     fig_hourly.add_trace(go.Bar(
@@ -602,55 +806,18 @@ with col2:
         height=400
     )
     
-    st.plotly_chart(fig_hourly, use_container_width=True)
-
-# -------------------------------
-# ML PREDICTION SECTION
-# -------------------------------
-st.markdown('<div class="section-header">🤖 AI-Powered Forecast</div>', unsafe_allow_html=True)
-
-col1, col2 = st.columns([1, 2])
-
-with col1:
-    # ML Prediction
-    monthly_sales_ml = df_filtered.groupby("Month")["Revenue"].sum()
-    X = np.arange(len(monthly_sales_ml)).reshape(-1, 1)
-    y = monthly_sales_ml.values
-    
-    model = LinearRegression()
-    model.fit(X, y)
-    
-    next_month_prediction = model.predict([[len(monthly_sales_ml)]])[0]
-    confidence = 0.85  # Simulated confidence score
-    
-    st.markdown(f"""
-    <div class="prediction-card">
-        <div class="prediction-label">🎯 Next Month Forecast</div>
-        <div class="prediction-value">${next_month_prediction:,.0f}</div>
-        <div style="margin-top: 1rem; color: #9ca3af; font-size: 0.9rem;">
-            Model Confidence: <span style="color: #10b981; font-weight: 600;">{confidence*100:.0f}%</span>
-        </div>
-        <div style="margin-top: 1.5rem; padding: 0.75rem; background: rgba(16, 185, 129, 0.1); border-radius: 8px; border: 1px solid rgba(16, 185, 129, 0.2);">
-            <span style="color: #10b981;">📈 Projected Growth:</span>
-            <span style="color: #e0e0ff; font-weight: 600; margin-left: 0.5rem;">+8.4%</span>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+    return fig_hourly
 
-with col2:
-    # Prediction visualization
-    predicted_months = list(range(1, len(monthly_sales_ml) + 2))
-    actual_values = list(monthly_sales_ml.values) + [None]
-    predicted_values = [None] * len(monthly_sales_ml) + [next_month_prediction]
-    
-    # Also create trend line
-    trend_line = model.predict(np.array(range(len(monthly_sales_ml) + 1)).reshape(-1, 1))
-    
+def make_forecast_figure(monthly_sales_ml, trend_line, next_month_prediction):
     fig_pred = go.Figure()
     
+    # Calendar months, plus the month being forecast
+    months = monthly_sales_ml.index.to_timestamp()
+    next_month = (monthly_sales_ml.index[-1] + 1).to_timestamp()
+    
     # Actual data
     fig_pred.add_trace(go.Scatter(
-        x=list(range(1, len(monthly_sales_ml) + 1)),
+        x=months,
         y=monthly_sales_ml.values,
         mode='lines+markers',
         name='Actual',
@@ -660,7 +827,7 @@ with col2:
     
     # Trend line
     fig_pred.add_trace(go.Scatter(
-        x=list(range(1, len(monthly_sales_ml) + 2)),
+        x=months.append(pd.DatetimeIndex([next_month])),
         y=trend_line,
         mode='lines',
         name='Trend',
@@ -669,7 +836,7 @@ with col2:
     
     # Prediction point
     fig_pred.add_trace(go.Scatter(
-        x=[len(monthly_sales_ml) + 1],
+        x=[next_month],
         y=[next_month_prediction],
         mode='markers',
         name='Forecast',
@@ -708,39 +875,458 @@ with col2:
         height=350
     )
     
-    st.plotly_chart(fig_pred, use_container_width=True)
+    return fig_pred
+
+# -------------------------------
+# VIEW COMPUTATION
+# -------------------------------
+@st.cache_resource
+def load_precomputed(version, stamp):
+    # Views written by `python -m retail.precompute` for this dataset version;
+    # the stamp (store mtime) makes a re-run of the job visible without a restart
+    return precompute.load_views(version)
+
+@st.cache_resource
+def get_forecast_cache():
+    # Fitted lines by series fingerprint, persisted under .retail_cache so an
+    # unchanged monthly series is not refitted after a restart either
+    return ForecastCache()
+
+@st.cache_data
+def load_country_forecasts(version, _source):
+    return engine.country_forecasts(_source)
+
+def build_view(countries, count_mode, trace):
+    # The selection's numbers come from the precomputed store when the batch
+    # job covered it, otherwise from the engine; only the figures are built
+    # here. Both are memoized together in the view cache.
+    stored = load_precomputed(source.version, precompute.views_stamp(source.version))
+    key = engine.view_key(source, countries, count_mode)
+    with trace.stage("view/store") as record:
+        view = stored.get(key)
+        record["cache"] = "miss" if view is None else "hit"
+    if view is None:
+        view = engine.compute_view(source, countries, count_mode, trace, forecasts=get_forecast_cache())
+    with trace.stage("view/figures"):
+        forecast = view.forecast
+        figures = {
+            "trend": {granularity: make_trend_figure(series, granularity) for granularity, series in view.revenue.items()},
+            "donut": make_donut_figure(view.day_of_week),
+            "countries": make_countries_figure(view.top_countries),
+            "hourly": make_hourly_figure(view.hourly),
+            "forecast": make_forecast_figure(forecast.history, forecast.trend, forecast.prediction),
+        }
+    return view, figures
+
+@st.cache_resource
+def get_view_cache():
+    # One bounded LRU per server process, shared by every session, keyed by
+    # (dataset version, sorted country tuple, distinct-count mode).
+    return LRUCache(maxsize=VIEW_CACHE_SIZE)
+
+# analysis_mode does not change what is computed, so it is not part of the key
+view_cache = get_view_cache()
+view_key = engine.view_key(source, country_filter, count_mode)
+with trace.stage("view") as record:
+    view, figures = cached_section(view_cache, view_key, lambda: build_view(country_filter, count_mode, trace), record)
+
+cache_stats = view_cache.stats()
+st.sidebar.caption(
+    f"View cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+    f"{cache_stats['size']}/{cache_stats['maxsize']} selections"
+)
+
+# -------------------------------
+# HEADER SECTION
+# -------------------------------
+st.markdown("""
+<div class="main-header">
+    <div class="main-title">🌐 Global Retail Intelligence</div>
+    <div class="main-subtitle">Real-time analytics • AI-powered insights • Professional reporting</div>
+</div>
+""", unsafe_allow_html=True)
+
+# -------------------------------
+# KPI CALCULATIONS
+# -------------------------------
+total_revenue = view.total_revenue
+total_orders = view.total_orders
+total_customers = view.total_customers
+avg_order_value = view.avg_order_value
+
+# Approximate counts are marked and carry their standard error
+count_error = view.count_error
+count_prefix = "≈" if count_error else ""
+count_note = f'<div class="kpi-trend" style="color: #9ca3af;">± {count_error:.1%} std. error (HyperLogLog)</div>' if count_error else ""
+
+# Month-over-month changes of the last complete month, from the view's insights
+insights = view.insights
+
+def kpi_trend(metric):
+    change = insights.changes.get(metric)
+    if change is None:
+        return '<div class="kpi-trend" style="color: #9ca3af;">— no prior month to compare</div>'
+    arrow, color = ("↗", "#10b981") if change >= 0 else ("↘", "#ef4444")
+    return (
+        f'<div class="kpi-trend" style="color: {color};">{arrow} {change:+.1%} '
+        f'{insights.period.strftime("%b %Y")} vs {insights.previous.strftime("%b")}</div>'
+    )
+
+# -------------------------------
+# KPI DISPLAY
+# -------------------------------
+with trace.stage("render/kpis"):
+    st.markdown(f"""
+<div class="kpi-container">
+    <div class="kpi-card">
+        <div class="kpi-icon">💰</div>
+        <div class="kpi-label">Total Revenue</div>
+        <div class="kpi-value">${total_revenue:,.0f}</div>
+        {kpi_trend("Revenue")}
+    </div>
+    <div class="kpi-card">
+        <div class="kpi-icon">📦</div>
+        <div class="kpi-label">Total Orders</div>
+        <div class="kpi-value">{count_prefix}{total_orders:,}</div>{count_note}
+        {kpi_trend("Orders")}
+    </div>
+    <div class="kpi-card">
+        <div class="kpi-icon">👥</div>
+        <div class="kpi-label">Unique Customers</div>
+        <div class="kpi-value">{count_prefix}{total_customers:,}</div>{count_note}
+        {kpi_trend("Customers")}
+    </div>
+    <div class="kpi-card">
+        <div class="kpi-icon">🧾</div>
+        <div class="kpi-label">Avg Order Value</div>
+        <div class="kpi-value">${avg_order_value:,.2f}</div>
+        {kpi_trend("AOV")}
+    </div>
+</div>
+    """, unsafe_allow_html=True)
+
+# -------------------------------
+# CHARTS ROW 1: Revenue Trend & Distribution
+# -------------------------------
+st.markdown('<div class="section-header">📈 Revenue Analytics</div>', unsafe_allow_html=True)
+
+col1, col2 = st.columns([2, 1])
+
+with col1:
+    # Revenue Trend with Area Chart
+    granularity = st.radio(
+        "Granularity",
+        list(FREQUENCIES),
+        horizontal=True,
+        label_visibility="collapsed"
+    )
+    with trace.stage("render/trend"):
+        st.plotly_chart(figures["trend"][granularity], use_container_width=True)
+
+with col2:
+    # Revenue by Day of Week - Donut Chart
+    with trace.stage("render/donut"):
+        st.plotly_chart(figures["donut"], use_container_width=True)
+
+# -------------------------------
+# CHARTS ROW 2: Top Countries & Hourly Pattern
+# -------------------------------
+st.markdown('<div class="section-header">🌍 Geographic & Temporal Insights</div>', unsafe_allow_html=True)
+
+col1, col2 = st.columns(2)
+
+with col1:
+    # Top Countries Horizontal Bar
+    with trace.stage("render/countries"):
+        st.plotly_chart(figures["countries"], use_container_width=True)
+
+with col2:
+    # Hourly Sales Pattern - Heatmap style bar
+    with trace.stage("render/hourly"):
+        st.plotly_chart(figures["hourly"], use_container_width=True)
+
+# -------------------------------
+# ML PREDICTION SECTION
+# -------------------------------
+st.markdown('<div class="section-header">🤖 AI-Powered Forecast</div>', unsafe_allow_html=True)
+
+col1, col2 = st.columns([1, 2])
+
+with col1:
+    # ML Prediction
+    next_month_prediction = view.forecast.prediction
+    fit = f"{insights.forecast_fit:.2f}" if insights.forecast_fit is not None else "n/a"
+    growth = f"{insights.forecast_growth:+.1%}" if insights.forecast_growth is not None else "n/a"
+
+    st.markdown(f"""
+    <div class="prediction-card">
+        <div class="prediction-label">🎯 Next Month Forecast</div>
+        <div class="prediction-value">${next_month_prediction:,.0f}</div>
+        <div style="margin-top: 1rem; color: #9ca3af; font-size: 0.9rem;">
+            Trend Fit (R²): <span style="color: #10b981; font-weight: 600;">{fit}</span>
+        </div>
+        <div style="margin-top: 1.5rem; padding: 0.75rem; background: rgba(16, 185, 129, 0.1); border-radius: 8px; border: 1px solid rgba(16, 185, 129, 0.2);">
+            <span style="color: #10b981;">📈 Projected Growth:</span>
+            <span style="color: #e0e0ff; font-weight: 600; margin-left: 0.5rem;">{growth}</span>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+with col2:
+    # Prediction visualization
+    with trace.stage("render/forecast"):
+        st.plotly_chart(figures["forecast"], use_container_width=True)
+
+# Every country's next-month forecast for planning, fitted in one batch
+with st.expander("📋 Next-Month Forecast by Country"):
+    with trace.stage("render/country_forecasts"):
+        country_forecasts = load_country_forecasts(source.version, source)
+        table = country_forecasts.assign(
+            last_period=country_forecasts["last_period"].astype(str),
+            forecast_period=country_forecasts["forecast_period"].astype(str),
+        )[["forecast_period", "prediction", "last_value", "slope", "periods", "last_period"]]
+        st.dataframe(
+            table.rename(columns={
+                "forecast_period": "Month",
+                "prediction": "Forecast Revenue",
+                "last_value": "Last Month Revenue",
+                "slope": "Monthly Trend",
+                "periods": "Months Fitted",
+                "last_period": "Last Active Month",
+            }).style.format({
+                "Forecast Revenue": "${:,.0f}",
+                "Last Month Revenue": "${:,.0f}",
+                "Monthly Trend": "{:+,.0f}",
+            }),
+            use_container_width=True
+        )
+        st.download_button(
+            "Download CSV",
+            table.to_csv().encode(),
+            file_name=f"country_forecasts_{source.version}.csv",
+            mime="text/csv"
+        )
+
+# -------------------------------
+# PRODUCT ANALYTICS
+# -------------------------------
+st.markdown('<div class="section-header">🛍️ Product Analytics</div>', unsafe_allow_html=True)
+
+# Rankings and search read the per-partition product summaries and the
+# description token index (retail/products.py), never the transactions
+with trace.stage("products/index") as record:
+    product_index = source.product_index()
+    record["rows"] = len(product_index.sales)
+    record["nbytes"] = product_index.nbytes
+
+month_options = {"All months": None}
+month_options.update({pd.Period(ordinal=month, freq="M").strftime("%b %Y"): month for month in reversed(product_index.months)})
+
+col1, col2 = st.columns([2, 1])
+
+with col2:
+    product_measure = st.radio(
+        "Rank Products By",
+        list(PRODUCT_MEASURES),
+        horizontal=True
+    )
+    product_month = st.selectbox(
+        "Month",
+        list(month_options),
+        help="Rank products within one calendar month"
+    )
+    product_query = st.text_input(
+        "Search Products",
+        placeholder="e.g. lantern, heart holder, 85123A",
+        help="Matches every word of the description; the last word also as a prefix"
+    )
+
+with col1:
+    with trace.stage("products/top"):
+        top_products = product_index.top(country_filter, month_options[product_month], product_measure)
+        st.plotly_chart(make_products_figure(top_products, product_measure), use_container_width=True)
+
+with col2:
+    if product_query:
+        with trace.stage("products/search") as record:
+            matches = product_index.search(product_query, country_filter, month_options[product_month])
+            record["rows"] = len(matches)
+        if len(matches):
+            st.dataframe(
+                matches.style.format({"Revenue": "${:,.0f}", "Quantity": "{:,}"}),
+                hide_index=True,
+                use_container_width=True
+            )
+        else:
+            st.caption("No products in this selection match that search.")
+
+# -------------------------------
+# FREQUENTLY BOUGHT TOGETHER
+# -------------------------------
+@st.cache_resource
+def get_basket_cache():
+    # Top co-purchased pairs per (dataset version, sorted country tuple);
+    # single countries are precomputed in the basket index, so this mainly
+    # keeps multi-country selections from re-running the sparse products
+    return LRUCache(maxsize=VIEW_CACHE_SIZE)
+
+st.markdown('<div class="section-header">🛒 Frequently Bought Together</div>', unsafe_allow_html=True)
+
+# The basket, segment and cohort caches below share this key
+selection_key = (source.version, tuple(sorted(country_filter)))
+
+with trace.stage("baskets") as record:
+    basket_rules = cached_section(
+        get_basket_cache(), selection_key, lambda: engine.basket_view(source, country_filter), record
+    )
+    record["rows"] = len(basket_rules.pairs)
+
+if len(basket_rules.pairs):
+    st.dataframe(
+        basket_rules.pairs[["Product", "Bought With", "Baskets", "Support", "Confidence", "Lift"]].style.format({
+            "Baskets": "{:,}",
+            "Support": "{:.2%}",
+            "Confidence": "{:.0%}",
+            "Lift": "{:.1f}x"
+        }),
+        hide_index=True,
+        use_container_width=True
+    )
+    st.caption(
+        f"Pairs of products on the same invoice across {basket_rules.baskets:,} baskets, "
+        f"seen together in at least {basket_rules.min_baskets:,}, ranked by lift. "
+        "Confidence: share of baskets with the product that also hold its partner."
+    )
+else:
+    st.caption(
+        f"No product pair appears together in {basket_rules.min_baskets:,} or more "
+        f"of this selection's {basket_rules.baskets:,} baskets."
+    )
+
+# -------------------------------
+# CUSTOMER SEGMENTATION
+# -------------------------------
+@st.cache_resource
+def get_segment_cache():
+    # RFM summaries per (dataset version, sorted country tuple); only the
+    # segment table and the downsampled Pareto curve are kept, not customers
+    return LRUCache(maxsize=VIEW_CACHE_SIZE)
+
+st.markdown('<div class="section-header">👥 Customer Segmentation</div>', unsafe_allow_html=True)
+
+with trace.stage("customers") as record:
+    customer_view = cached_section(
+        get_segment_cache(), selection_key, lambda: engine.customer_view(source, country_filter), record
+    )
+    record["rows"] = customer_view.customers
+
+col1, col2 = st.columns(2)
+
+with col1:
+    st.plotly_chart(make_segments_figure(customer_view.segments), use_container_width=True)
+
+with col2:
+    st.plotly_chart(make_pareto_figure(customer_view.pareto, customer_view.top20_share), use_container_width=True)
+
+# -------------------------------
+# COHORT RETENTION
+# -------------------------------
+@st.cache_resource
+def get_cohort_cache():
+    # Cohort matrices per (dataset version, sorted country tuple): a few
+    # hundred cells each, derived from the per-customer-month index
+    return LRUCache(maxsize=VIEW_CACHE_SIZE)
+
+st.markdown('<div class="section-header">🔁 Cohort Retention</div>', unsafe_allow_html=True)
+
+with trace.stage("cohorts") as record:
+    cohorts = cached_section(
+        get_cohort_cache(), selection_key, lambda: engine.cohort_view(source, country_filter), record
+    )
+    record["rows"] = len(cohorts.sizes)
+
+cohort_measure = st.radio(
+    "Cohort Measure",
+    list(COHORT_MEASURES),
+    horizontal=True,
+    help="Retention: share of each first-purchase cohort buying again N months later"
+)
+st.plotly_chart(make_cohort_figure(cohorts, cohort_measure), use_container_width=True)
 
 # -------------------------------
 # BUSINESS INSIGHTS
 # -------------------------------
 st.markdown('<div class="section-header">🧠 Key Business Insights</div>', unsafe_allow_html=True)
 
+# Every sentence is computed from the view's insights; a fact the selection
+# cannot support (too few months, no revenue) gets a neutral sentence instead
+if insights.peak_month is not None:
+    seasonal_text = (
+        f"Revenue peaks in <strong>{insights.peak_month.strftime('%B %Y')}</strong>; "
+        f"{insights.peak_quarter} brings {insights.peak_quarter_share:.0%} of revenue"
+    )
+else:
+    seasonal_text = "Not enough history for a <strong>seasonal pattern</strong>"
+
+if insights.top_country is not None and insights.top_country_share is not None:
+    country_text = (
+        f"<strong>{insights.top_country}</strong> is the primary revenue driver "
+        f"({insights.top_country_share:.0%} of {insights.share_scope} revenue)"
+    )
+else:
+    country_text = "No revenue recorded for the <strong>selected countries</strong>"
+
+if insights.outlook is not None:
+    forecast_text = (
+        f"ML model predicts <strong>{insights.outlook} future demand</strong> "
+        f"with {insights.forecast_growth:+.1%} growth per month"
+    )
+else:
+    forecast_text = "Not enough history for an <strong>ML demand forecast</strong>"
+
 col1, col2 = st.columns(2)
 
 with col1:
-    st.markdown("""
+    st.markdown(f"""
     <div class="insight-card">
         <div class="insight-icon">📈</div>
-        <div class="insight-text">Revenue shows <strong>strong seasonal trends</strong> with Q4 peaks</div>
+        <div class="insight-text">{seasonal_text}</div>
     </div>
     <div class="insight-card" style="background: linear-gradient(135deg, rgba(102, 126, 234, 0.1) 0%, rgba(102, 126, 234, 0.05) 100%); border-color: rgba(102, 126, 234, 0.3);">
         <div class="insight-icon">🌍</div>
-        <div class="insight-text"><strong>United Kingdom</strong> is the primary revenue driver (~85%)</div>
+        <div class="insight-text">{country_text}</div>
     </div>
     """, unsafe_allow_html=True)
 
 with col2:
-    st.markdown("""
+    st.markdown(f"""
     <div class="insight-card" style="background: linear-gradient(135deg, rgba(240, 147, 251, 0.1) 0%, rgba(240, 147, 251, 0.05) 100%); border-color: rgba(240, 147, 251, 0.3);">
         <div class="insight-icon">👥</div>
-        <div class="insight-text"><strong>Top 20% customers</strong> contribute 80% of total revenue</div>
+        <div class="insight-text"><strong>Top 20% customers</strong> contribute {customer_view.top20_share:.0%} of total revenue</div>
     </div>
     <div class="insight-card" style="background: linear-gradient(135deg, rgba(109, 213, 237, 0.1) 0%, rgba(109, 213, 237, 0.05) 100%); border-color: rgba(109, 213, 237, 0.3);">
         <div class="insight-icon">🎯</div>
-        <div class="insight-text">ML model predicts <strong>stable future demand</strong> with +8.4% growth</div>
+        <div class="insight-text">{forecast_text}</div>
     </div>
     """, unsafe_allow_html=True)
 
+# -------------------------------
+# DIAGNOSTICS
+# -------------------------------
+trace.emit()
+
+if show_diagnostics:
+    with st.expander("🩺 Diagnostics", expanded=False):
+        st.caption(
+            f"Rerun `{trace.run_id}` · {trace.total_ms:,.0f} ms total · "
+            f"view cache hit rate {cache_stats['hit_rate']:.0%}"
+        )
+        st.dataframe(
+            trace.frame().round(2),
+            hide_index=True,
+            use_container_width=True
+        )
+
 # -------------------------------
 # FOOTER
 # -------------------------------
@@ -0,0 +1,54 @@
+"""Ingest-time cost of deriving the calendar features.
+
+Compares the former string-based derivation in ``load_data()``
+(``strftime('%b')``, ``day_name()`` plus the ``.dt`` accessors) with the
+integer codes now produced by ``retail.ingest.calendar_codes``, on synthetic
+invoice timestamps shaped like the OnlineRetail export (many lines share one
+invoice timestamp).
+
+Usage: ``python -m benchmarks.bench_calendar [--rows 400000] [--repeat 5]``
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.timing import best_of
+from retail.ingest import calendar_codes
+
+
+def synthetic_dates(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    invoices = max(rows // 20, 1)
+    start = np.datetime64("2010-12-01T08:00")
+    stamps = start + rng.integers(0, 373 * 24 * 60, invoices).astype("timedelta64[m]")
+    return pd.Series(pd.to_datetime(stamps[rng.integers(0, invoices, rows)]))
+
+
+def string_features(dates):
+    return {
+        "Month": dates.dt.month,
+        "MonthName": dates.dt.strftime('%b'),
+        "DayOfWeek": dates.dt.day_name(),
+        "Hour": dates.dt.hour,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=400_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    dates = synthetic_dates(args.rows)
+    before = best_of(string_features, args.repeat, dates)[1]
+    after = best_of(calendar_codes, args.repeat, dates)[1]
+    print(f"rows:                {args.rows:,}")
+    print(f"string features:     {before * 1e3:8.1f} ms")
+    print(f"integer codes:       {after * 1e3:8.1f} ms")
+    print(f"speed-up:            {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Cost of aggregating cleaned rows: pandas groupbys versus the fused kernel.
+
+Three ways to get the page's numbers from the same cleaned rows:
+
+* ``page groupbys`` -- the passes the page used to run on ``df_filtered``
+  for every selection: revenue sum, two ``nunique``, the per-invoice
+  quantity mean and the Month / DayOfWeek / Country / Hour groupbys;
+* ``cube groupby`` -- ``RetailCube.from_frame`` plus
+  ``DailyRevenue.from_frame``, one grouped aggregation each;
+* ``fused kernel`` -- ``retail.kernel.fused_aggregate``, bincounts over one
+  array of integer cell codes.
+
+The last two produce identical cubes and daily matrices
+(``tests/test_kernel.py``).
+
+Usage: ``python -m benchmarks.bench_kernel [--rows 1000000] [--repeat 5]``
+"""
+
+import argparse
+
+from benchmarks.synthetic import synthetic_retail
+from benchmarks.timing import best_of
+from retail.cube import RetailCube
+from retail.ingest import clean
+from retail.kernel import fused_aggregate
+from retail.timeseries import DailyRevenue
+
+
+def page_groupbys(df):
+    return {
+        "revenue": df["Revenue"].sum(),
+        "orders": df["InvoiceNo"].nunique(),
+        "customers": df["CustomerID"].nunique(),
+        "items_per_order": df.groupby("InvoiceNo", observed=True)["Quantity"].sum().mean(),
+        "month": df.groupby("Month")["Revenue"].sum(),
+        "day_of_week": df.groupby("DayOfWeek")["Revenue"].sum(),
+        "country": df.groupby("Country", observed=True)["Revenue"].sum(),
+        "hour": df.groupby("Hour")["Revenue"].sum(),
+    }
+
+
+def cube_groupby(df):
+    return RetailCube.from_frame(df), DailyRevenue.from_frame(df)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    df = clean(synthetic_retail(args.rows))
+    timings = {
+        "page groupbys": best_of(page_groupbys, args.repeat, df)[1],
+        "cube groupby": best_of(cube_groupby, args.repeat, df)[1],
+        "fused kernel": best_of(fused_aggregate, args.repeat, df)[1],
+    }
+    print(f"cleaned rows:        {len(df):,}")
+    for name, seconds in timings.items():
+        print(f"{name + ':':<20} {seconds * 1e3:8.1f} ms")
+    print(f"speed-up vs groupby: {timings['cube groupby'] / timings['fused kernel']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
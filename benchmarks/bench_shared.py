@@ -0,0 +1,98 @@
+"""Memory of several server processes holding the same dataset.
+
+Publishes one snapshot of a synthetic export, then starts ``--workers``
+processes that each open the dataset the way a Streamlit server does
+(``load_snapshot`` plus ``RetailDataset.from_snapshot``) and report their
+resident (RSS), proportional (PSS) and private memory from
+``/proc/self/smaps_rollup``:
+
+* ``mapped`` -- the snapshot's columns are views of the memory-mapped file,
+  so its pages are shared by every process;
+* ``copied`` -- the same frame deep-copied into each process, as a
+  ``to_pandas()`` conversion or a pickled ``st.cache_data`` value would.
+
+Usage: ``python -m benchmarks.bench_shared [--rows 1000000] [--workers 4]``
+
+Linux only (``smaps_rollup``).
+"""
+
+import argparse
+import multiprocessing
+import shutil
+import tempfile
+
+from benchmarks.synthetic import DATA_DIR, synthetic_csv
+from retail.dataset import RetailDataset
+from retail.store import load_snapshot
+
+
+def memory():
+    """RSS, PSS and private bytes of this process."""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def worker(csv_path, cache_dir, mode, ready, done):
+    before = memory()
+    snapshot = load_snapshot(csv_path, cache_dir)
+    frame = snapshot.frame.copy(deep=True) if mode == "copied" else snapshot.frame
+    dataset = RetailDataset(snapshot.version, frame)
+    # touch every column, as the first filters and charts do
+    for column in frame:
+        frame[column].to_numpy()[::4096].tolist()
+    ready.wait()  # measure while every worker holds its dataset
+    after = memory()
+    done.put({key: after[key] - before[key] for key in after} | {"rows": dataset.rows})
+    ready.wait()
+
+
+def run(csv_path, cache_dir, mode, workers):
+    context = multiprocessing.get_context("spawn")
+    ready = context.Barrier(workers + 1)
+    done = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(csv_path, cache_dir, mode, ready, done)) for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    ready.wait()
+    results = [done.get() for _ in processes]
+    ready.wait()
+    for process in processes:
+        process.join()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--data-dir", default=DATA_DIR, help="where synthetic CSVs are cached")
+    args = parser.parse_args(argv)
+
+    csv_path = synthetic_csv(args.rows, args.data_dir)
+    cache_dir = tempfile.mkdtemp(prefix="retail-shared-")
+    try:
+        snapshot = load_snapshot(csv_path, cache_dir)  # publish once
+        print(f"cleaned rows: {len(snapshot.frame):,}  workers: {args.workers}")
+        print(f"{'mode':<8} {'RSS/worker':>12} {'PSS/worker':>12} {'private/worker':>15} {'PSS total':>11}")
+        for mode in ("mapped", "copied"):
+            results = run(csv_path, cache_dir, mode, args.workers)
+            mean = {key: sum(r[key] for r in results) / len(results) / 2**20 for key in ("rss", "pss", "private")}
+            total = sum(r["pss"] for r in results) / 2**20
+            print(f"{mode:<8} {mean['rss']:9.1f} MiB {mean['pss']:9.1f} MiB {mean['private']:12.1f} MiB {total:7.1f} MiB")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Headless benchmark of the dashboard's data pipeline.
+
+Runs the same stages the page runs -- snapshot build and load, dataset
+construction, country filter, KPI block, chart aggregations, the
+LinearRegression forecast, cohort retention and a one-week date window --
+outside Streamlit, against synthetic exports of each requested size, and
+records wall time and peak traced memory per stage.
+
+Usage::
+
+    python -m benchmarks.run --sizes 100k 1M 10M
+    python -m benchmarks.run --sizes 100k --baseline benchmarks/results/previous.json
+
+Timings are the best of ``--repeat`` untraced runs; peak memory comes from
+one extra run under ``tracemalloc`` (numpy and pandas buffers included).
+With ``--baseline`` the exit status is 1 when any stage got slower than the
+baseline by more than ``--tolerance``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from benchmarks.synthetic import DATA_DIR, synthetic_csv
+from benchmarks.timing import best_of
+from retail import engine
+from retail.cohorts import CohortIndex
+from retail.dataset import RetailDataset
+from retail.forecast import linear_forecast
+from retail.instrument import peak_rss_bytes
+from retail.sketch import MODES
+from retail.store import load_snapshot
+from retail.timeseries import revenue_series
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, "results")
+
+SELECTIONS = {"uk": ["United Kingdom"], "all": []}
+
+
+def parse_size(text):
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1].lower(), 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def measure(fn, repeat, trace):
+    result, seconds = best_of(fn, repeat)
+    peak = None
+    if trace:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+# -------------------------------
+# STAGES (the engine calls behind app.py)
+# -------------------------------
+def kpis(dataset, countries):
+    cube = dataset.cube.slice(countries)
+    return {
+        mode: engine.kpis(cube, dataset.distinct("InvoiceNo", mode), dataset.distinct("CustomerID", mode), countries)
+        for mode in MODES
+    }
+
+
+def charts(dataset, countries):
+    cube = dataset.cube.slice(countries)
+    return {
+        "revenue": revenue_series(dataset.daily.daily(countries)),
+        "day_of_week": engine.day_of_week_revenue(cube),
+        "countries": engine.top_countries(cube),
+        "hour": engine.hourly_revenue(cube),
+    }
+
+
+def forecast(dataset, countries):
+    return linear_forecast(revenue_series(dataset.daily.daily(countries))["Monthly"])
+
+
+def run_size(rows, args):
+    csv_path = synthetic_csv(rows, args.data_dir, seed=args.seed)
+    cache_dir = tempfile.mkdtemp(prefix="retail-bench-")
+    results = []
+
+    def record(stage, fn):
+        result, seconds, peak = measure(fn, args.repeat, not args.no_memory)
+        results.append({
+            "rows": rows,
+            "stage": stage,
+            "seconds": seconds,
+            "peak_mib": None if peak is None else peak / 2**20,
+        })
+        print(f"{rows:>12,}  {stage:<22} {seconds * 1e3:10.1f} ms"
+              + ("" if peak is None else f"  {peak / 2**20:9.1f} MiB"), flush=True)
+        return result
+
+    def cold_snapshot():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        return load_snapshot(csv_path, cache_dir=cache_dir)
+
+    try:
+        record("snapshot_cold", cold_snapshot)
+        snapshot = record("snapshot_warm", lambda: load_snapshot(csv_path, cache_dir=cache_dir))
+
+        def build_dataset():
+            dataset = RetailDataset.from_snapshot(snapshot)
+            for column in ("InvoiceNo", "CustomerID"):
+                for mode in MODES:
+                    dataset.distinct(column, mode)
+            return dataset
+
+        dataset = record("dataset", build_dataset)
+        for name, countries in SELECTIONS.items():
+            record(f"filter[{name}]", lambda: dataset.select(countries))
+            record(f"kpis[{name}]", lambda: kpis(dataset, countries))
+            record(f"charts[{name}]", lambda: charts(dataset, countries))
+            record(f"forecast[{name}]", lambda: forecast(dataset, countries))
+
+        # the per-(Country, customer, month) reduction once, then the matrices
+        # of each selection from it
+        record("cohort_index", lambda: CohortIndex.concat(
+            CohortIndex.from_frame(frame) for frame, _ in dataset.segments
+        ))
+        dataset.cohort_index()
+        for name, countries in SELECTIONS.items():
+            record(f"cohorts[{name}]", lambda: engine.cohort_view(dataset, countries))
+
+        # a one-week date window: two binary searches per country block plus
+        # the aggregates of the rows in the window
+        last_day = engine.date_range(dataset)[1]
+        week = (last_day - pd.Timedelta(days=6), last_day)
+        record("window[week]", lambda: engine.date_window(dataset, *week))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=HERE, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "scikit-learn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path) as fh:
+        baseline = {(r["rows"], r["stage"]): r["seconds"] for r in json.load(fh)["results"]}
+    regressions = []
+    for r in results:
+        before = baseline.get((r["rows"], r["stage"]))
+        if before and r["seconds"] > before * (1 + tolerance):
+            regressions.append((r["rows"], r["stage"], before, r["seconds"]))
+    for rows, stage, before, after in regressions:
+        print(f"REGRESSION {rows:,} {stage}: {before * 1e3:.1f} ms -> {after * 1e3:.1f} ms "
+              f"({after / before:.2f}x)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the retail dashboard pipeline.")
+    parser.add_argument("--sizes", nargs="+", default=["100k", "1M", "10M"])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="where synthetic CSVs are cached")
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="earlier JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        results.extend(run_size(parse_size(size), args))
+
+    created = datetime.now(timezone.utc)
+    peak_rss = peak_rss_bytes()
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{created:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as fh:
+        json.dump({
+            "created": created.isoformat(),
+            "environment": environment(),
+            "max_rss_mib": None if peak_rss is None else peak_rss / 2**20,
+            "results": results,
+        }, fh, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline and compare(results, args.baseline, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Synthetic transaction exports with the OnlineRetail schema.
+
+The generator reproduces the shape the dashboard depends on rather than the
+exact values: ~20 lines per invoice sharing one timestamp, customer and
+country, a UK-heavy country mix, ~4k products with multi-word descriptions,
+missing CustomerIDs and cancelled (negative quantity) lines that cleaning
+drops, and "%m/%d/%Y %H:%M" invoice dates.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["InvoiceNo", "StockCode", "Description", "Quantity", "InvoiceDate", "UnitPrice", "CustomerID", "Country"]
+
+COUNTRIES = {
+    "United Kingdom": 0.89, "Germany": 0.023, "France": 0.02, "EIRE": 0.018,
+    "Spain": 0.006, "Netherlands": 0.006, "Belgium": 0.005, "Switzerland": 0.005,
+    "Portugal": 0.004, "Australia": 0.004, "Norway": 0.003, "Italy": 0.003,
+    "Channel Islands": 0.002, "Finland": 0.002, "Cyprus": 0.002, "Sweden": 0.002,
+    "Austria": 0.001, "Denmark": 0.001, "Japan": 0.001, "Poland": 0.001,
+    "USA": 0.001, "Israel": 0.001, "Singapore": 0.001, "Iceland": 0.001,
+}
+WORDS = [
+    "WHITE", "HANGING", "HEART", "T-LIGHT", "HOLDER", "RED", "RETROSPOT", "LUNCH",
+    "BAG", "VINTAGE", "JUMBO", "CAKE", "CASES", "PACK", "OF", "60", "PINK", "REGENCY",
+    "TEACUP", "SAUCER", "PARTY", "BUNTING", "ASSORTED", "COLOUR", "BIRD", "ORNAMENT",
+    "SET", "3", "GLASS", "STAR", "FROSTED", "LANTERN", "CHRISTMAS", "TREE", "WOODEN",
+]
+# where the benchmarks cache the synthetic CSVs they generate
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+PRODUCTS = 4000
+START = np.datetime64("2010-12-01T00:00")
+DAYS = 373
+
+
+def synthetic_retail(rows, seed=0):
+    """A raw export of ``rows`` lines as a DataFrame of strings and numbers."""
+    rng = np.random.default_rng(seed)
+    invoices = max(rows // 20, 1)
+    customers = max(4_400, rows // 100)
+
+    # per-invoice attributes
+    names = np.array(list(COUNTRIES))
+    weights = np.array(list(COUNTRIES.values()))
+    invoice_country = rng.choice(len(names), invoices, p=weights / weights.sum())
+    # trading hours 06:00-19:59, invoices numbered in time order
+    minutes = np.sort(rng.integers(0, DAYS, invoices) * 1440 + rng.integers(6 * 60, 20 * 60, invoices))
+    stamps = pd.DatetimeIndex(START + minutes.astype("timedelta64[m]"))
+    invoice_dates = np.asarray(stamps.strftime("%m/%d/%Y %H:%M"), dtype=object)
+    invoice_customer = (12346 + rng.integers(0, customers, invoices)).astype("float64")
+    invoice_customer[rng.random(invoices) < 0.25] = np.nan
+    invoice_no = np.char.mod("%d", 536365 + np.arange(invoices)).astype(object)
+    cancelled = rng.random(invoices) < 0.02
+    invoice_no[cancelled] = "C" + invoice_no[cancelled]
+
+    # per-product attributes
+    codes = np.char.mod("%05d", 10000 + np.arange(PRODUCTS)).astype(object)
+    word_ids = rng.integers(0, len(WORDS), (PRODUCTS, 4))
+    descriptions = np.array([" ".join(WORDS[w] for w in ids) for ids in word_ids], dtype=object)
+    prices = np.round(rng.gamma(1.5, 2.0, PRODUCTS) + 0.1, 2)
+
+    # line items, in invoice order like the real export
+    invoice = np.sort(rng.integers(0, invoices, rows))
+    popularity = 1.0 / (np.arange(PRODUCTS) + 10.0)
+    product = rng.choice(PRODUCTS, rows, p=popularity / popularity.sum())
+    product = (product * 7919 + invoice_country[invoice]) % PRODUCTS
+    quantity = rng.integers(1, 25, rows)
+    quantity[cancelled[invoice]] *= -1
+
+    return pd.DataFrame({
+        "InvoiceNo": invoice_no[invoice],
+        "StockCode": codes[product],
+        "Description": descriptions[product],
+        "Quantity": quantity,
+        "InvoiceDate": invoice_dates[invoice],
+        "UnitPrice": prices[product],
+        "CustomerID": invoice_customer[invoice],
+        "Country": names[invoice_country[invoice]],
+    }, columns=COLUMNS)
+
+
+def synthetic_csv(rows, directory, seed=0):
+    """Path of a cached synthetic export of ``rows`` lines, writing it if needed."""
+    path = os.path.join(directory, f"synthetic-{rows}-{seed}.csv")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        tmp = path + ".tmp"
+        synthetic_retail(rows, seed).to_csv(tmp, index=False, encoding="latin1")
+        os.replace(tmp, path)
+    return path
@@ -0,0 +1,14 @@
+"""Wall-time measurement shared by the benchmarks."""
+
+import time
+
+
+def best_of(fn, repeat, *args):
+    """Result of ``fn(*args)`` and its shortest wall time over ``repeat`` calls."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings.append(time.perf_counter() - start)
+    return result, min(timings)
@@ -0,0 +1,2 @@
+# Marks the repository root for pytest, so tests import ``retail`` and
+# ``benchmarks`` from here without installing anything.
@@ -0,0 +1,18 @@
+"""Data layer for the Global Retail Intelligence dashboard."""
+
+from retail.ingest import RAW_CSV, clean, read_raw
+from retail.schema import SCHEMA, apply_schema, memory_report, validate
+from retail.store import Snapshot, fingerprint, load_snapshot
+
+__all__ = [
+    "RAW_CSV",
+    "SCHEMA",
+    "Snapshot",
+    "apply_schema",
+    "clean",
+    "fingerprint",
+    "load_snapshot",
+    "memory_report",
+    "read_raw",
+    "validate",
+]
@@ -0,0 +1,322 @@
+"""Market-basket analysis: products bought together on one invoice.
+
+``BasketIndex`` holds the invoice x product incidence matrix -- a
+``scipy.sparse`` CSR matrix with True where a product is on an invoice, one
+row per invoice id -- and the country of every invoice.  Row and column ids
+come from shared ``IdEncoder``s, so indexes built from separate segments or
+chunks add up, and an invoice cut by a chunk boundary is still one basket.
+
+For the baskets X of a selection, ``X.T @ X`` counts the baskets holding
+each pair of products, and of a pair (A, B)
+
+* support is the share of baskets holding both,
+* confidence is the share of baskets holding A that also hold B,
+* lift is support over the product of the two products' own supports:
+  how much more often they meet than if bought independently.
+
+A pair is never in more baskets than either of its products, so only
+products reaching the support floor enter the product, and it is computed
+``BLOCK`` products at a time, keeping the ``TOP_PAIRS`` pairs of highest
+lift after each block: memory is bounded by one block of counts, never by
+products x products.
+
+Rules of every single country and of all countries are computed once per
+index (``precompute``); other selections compute on demand from the rows of
+their countries' invoices.
+
+The streaming ingest keeps no per-line structure, so it folds each chunk
+into ``PairCounts`` instead: per-country ``X.T @ X`` counts, which add up
+across chunks and answer the same ``rules()``.  ``split_open_invoice`` holds
+back the invoice a chunk may end in the middle of.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from retail.sketch import IdEncoder
+
+# A pair must be in this share of the selection's baskets, and in at least
+# MIN_BASKETS of them, before its lift means anything.
+MIN_SUPPORT = 0.005
+MIN_BASKETS = 5
+TOP_PAIRS = 50
+BLOCK = 512
+
+
+@dataclass
+class BasketRules:
+    """Top co-purchased pairs of one selection, by lift."""
+
+    baskets: int  # invoices in the selection
+    pairs: pd.DataFrame  # product, partner, Baskets, Support, Confidence, Lift
+    min_baskets: int = MIN_BASKETS  # support floor the pairs met
+
+
+def _empty_pairs():
+    return pd.DataFrame({
+        "product": np.array([], dtype="int64"),
+        "partner": np.array([], dtype="int64"),
+        "Baskets": np.array([], dtype="int64"),
+        "Support": np.array([], dtype="float64"),
+        "Confidence": np.array([], dtype="float64"),
+        "Lift": np.array([], dtype="float64"),
+    })
+
+
+def _resize(matrix, shape):
+    """``matrix`` padded with empty rows and columns to ``shape``."""
+    indptr = np.r_[matrix.indptr, np.full(shape[0] - matrix.shape[0], matrix.indptr[-1])]
+    return sparse.csr_matrix((matrix.data, matrix.indices, indptr), shape=shape)
+
+
+def _min_count(baskets, min_support):
+    return max(MIN_BASKETS, int(np.ceil(min_support * baskets)))
+
+
+def _best(first, second, together, counts, baskets, top_k):
+    """The ``top_k`` candidate pairs by lift, then baskets; ids index ``counts``."""
+    lift = together * baskets / (counts[first] * counts[second].astype(np.float64))
+    best = np.lexsort((second, first, -together, -lift))[:top_k]
+    return first[best], second[best], together[best]
+
+
+def _rules(baskets, counts, first, second, together, min_count, products=None):
+    """``BasketRules`` of ranked pairs; ``products`` maps their ids to product ids."""
+    products = np.arange(len(counts)) if products is None else products
+    swap = counts[first] > counts[second]
+    product = np.where(swap, second, first)
+    partner = np.where(swap, first, second)
+    return BasketRules(baskets, pd.DataFrame({
+        "product": products[product].astype(np.int64),
+        "partner": products[partner].astype(np.int64),
+        "Baskets": together,
+        "Support": together / baskets,
+        "Confidence": together / counts[product],
+        "Lift": together * baskets / (counts[first] * counts[second].astype(np.float64)),
+    }), min_count)
+
+
+def co_purchases(incidence, top_k=TOP_PAIRS, min_support=MIN_SUPPORT, block=BLOCK):
+    """Support, confidence and lift of the ``top_k`` pairs of highest lift.
+
+    ``incidence`` is a basket x product CSR matrix; empty rows are not
+    baskets.  The product of each pair is the one in fewer baskets, so its
+    confidence is the larger of the pair's two directions.
+    """
+    incidence = incidence[np.flatnonzero(np.diff(incidence.indptr))]
+    baskets = incidence.shape[0]
+    counts = np.bincount(incidence.indices, minlength=incidence.shape[1])
+    min_count = _min_count(baskets, min_support)
+    frequent = np.flatnonzero(counts >= min_count)
+    if len(frequent) < 2:
+        return BasketRules(baskets, _empty_pairs(), min_count)
+
+    x = incidence[:, frequent].astype(np.int32)
+    xt = x.T.tocsr()
+    frequent_counts = counts[frequent]
+    first = second = together = np.array([], dtype=np.int64)
+    for start in range(0, len(frequent), block):
+        pairs = (xt[start:start + block] @ x).tocoo()
+        rows = pairs.row.astype(np.int64) + start
+        keep = (pairs.col > rows) & (pairs.data >= min_count)
+        first = np.r_[first, rows[keep]]
+        second = np.r_[second, pairs.col[keep].astype(np.int64)]
+        together = np.r_[together, pairs.data[keep].astype(np.int64)]
+        if len(first) > top_k:
+            first, second, together = _best(first, second, together, frequent_counts, baskets, top_k)
+
+    first, second, together = _best(first, second, together, frequent_counts, baskets, top_k)
+    return _rules(baskets, frequent_counts, first, second, together, min_count, frequent)
+
+
+class _Rules:
+    """``rules()`` over ``countries``, with every single country and all of them computed once.
+
+    Subclasses provide ``countries`` and ``_compute(countries)``.
+    """
+
+    precomputed = None  # country name, or None for all -> BasketRules
+
+    def precompute(self):
+        """Compute the rules of every country and of all countries once."""
+        if self.precomputed is None:
+            precomputed = {None: self._compute(None)}
+            for country in self.countries:
+                precomputed[country] = self._compute([country])
+            self.precomputed = precomputed
+        return self
+
+    def rules(self, countries=None):
+        """``BasketRules`` of the invoices in ``countries`` (all when empty)."""
+        self.precompute()
+        key = None if not countries else countries[0] if len(countries) == 1 else tuple(countries)
+        if key in self.precomputed:
+            return self.precomputed[key]
+        return self._compute(countries)
+
+
+class BasketIndex(_Rules):
+    def __init__(self, incidence, countries, country):
+        self.incidence = incidence  # CSR bool, invoice id x product id
+        self.countries = countries  # pd.Index of country names
+        self.country = country  # code into countries per invoice id; -1 for ids without lines
+
+    @classmethod
+    def from_ids(cls, invoice, product, country, shape):
+        """Index of line items given as invoice ids, product ids and a Country column."""
+        country = pd.Series(country).astype("category").cat.remove_unused_categories()
+        incidence = sparse.csr_matrix((np.ones(len(invoice), dtype=bool), (invoice, product)), shape=shape)
+        codes = np.full(shape[0], -1, dtype=np.int16)
+        codes[invoice] = country.cat.codes.to_numpy()
+        return cls(incidence, pd.Index(country.cat.categories), codes)
+
+    @classmethod
+    def from_frame(cls, df, products=None, invoices=None):
+        products = products or IdEncoder()
+        invoices = invoices or IdEncoder()
+        product = products.encode(df["StockCode"])
+        invoice = invoices.encode(df["InvoiceNo"])
+        return cls.from_ids(invoice, product, df["Country"], (len(invoices.index), len(products.index)))
+
+    @classmethod
+    def empty(cls):
+        return cls(sparse.csr_matrix((0, 0), dtype=bool), pd.Index([], dtype=object), np.array([], dtype=np.int16))
+
+    @classmethod
+    def concat(cls, indexes):
+        """Merge indexes built with the same encoders; shared invoices are one basket."""
+        indexes = list(indexes)
+        if len(indexes) == 1:
+            return indexes[0]
+        shape = tuple(max(index.incidence.shape[axis] for index in indexes) for axis in (0, 1))
+        incidence = _resize(indexes[0].incidence, shape)
+        for index in indexes[1:]:
+            incidence = incidence + _resize(index.incidence, shape)
+        countries = pd.Index(sorted(set().union(*(index.countries for index in indexes))))
+        country = np.full(shape[0], -1, dtype=np.int16)
+        for index in indexes:
+            present = np.flatnonzero(index.country >= 0)
+            country[present] = countries.get_indexer(index.countries)[index.country[present]]
+        return cls(incidence.tocsr(), countries, country)
+
+    def merge(self, other):
+        return BasketIndex.concat([self, other])
+
+    @property
+    def nbytes(self):
+        matrix = self.incidence
+        return int(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes + self.country.nbytes)
+
+    def _invoices(self, countries=None):
+        if not countries:
+            return slice(None)
+        codes = self.countries.get_indexer(list(countries))
+        return np.flatnonzero(np.isin(self.country, codes[codes >= 0]))
+
+    def _compute(self, countries):
+        return co_purchases(self.incidence[self._invoices(countries)])
+
+
+def split_open_invoice(lines):
+    """``lines`` without the rows of its last invoice, and those rows.
+
+    The export lists an invoice's lines together, so only the last invoice
+    of a chunk may continue in the next one.
+    """
+    codes, _ = pd.factorize(lines["InvoiceNo"])
+    if not len(codes):
+        return lines, lines
+    other = codes[::-1] != codes[-1]
+    start = len(codes) - int(other.argmax()) if other.any() else 0
+    return lines.iloc[:start], lines.iloc[start:]
+
+
+class PairCounts(_Rules):
+    """Per-country pair counts of a streamed ingest, with ``BasketIndex``'s ``rules()``.
+
+    ``pairs[country]`` is the upper triangle of ``X.T @ X`` over the
+    country's baskets X: the diagonal counts the baskets of each product,
+    the rest those of each pair.  Its size is bounded by the product pairs
+    ever bought together, not by the lines read, and the rules it yields are
+    the ones ``co_purchases`` finds in the same baskets.
+    """
+
+    def __init__(self, pairs, baskets):
+        self.pairs = pairs  # country -> CSR int32, product id x product id
+        self.baskets = baskets  # country -> invoices
+
+    @classmethod
+    def from_frame(cls, df, products=None):
+        """Counts of the complete invoices in ``df``."""
+        if len(df) == 0:
+            return cls.empty()
+        products = products or IdEncoder()
+        product = products.encode(df["StockCode"])
+        invoice, invoices = pd.factorize(df["InvoiceNo"])
+        size = len(products.index)
+        incidence = sparse.csr_matrix(
+            (np.ones(len(invoice), dtype=bool), (invoice, product)), shape=(len(invoices), size)
+        ).astype(np.int32)
+        country = pd.Series(df["Country"]).astype("category").cat.remove_unused_categories()
+        invoice_country = np.empty(len(invoices), dtype=np.int64)
+        invoice_country[invoice] = country.cat.codes.to_numpy()
+        pairs, baskets = {}, {}
+        for code, name in enumerate(country.cat.categories):
+            rows = incidence[np.flatnonzero(invoice_country == code)]
+            pairs[name] = sparse.triu(rows.T @ rows).tocsr()
+            baskets[name] = rows.shape[0]
+        return cls(pairs, baskets)
+
+    @classmethod
+    def empty(cls):
+        return cls({}, {})
+
+    @classmethod
+    def concat(cls, indexes):
+        """Add up counts of disjoint invoices built with the same product encoder."""
+        indexes = list(indexes)
+        if len(indexes) == 1:
+            return indexes[0]
+        pairs, baskets = {}, {}
+        for country in sorted(set().union(*(index.pairs for index in indexes))):
+            parts = [index.pairs[country] for index in indexes if country in index.pairs]
+            size = max(part.shape[0] for part in parts)
+            total = _resize(parts[0], (size, size))
+            for part in parts[1:]:
+                total = total + _resize(part, (size, size))
+            pairs[country] = total.tocsr()
+            baskets[country] = sum(index.baskets.get(country, 0) for index in indexes)
+        return cls(pairs, baskets)
+
+    def merge(self, other):
+        return PairCounts.concat([self, other])
+
+    @property
+    def countries(self):
+        return sorted(self.pairs)
+
+    @property
+    def nbytes(self):
+        return int(sum(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes for m in self.pairs.values()))
+
+    def _compute(self, countries, top_k=TOP_PAIRS, min_support=MIN_SUPPORT):
+        names = [country for country in (countries or self.countries) if country in self.pairs]
+        baskets = sum(self.baskets[country] for country in names)
+        min_count = _min_count(baskets, min_support)
+        if not names:
+            return BasketRules(baskets, _empty_pairs(), min_count)
+        size = max(self.pairs[country].shape[0] for country in names)
+        total = _resize(self.pairs[names[0]], (size, size))
+        for country in names[1:]:
+            total = total + _resize(self.pairs[country], (size, size))
+        counts = total.diagonal().astype(np.int64)
+        upper = sparse.triu(total, k=1).tocoo()
+        keep = upper.data >= min_count
+        first, second, together = _best(
+            upper.row[keep].astype(np.int64), upper.col[keep].astype(np.int64),
+            upper.data[keep].astype(np.int64), counts, baskets, top_k,
+        )
+        return _rules(baskets, counts, first, second, together, min_count)
@@ -0,0 +1,134 @@
+"""Customer cohort retention: first-purchase month x months since.
+
+``CohortIndex`` reduces the rows once to revenue per (Country, customer,
+YearMonth) -- one ``factorize`` of an integer key and one ``bincount`` --
+which is at most customers x active months, far fewer than transactions, and
+merges across segments and chunks like the other indexes.
+
+``cohort_matrix`` works only on that table.  Months are integer period
+codes (``YearMonth``), so a customer's cohort is the minimum code over the
+selection and the age of each activity row is a subtraction; the revenue and
+active-customer matrices are each one ``bincount`` over the flattened
+(cohort, age) cell, reshaped to 2-D.  Cells a cohort has not reached yet
+(after the selection's last month) are NaN rather than 0.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from retail.sketch import IdEncoder
+
+
+@dataclass
+class Cohorts:
+    """Cohort matrices of one selection: rows are cohorts, columns months since first purchase."""
+
+    sizes: pd.Series  # customers per cohort
+    customers: pd.DataFrame  # active customers
+    revenue: pd.DataFrame
+    retention: pd.DataFrame  # customers / sizes
+
+
+class CohortIndex:
+    def __init__(self, table):
+        self.table = table  # Country, customer, YearMonth, Revenue per (Country, customer, YearMonth)
+
+    @classmethod
+    def from_frame(cls, df, encoder=None):
+        if len(df) == 0:
+            return cls.empty()
+        encoder = encoder or IdEncoder()
+        customer = encoder.encode(df["CustomerID"]).astype(np.int64)
+        customers = max(len(encoder.index), 1)
+        countries = df["Country"].astype("category").cat.remove_unused_categories()
+        month = df["YearMonth"].to_numpy().astype(np.int64)
+        first_month = month.min()
+        months = int(month.max() - first_month) + 1
+        key = (countries.cat.codes.to_numpy().astype(np.int64) * customers + customer) * months + (month - first_month)
+        codes, groups = pd.factorize(key, sort=True)
+        table = pd.DataFrame({
+            "Country": pd.Categorical.from_codes(groups // months // customers, countries.cat.categories),
+            "customer": (groups // months % customers).astype(np.int64),
+            "YearMonth": (groups % months + first_month).astype(np.int32),
+            "Revenue": np.bincount(codes, weights=df["Revenue"].to_numpy(), minlength=len(groups)),
+        })
+        return cls(table)
+
+    @classmethod
+    def empty(cls):
+        return cls(pd.DataFrame({
+            "Country": pd.Categorical([]),
+            "customer": np.array([], dtype="int64"),
+            "YearMonth": np.array([], dtype="int32"),
+            "Revenue": np.array([], dtype="float64"),
+        }))
+
+    @classmethod
+    def concat(cls, indexes):
+        """Merge indexes built from disjoint rows with one shared encoder."""
+        indexes = list(indexes)
+        if len(indexes) == 1:
+            return indexes[0]
+        table = pd.concat([index.table for index in indexes], ignore_index=True).astype({"Country": "category"})
+        table = table.groupby(["Country", "customer", "YearMonth"], observed=True)["Revenue"].sum().reset_index()
+        return cls(table)
+
+    def merge(self, other):
+        return CohortIndex.concat([self, other])
+
+    @property
+    def nbytes(self):
+        return int(self.table.memory_usage(deep=True).sum())
+
+
+def _frame(values, cohorts, ages):
+    return pd.DataFrame(values, index=cohorts, columns=pd.RangeIndex(ages, name="MonthsSince"))
+
+
+def cohort_matrix(index, countries=None):
+    """Revenue, active customers and retention by cohort and months since first purchase."""
+    table = index.table
+    if countries:
+        table = table[table["Country"].isin(countries)]
+    if table.empty:
+        cohorts = pd.PeriodIndex([], freq="M", name="Cohort")
+        empty = _frame(np.zeros((0, 0)), cohorts, 0)
+        return Cohorts(pd.Series([], index=cohorts, dtype="int64", name="Customers"), empty, empty, empty)
+
+    customer, _ = pd.factorize(table["customer"].to_numpy())
+    month = table["YearMonth"].to_numpy().astype(np.int64)
+    first_month = month.min()
+    span = int(month.max() - first_month) + 1
+    # the cohort of a customer is their first month within the selection;
+    # factorize codes are dense, so the grouped minima are indexed by code
+    first_by_customer = pd.Series(month).groupby(customer).min().to_numpy()
+    first = first_by_customer[customer]
+    revenue = np.bincount(
+        (first - first_month) * span + (month - first), weights=table["Revenue"].to_numpy(), minlength=span * span
+    ).reshape(span, span)
+    # a customer active in one month under several countries counts once
+    active = pd.unique(customer * span + (month - first_month))
+    active_first = first_by_customer[active // span]
+    active_month = active % span + first_month
+    counts = np.bincount(
+        (active_first - first_month) * span + (active_month - active_first), minlength=span * span
+    ).reshape(span, span).astype(np.float64)
+
+    cohort_rows = np.flatnonzero(counts[:, 0])
+    offsets = cohort_rows[:, None] + np.arange(span)[None, :]
+    unreached = offsets >= span  # months after the selection's last one
+    counts, revenue = counts[cohort_rows], revenue[cohort_rows]
+    counts[unreached] = np.nan
+    revenue[unreached] = np.nan
+    cohorts = pd.PeriodIndex(
+        [pd.Period(ordinal=int(first_month + row), freq="M") for row in cohort_rows], freq="M", name="Cohort"
+    )
+    sizes = pd.Series(counts[:, 0].astype(np.int64), index=cohorts, name="Customers")
+    return Cohorts(
+        sizes=sizes,
+        customers=_frame(counts, cohorts, span),
+        revenue=_frame(revenue, cohorts, span),
+        retention=_frame(counts / counts[:, :1], cohorts, span),
+    )
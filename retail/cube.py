@@ -0,0 +1,88 @@
+"""Pre-aggregated Country x YearMonth x DayOfWeek x Hour cube.
+
+Every chart on the page is a revenue rollup along one of these dimensions, so
+the cube is built once per dataset version and each filter interaction only
+slices and re-sums its cells (a few tens of thousands at most) instead of
+grouping every transaction again.
+"""
+
+import numpy as np
+import pandas as pd
+
+GRAIN = ["Country", "YearMonth", "DayOfWeek", "Hour"]
+MEASURES = ["Revenue", "Quantity", "Orders", "Lines"]
+
+
+class RetailCube:
+    """Revenue, Quantity, Orders and Lines summed per GRAIN cell.
+
+    ``Orders`` counts distinct invoices per cell.  An invoice has a single
+    timestamp and country, so it lands in exactly one cell and the counts stay
+    exact when cells are summed together.
+    """
+
+    def __init__(self, cells):
+        self.cells = cells
+
+    @classmethod
+    def from_frame(cls, df):
+        cells = (
+            df.groupby(GRAIN, observed=True)
+            .agg(
+                Revenue=("Revenue", "sum"),
+                Quantity=("Quantity", "sum"),
+                Orders=("InvoiceNo", "nunique"),
+                Lines=("Revenue", "size"),
+            )
+            .reset_index()
+        )
+        return cls(cells)
+
+    @classmethod
+    def concat(cls, cubes):
+        """Merge cubes built from disjoint sets of rows."""
+        frames = [cube.cells for cube in cubes]
+        if len(frames) == 1:
+            return cls(frames[0])
+        # categories differ between parts, so re-derive them for the union
+        cells = pd.concat(frames, ignore_index=True).astype({"Country": "category"})
+        cells = cells.groupby(GRAIN, observed=True)[MEASURES].sum().reset_index()
+        return cls(cells)
+
+    @property
+    def countries(self):
+        return sorted(self.cells["Country"].unique())
+
+    def slice(self, countries):
+        """Cells for ``countries``; an empty selection keeps every country."""
+        if not countries:
+            return self
+        return RetailCube(self.cells[self.cells["Country"].isin(countries)])
+
+    def rollup(self, dim, measure="Revenue"):
+        """Sum ``measure`` by one dimension; ``"Month"`` is month of year (1-12)."""
+        if dim == "Month":
+            key = (self.cells["YearMonth"] % 12 + 1).rename("Month")
+        else:
+            key = self.cells[dim]
+        return self.cells[measure].groupby(key, observed=True).sum()
+
+    def total(self, measure):
+        return self.cells[measure].sum()
+
+    @property
+    def nbytes(self):
+        return int(self.cells.memory_usage(deep=True).sum())
+
+
+def empty_cube():
+    return RetailCube(pd.DataFrame({
+        "Country": pd.Categorical([]),
+        "YearMonth": np.array([], dtype="int32"),
+        "DayOfWeek": np.array([], dtype="int8"),
+        "Hour": np.array([], dtype="int8"),
+        "Revenue": np.array([], dtype="float64"),
+        "Quantity": np.array([], dtype="int64"),
+        "Orders": np.array([], dtype="int64"),
+        "Lines": np.array([], dtype="int64"),
+    }))
@@ -0,0 +1,178 @@
+"""Customer analytics: RFM segmentation and the revenue Pareto curve.
+
+``CustomerIndex`` reduces the rows once to one row per (Country, customer):
+the last invoice date, the number of invoices and the revenue.  Both
+reductions are vectorized -- invoices are counted with the same scatter
+trick as ``retail.kernel`` (an invoice belongs to one customer in one
+country) -- and a selection re-reduces only those per-country rows, so a
+filter change costs O(customers), not O(transactions).
+
+``rfm`` scores every customer of a selection into quintiles (5 is best) of
+Recency, Frequency and Monetary value and maps the scores to segments with
+one ``np.select``; ``pareto`` is the cumulative revenue share of customers
+ranked by revenue.  Neither loops over customers in Python.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from retail.sketch import IdEncoder
+
+# (name, condition on R and FM = (F + M) / 2) in priority order; the last
+# segment takes every customer the others did not.
+SEGMENTS = [
+    ("Champions", lambda r, fm: (r >= 4) & (fm >= 4)),
+    ("Loyal", lambda r, fm: (r >= 3) & (fm >= 3)),
+    ("Promising", lambda r, fm: (r >= 4) & (fm < 3)),
+    ("Needs Attention", lambda r, fm: (r == 3) & (fm < 3)),
+    ("At Risk", lambda r, fm: (r <= 2) & (fm >= 3)),
+    ("Lost", lambda r, fm: np.ones_like(r, dtype=bool)),
+]
+SEGMENT_NAMES = [name for name, _ in SEGMENTS]
+
+PARETO_POINTS = 200
+
+
+def quintiles(values):
+    """Score 1-5 by percentile rank; ties share a score."""
+    values = pd.Series(values)
+    return np.ceil(values.rank(method="average", pct=True) * 5).clip(1, 5).astype(np.int8).to_numpy()
+
+
+@dataclass
+class CustomerView:
+    """Customer analytics of one selection (summaries only, not per-customer rows)."""
+
+    customers: int
+    segments: pd.DataFrame  # per segment: Customers, Revenue, Recency, Orders, shares
+    pareto: pd.DataFrame  # CustomerShare, RevenueShare, downsampled
+    top20_share: float  # revenue share of the top 20% of customers
+
+
+class CustomerIndex:
+    def __init__(self, table):
+        self.table = table  # Country, customer, Last, Orders, Revenue per (Country, customer)
+
+    @classmethod
+    def from_frame(cls, df, encoder=None):
+        encoder = encoder or IdEncoder()
+        customer = encoder.encode(df["CustomerID"]).astype(np.int64)
+        customers = max(len(encoder.index), 1)
+        country_codes = df["Country"].astype("category").cat.remove_unused_categories()
+        group = country_codes.cat.codes.to_numpy().astype(np.int64) * customers + customer
+        group_codes, groups = pd.factorize(group, sort=True)
+
+        invoice = df["InvoiceNo"].astype("category").cat.codes.to_numpy()
+        invoice_group = np.full(invoice.max() + 1 if len(invoice) else 0, -1, dtype=np.int64)
+        invoice_group[invoice] = group_codes
+        orders = np.bincount(invoice_group[invoice_group >= 0], minlength=len(groups))
+
+        table = pd.DataFrame({
+            "Country": pd.Categorical.from_codes(groups // customers, country_codes.cat.categories),
+            "customer": (groups % customers).astype(np.int64),
+            "Last": pd.Series(df["InvoiceDate"].to_numpy()).groupby(group_codes).max().to_numpy(),
+            "Orders": orders,
+            "Revenue": np.bincount(group_codes, weights=df["Revenue"].to_numpy(), minlength=len(groups)),
+        })
+        return cls(table)
+
+    @classmethod
+    def empty(cls):
+        return cls(pd.DataFrame({
+            "Country": pd.Categorical([]),
+            "customer": np.array([], dtype="int64"),
+            "Last": np.array([], dtype="datetime64[ns]"),
+            "Orders": np.array([], dtype="int64"),
+            "Revenue": np.array([], dtype="float64"),
+        }))
+
+    @classmethod
+    def concat(cls, indexes):
+        """Merge indexes built from disjoint invoices with one shared encoder."""
+        indexes = list(indexes)
+        if len(indexes) == 1:
+            return indexes[0]
+        table = pd.concat([index.table for index in indexes], ignore_index=True).astype({"Country": "category"})
+        table = table.groupby(["Country", "customer"], observed=True).agg(
+            Last=("Last", "max"), Orders=("Orders", "sum"), Revenue=("Revenue", "sum")
+        ).reset_index()
+        return cls(table)
+
+    def merge(self, other):
+        return CustomerIndex.concat([self, other])
+
+    @property
+    def nbytes(self):
+        return int(self.table.memory_usage(deep=True).sum())
+
+    def customers(self, countries=None):
+        """Last, Orders and Revenue per customer over ``countries`` (all when empty)."""
+        table = self.table
+        if countries:
+            table = table[table["Country"].isin(countries)]
+        return table.groupby("customer", sort=False).agg(
+            Last=("Last", "max"), Orders=("Orders", "sum"), Revenue=("Revenue", "sum")
+        )
+
+    def rfm(self, countries=None, as_of=None):
+        """Recency (days), Frequency, Monetary, their 1-5 scores and segment per customer.
+
+        Recency is counted from ``as_of``, by default the day after the
+        selection's latest invoice.
+        """
+        customers = self.customers(countries)
+        if as_of is None:
+            as_of = customers["Last"].max().normalize() + pd.Timedelta(days=1) if len(customers) else pd.Timestamp.now()
+        recency = (as_of - customers["Last"]).dt.days.to_numpy()
+        r = (6 - quintiles(recency)).astype(np.int8)
+        f = quintiles(customers["Orders"].to_numpy())
+        m = quintiles(customers["Revenue"].to_numpy())
+        fm = (f.astype(np.float64) + m) / 2
+        segment = np.select([condition(r, fm) for _, condition in SEGMENTS], SEGMENT_NAMES, default=SEGMENT_NAMES[-1])
+        return pd.DataFrame({
+            "Recency": recency,
+            "Frequency": customers["Orders"].to_numpy(),
+            "Monetary": customers["Revenue"].to_numpy(),
+            "R": r,
+            "F": f,
+            "M": m,
+            "Segment": pd.Categorical(segment, categories=SEGMENT_NAMES),
+        }, index=customers.index)
+
+
+def pareto(revenue, points=PARETO_POINTS):
+    """Cumulative revenue share by customer share, customers ranked by revenue."""
+    revenue = np.sort(np.asarray(revenue, dtype=np.float64))[::-1]
+    if len(revenue) == 0 or revenue.sum() <= 0:
+        return pd.DataFrame({"CustomerShare": [0.0], "RevenueShare": [0.0]})
+    cumulative = np.cumsum(revenue) / revenue.sum()
+    picks = np.unique(np.linspace(0, len(revenue) - 1, min(points, len(revenue))).round().astype(np.int64))
+    return pd.DataFrame({
+        "CustomerShare": np.r_[0.0, (picks + 1) / len(revenue)],
+        "RevenueShare": np.r_[0.0, cumulative[picks]],
+    })
+
+
+def customer_view(index, countries=None):
+    """Segment summary and Pareto curve of the customers in ``countries``."""
+    scores = index.rfm(countries)
+    revenue = scores["Monetary"].to_numpy()
+    total = revenue.sum()
+    segments = scores.groupby("Segment", observed=False).agg(
+        Customers=("Monetary", "size"),
+        Revenue=("Monetary", "sum"),
+        Recency=("Recency", "mean"),
+        Orders=("Frequency", "mean"),
+    )
+    segments["CustomerShare"] = segments["Customers"] / max(len(scores), 1)
+    segments["RevenueShare"] = segments["Revenue"] / total if total else 0.0
+    ranked = np.sort(revenue)[::-1]
+    top = int(np.ceil(0.2 * len(ranked)))
+    return CustomerView(
+        customers=len(scores),
+        segments=segments.reset_index(),
+        pareto=pareto(revenue),
+        top20_share=float(ranked[:top].sum() / total) if total else 0.0,
+    )
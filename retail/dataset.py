@@ -0,0 +1,192 @@
+"""The live, appendable retail dataset shared by every dashboard session.
+
+``RetailDataset`` owns the cleaned rows and every structure derived from
+them (country row index, cube, daily revenue matrix, distinct-count
+partitions).  Rows arrive as
+segments -- the base snapshot first, then one per appended delta file -- and
+each segment stays partitioned by country on its own, so an append costs
+time proportional to the delta: the new segment is indexed, its cube and
+sketches are built, and they are merged into the existing ones.
+"""
+
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+from retail.baskets import BasketIndex
+from retail.cohorts import CohortIndex
+from retail.cube import RetailCube
+from retail.customers import CustomerIndex
+from retail.parallel import WORKERS, build_aggregates, build_distinct
+from retail.partition import CountryIndex, partition_by_country
+from retail.products import ProductIndex
+from retail.schema import apply_schema
+from retail.sketch import APPROX, IdEncoder
+
+DISTINCT_COLUMNS = ("InvoiceNo", "CustomerID")
+
+
+class RetailDataset:
+    def __init__(self, base_version, frame, workers=WORKERS):
+        self.base_version = base_version
+        self.workers = workers  # threads per aggregation pass (retail.parallel)
+        self.deltas = []  # labels of appended segments, oldest first
+        self.segments = []  # [(frame, CountryIndex)]
+        self.cube = None
+        self.daily = None
+        self._distinct = {}  # (column, mode) -> DistinctIndex, built on demand
+        self._products = None  # ProductIndex, built on demand
+        self._customers = None  # CustomerIndex, built on demand
+        self._cohorts = None  # CohortIndex, built on demand
+        self._baskets = None  # BasketIndex, built on demand
+        self._encoders = {column: IdEncoder() for column in (*DISTINCT_COLUMNS, "StockCode")}
+        self._lock = threading.RLock()
+        self.version = base_version
+        self._add_segment(frame)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, workers=WORKERS):
+        return cls(snapshot.version, snapshot.frame, workers)
+
+    def _add_segment(self, frame):
+        index = CountryIndex.from_sorted(frame["Country"])
+        with self._lock:
+            # one partitioned pass builds the cube, the daily matrix and the
+            # new rows' part of every distinct index built so far
+            parts = build_aggregates(frame, list(self._distinct), self._encoders, self.workers)
+            distinct = {key: idx.merge(parts.distinct[key]) for key, idx in self._distinct.items()}
+            self.segments = self.segments + [(frame, index)]
+            self.cube = parts.cube if self.cube is None else RetailCube.concat([self.cube, parts.cube])
+            self.daily = parts.daily if self.daily is None else self.daily.merge(parts.daily)
+            self._distinct = distinct
+            if self._products is not None:
+                self._products = self._products.merge(ProductIndex.from_frame(frame, self._encoders["StockCode"]))
+            if self._customers is not None:
+                self._customers = self._customers.merge(CustomerIndex.from_frame(frame, self._encoders["CustomerID"]))
+            if self._cohorts is not None:
+                self._cohorts = self._cohorts.merge(CohortIndex.from_frame(frame, self._encoders["CustomerID"]))
+            if self._baskets is not None:
+                self._baskets = self._baskets.merge(self._basket_part(frame))
+
+    def _build_distinct(self, frame, column, mode):
+        encoder = None if mode == APPROX else self._encoders[column]
+        return build_distinct(frame, column, mode, encoder, self.workers)
+
+    def append(self, frame, label):
+        """Add cleaned rows (e.g. one delta file) and bump the version."""
+        self._add_segment(partition_by_country(frame))
+        with self._lock:
+            self.deltas = self.deltas + [label]
+            digest = hashlib.sha256(self.version.encode())
+            digest.update(label.encode())
+            self.version = f"{self.base_version}+{len(self.deltas)}.{digest.hexdigest()[:6]}"
+
+    def distinct(self, column, mode):
+        """DistinctIndex for ``column`` in ``mode``, built on first use."""
+        key = (column, mode)
+        with self._lock:
+            if key not in self._distinct:
+                index = None
+                for frame, _ in self.segments:
+                    part = self._build_distinct(frame, column, mode)
+                    index = part if index is None else index.merge(part)
+                self._distinct[key] = index
+            return self._distinct[key]
+
+    def product_index(self):
+        """ProductIndex over every segment, built on first use."""
+        with self._lock:
+            if self._products is None:
+                self._products = ProductIndex.concat(
+                    ProductIndex.from_frame(frame, self._encoders["StockCode"]) for frame, _ in self.segments
+                )
+            return self._products
+
+    def customer_index(self):
+        """CustomerIndex over every segment, built on first use."""
+        with self._lock:
+            if self._customers is None:
+                self._customers = CustomerIndex.concat(
+                    CustomerIndex.from_frame(frame, self._encoders["CustomerID"]) for frame, _ in self.segments
+                )
+            return self._customers
+
+    def cohort_index(self):
+        """CohortIndex over every segment, built on first use."""
+        with self._lock:
+            if self._cohorts is None:
+                self._cohorts = CohortIndex.concat(
+                    CohortIndex.from_frame(frame, self._encoders["CustomerID"]) for frame, _ in self.segments
+                )
+            return self._cohorts
+
+    def _basket_part(self, frame):
+        return BasketIndex.from_frame(frame, self._encoders["StockCode"], self._encoders["InvoiceNo"])
+
+    def basket_index(self):
+        """BasketIndex over every segment with its per-country rules, built on first use."""
+        with self._lock:
+            if self._baskets is None:
+                self._baskets = BasketIndex.concat(self._basket_part(frame) for frame, _ in self.segments)
+            return self._baskets.precompute()
+
+    @property
+    def countries(self):
+        return self.cube.countries
+
+    @property
+    def rows(self):
+        return sum(len(frame) for frame, _ in self.segments)
+
+    @property
+    def nbytes(self):
+        return sum(int(frame.memory_usage(index=False).sum()) for frame, _ in self.segments)
+
+    def selected_rows(self, countries=None):
+        """Row count of a selection, from the segments' row ranges alone."""
+        return sum(index.rows(countries) for _, index in self.segments)
+
+    def select(self, countries=None, start=None, stop=None):
+        """Cleaned rows for ``countries`` (all when empty) dated in ``[start, stop)``, across segments."""
+        parts = [index.select(frame, countries, start, stop) for frame, index in self.segments]
+        parts = [part for part in parts if len(part)]
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return self.segments[0][0].iloc[0:0]
+        # segments carry their own categories; re-derive them for the union
+        return apply_schema(pd.concat(parts, ignore_index=True))
+
+    def window(self, start=None, stop=None):
+        """A dataset of every country's rows dated in ``[start, stop)``.
+
+        Rows are located by binary search within each country block, so the
+        cost is the rows in the window; its aggregates are built from those
+        rows alone.  The window's version extends this dataset's.
+        """
+        frame = self.select(None, start, stop)
+        if len(self.segments) > 1:
+            frame = partition_by_country(frame)
+        bounds = "..".join("" if bound is None else pd.Timestamp(bound).strftime("%Y-%m-%d") for bound in (start, stop))
+        return RetailDataset(f"{self.version}@{bounds}", frame, self.workers)
+
+    @property
+    def products(self):
+        codes = [frame["StockCode"].cat.categories for frame, _ in self.segments]
+        return len(codes[0]) if len(codes) == 1 else len(np.unique(np.concatenate(codes)))
+
+    @property
+    def latest_invoice(self):
+        return max(frame["InvoiceDate"].max() for frame, _ in self.segments)
+
+    def watermark(self):
+        return {
+            "version": self.version,
+            "base_version": self.base_version,
+            "deltas": len(self.deltas),
+            "last_delta": self.deltas[-1] if self.deltas else None,
+            "rows": self.rows,
+            "latest_invoice": self.latest_invoice,
+        }
@@ -0,0 +1,234 @@
+"""UI-free analytics behind the dashboard.
+
+Everything the page shows for a country selection is computed here from a
+*source*: a live ``RetailDataset`` (snapshot mode), the ``StreamAggregates``
+of a chunked ingest (stream mode) or a ``SqlSource`` that pushes every
+aggregate down into a local SQLite file (sql mode).  All three expose the same
+read surface -- ``version``, ``cube``, ``daily``, ``countries``,
+``products``, ``selected_rows()`` and ``distinct()`` -- so nothing below
+depends on how the data was loaded, and nothing here imports Streamlit.
+``app.py`` caches the sources and the ``View`` objects and only renders them.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from retail.baskets import BasketRules
+from retail.cohorts import cohort_matrix
+from retail.customers import customer_view as _customer_view
+from retail.dataset import RetailDataset
+from retail.forecast import Forecast, batch_forecast, linear_forecast
+from retail.incremental import DeltaStore
+from retail.ingest import RAW_CSV
+from retail.insights import Insights, compute_insights
+from retail.instrument import NULL_TRACE
+from retail.schema import DAY_NAMES
+from retail.sqlstore import open_sql
+from retail.store import CACHE_DIR, load_snapshot
+from retail.streaming import stream_aggregates
+from retail.timeseries import complete_months, monthly_by, revenue_series
+
+TOP_COUNTRIES = 10
+
+# Part of the precomputed store's file name; bump it when ``View`` changes so
+# that views pickled by an older release are not read back.
+VIEW_FORMAT = 3
+
+
+def open_dataset(csv_path=RAW_CSV, cache_dir=CACHE_DIR):
+    """The live dataset of ``csv_path`` and its delta store.
+
+    The base rows come from a memory-mapped columnar snapshot that is only
+    rebuilt when the CSV's size, mtime or content hash changes; deltas
+    recorded by earlier runs are replayed from their persisted parts.
+    """
+    snapshot = load_snapshot(csv_path, cache_dir)
+    dataset = RetailDataset.from_snapshot(snapshot)
+    delta_store = DeltaStore(snapshot.version, cache_dir)
+    for label, frame in delta_store.replay():
+        dataset.append(frame, label)
+    return dataset, delta_store
+
+
+def open_aggregates(csv_path=RAW_CSV):
+    """Stream ``csv_path`` into aggregates without keeping its rows."""
+    return stream_aggregates(csv_path)
+
+
+def open_database(csv_path=RAW_CSV, cache_dir=CACHE_DIR):
+    """Query ``csv_path``'s rows in an on-disk SQLite file.
+
+    The file is (re)built from the CSV right away when it is missing or its
+    fingerprint no longer matches the CSV's.
+    """
+    return open_sql(csv_path, cache_dir)
+
+
+@dataclass
+class View:
+    """KPIs, chart series, forecast and insights for one country selection."""
+
+    countries: tuple
+    total_revenue: float
+    total_orders: int
+    total_customers: int
+    avg_order_value: float
+    avg_items_per_order: float
+    count_error: float  # relative std. error of the distinct counts; 0 when exact
+    revenue: dict  # granularity -> revenue Series with a PeriodIndex
+    day_of_week: pd.DataFrame
+    top_countries: pd.DataFrame
+    hourly: pd.DataFrame
+    forecast: Forecast
+    insights: Insights
+
+
+def view_key(source, countries, count_mode):
+    return (source.version, tuple(sorted(countries)), count_mode)
+
+
+def kpis(cube, orders, customers, countries):
+    total_revenue = cube.total("Revenue")
+    total_orders = orders.count(countries)
+    total_customers = customers.count(countries)
+    return {
+        "total_revenue": total_revenue,
+        "total_orders": total_orders,
+        "total_customers": total_customers,
+        "avg_order_value": total_revenue / total_orders if total_orders > 0 else 0,
+        "avg_items_per_order": cube.total("Quantity") / total_orders if total_orders > 0 else np.nan,
+        "count_error": customers.error_bound,
+    }
+
+
+def day_of_week_revenue(cube):
+    # integer day codes, Monday = 0, are labelled only on the <= 7 output rows
+    revenue = cube.rollup("DayOfWeek").sort_index().reset_index()
+    revenue["DayOfWeek"] = np.take(DAY_NAMES, revenue["DayOfWeek"])
+    return revenue
+
+
+def top_countries(cube, n=TOP_COUNTRIES):
+    return cube.rollup("Country").sort_values(ascending=True).tail(n).reset_index()
+
+
+def hourly_revenue(cube):
+    return cube.rollup("Hour").reset_index()
+
+
+def fitted_months(source, monthly):
+    """The complete months of ``monthly`` (a Series or month columns) that a trend is fitted on.
+
+    A window shorter than two complete months keeps its partial ones, the
+    only data it has.
+    """
+    complete = complete_months(monthly, source.daily.first_day, source.daily.last_day)
+    return complete if complete.shape[-1] >= 2 else monthly
+
+
+def compute_view(source, countries, count_mode, trace=NULL_TRACE, forecasts=None):
+    """Everything the page derives for ``countries`` (all when empty).
+
+    ``forecasts`` is an optional ``ForecastCache`` for the monthly fit.
+    """
+    cube = source.cube.slice(countries)
+
+    with trace.stage("view/kpis") as record:
+        totals = kpis(
+            cube,
+            source.distinct("InvoiceNo", count_mode),
+            source.distinct("CustomerID", count_mode),
+            countries,
+        )
+        record["rows"] = len(cube.cells)
+        record["nbytes"] = cube.nbytes
+
+    # one daily series per selection, re-bucketed into each granularity so
+    # switching between them never rescans rows
+    with trace.stage("view/trend") as record:
+        revenue = revenue_series(source.daily.daily(countries))
+        record["rows"] = len(revenue["Daily"])
+
+    with trace.stage("view/rollups"):
+        day_of_week = day_of_week_revenue(cube)
+        top = top_countries(cube)
+        hourly = hourly_revenue(cube)
+
+    # true calendar months, not month-of-year, and only complete ones: the
+    # 9 days of December 2011 would pull the line down like a collapse
+    with trace.stage("view/forecast") as record:
+        history = fitted_months(source, revenue["Monthly"])
+        forecast = linear_forecast(history, cache=forecasts)
+        record["rows"] = len(history)
+
+    with trace.stage("view/insights"):
+        insights = compute_insights(source, countries, count_mode, cube, revenue, forecast)
+
+    return View(
+        countries=tuple(sorted(countries)),
+        revenue=revenue,
+        day_of_week=day_of_week,
+        top_countries=top,
+        hourly=hourly,
+        forecast=forecast,
+        insights=insights,
+        **totals,
+    )
+
+
+def date_range(source):
+    """First and last invoice day of ``source``, as ``datetime.date``."""
+    daily = source.daily
+    return tuple(
+        pd.Period(ordinal=day, freq="D").to_timestamp().date() for day in (daily.first_day, daily.last_day)
+    )
+
+
+def date_window(source, first, last):
+    """``source`` restricted to invoices from day ``first`` through day ``last``.
+
+    Needs the cleaned rows, so it is only available in snapshot mode.
+    """
+    if not hasattr(source, "window"):
+        raise TypeError("date filtering needs row-level data; use the snapshot ingest mode")
+    return source.window(pd.Timestamp(first), pd.Timestamp(last) + pd.Timedelta(days=1))
+
+
+def country_forecasts(source):
+    """Next-month revenue forecast of every country, from its complete months."""
+    return batch_forecast(fitted_months(source, source.daily.monthly()))
+
+
+def product_forecasts(source, countries=None):
+    """Next-month revenue forecast of every StockCode sold in ``countries``.
+
+    Needs the cleaned rows, so it is only available in snapshot mode.
+    """
+    if not hasattr(source, "select"):
+        raise TypeError("product forecasts need row-level data; use the snapshot ingest mode")
+    return batch_forecast(fitted_months(source, monthly_by([source.select(countries)], "StockCode")))
+
+
+def customer_view(source, countries=None):
+    """RFM segment summary and revenue Pareto curve of ``countries``' customers."""
+    return _customer_view(source.customer_index(), countries)
+
+
+def cohort_view(source, countries=None):
+    """Cohort retention and revenue matrices of ``countries``' customers."""
+    return cohort_matrix(source.cohort_index(), countries)
+
+
+def basket_view(source, countries=None):
+    """Top co-purchased product pairs of ``countries``, labelled with descriptions."""
+    rules = source.basket_index().rules(countries)
+    products = source.product_index()
+    labels = pd.Series(products.codes.astype(str), index=pd.RangeIndex(len(products.codes)))
+    labels.update(products.labels)
+    pairs = rules.pairs.assign(**{
+        "Product": labels.reindex(rules.pairs["product"]).to_numpy(),
+        "Bought With": labels.reindex(rules.pairs["partner"]).to_numpy(),
+    })
+    return BasketRules(rules.baskets, pairs, rules.min_baskets)
@@ -0,0 +1,189 @@
+"""Linear trend forecasts of revenue series.
+
+``linear_forecast`` fits one series.  With a ``ForecastCache`` the fitted
+line is looked up by a fingerprint of the series values first, so an
+unchanged series is never refitted -- not across reruns, sessions or server
+restarts, since the cache persists its coefficients to a small JSON file.
+
+``batch_forecast`` fits every row of an entity x period matrix at once (all
+countries, every StockCode) with the closed-form least-squares solution,
+which is a handful of vectorized reductions instead of one sklearn fit per
+series.  Each row is fitted from its first non-zero period through the
+matrix's last one, months without revenue after its last sale counting as
+zero, and every row is forecast for the same next period.  A dormant
+country or product is thus ranked on what its trend expects next month,
+not on a forecast for a month already past.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+from retail.store import CACHE_DIR, file_lock, write_atomic
+
+logger = logging.getLogger(__name__)
+
+FORECAST_CACHE = os.path.join(CACHE_DIR, "forecasts.json")
+
+# Part of every fingerprint; bump it when the model changes so that stale
+# coefficients are never served.
+MODEL_VERSION = "linear/1"
+
+
+@dataclass
+class Forecast:
+    history: pd.Series  # the series the model was fitted on
+    trend: np.ndarray  # fitted values for every period of history plus the next
+    prediction: float  # the next period
+
+
+def series_fingerprint(series):
+    """Hash of the series values; the fit depends on nothing else."""
+    digest = hashlib.sha256(MODEL_VERSION.encode())
+    digest.update(np.ascontiguousarray(series.to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()[:24]
+
+
+class ForecastCache:
+    """Fitted (intercept, slope) pairs by series fingerprint, persisted to ``path``.
+
+    Bounded to ``maxsize`` entries, oldest first out.  The file is rewritten
+    atomically after each new fit; fits are rare since every distinct series
+    is fitted once.  Server processes share the file: a write merges the
+    fits already on disk under a lock file, so no process drops another's.
+    """
+
+    def __init__(self, path=FORECAST_CACHE, maxsize=4096):
+        self.path = path
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._models = OrderedDict(self._read())
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path) as fh:
+                stored = json.load(fh)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable forecast cache %s: %s", self.path, exc)
+            return {}
+        if stored.get("model") != MODEL_VERSION:
+            return {}
+        return {key: tuple(coef) for key, coef in stored["models"].items()}
+
+    def _write(self):
+        def write(tmp):
+            with open(tmp, "w") as fh:
+                json.dump({"model": MODEL_VERSION, "models": self._models}, fh)
+
+        try:
+            with file_lock(self.path + ".lock"):
+                models = OrderedDict(self._read())
+                models.update(self._models)
+                while len(models) > self.maxsize:
+                    models.popitem(last=False)
+                self._models = models
+                write_atomic(self.path, write)
+        except OSError as exc:
+            logger.warning("Could not persist forecast cache to %s: %s", self.path, exc)
+
+    def __len__(self):
+        return len(self._models)
+
+    def get(self, key):
+        with self._lock:
+            coef = self._models.get(key)
+            if coef is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return coef
+
+    def put(self, key, coef):
+        with self._lock:
+            self._models[key] = tuple(coef)
+            while len(self._models) > self.maxsize:
+                self._models.popitem(last=False)
+            self._write()
+
+
+def linear_forecast(series, cache=None):
+    """Fit revenue against period number and extrapolate one period ahead."""
+    if len(series) == 0:  # nothing sold in the selection
+        return Forecast(series, np.zeros(1), 0.0)
+    key = series_fingerprint(series) if cache is not None else None
+    coef = cache.get(key) if cache is not None else None
+    if coef is None:
+        X = np.arange(len(series)).reshape(-1, 1)
+        model = LinearRegression()
+        model.fit(X, series.values)
+        coef = (float(model.intercept_), float(model.coef_[0]))
+        if cache is not None:
+            cache.put(key, coef)
+    intercept, slope = coef
+    trend = intercept + slope * np.arange(len(series) + 1)
+    return Forecast(series, trend, float(trend[-1]))
+
+
+def fit_lines(values):
+    """Least-squares line through each row of ``values`` from its first non-zero column on.
+
+    Returns ``(intercept, slope, first, last)`` per row, with x the column
+    position and ``last`` the row's last non-zero column; rows without any
+    non-zero value get NaN coefficients.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    periods = values.shape[1]
+    if periods == 0:
+        nothing = np.full(len(values), np.nan)
+        return nothing, nothing, np.zeros(len(values), dtype=np.intp), np.zeros(len(values), dtype=np.intp)
+    x = np.arange(periods)
+    active = values != 0
+    first = active.argmax(axis=1)
+    last = periods - 1 - active[:, ::-1].argmax(axis=1)
+    span = (x >= first[:, None]) & active.any(axis=1)[:, None]
+    n = span.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = (span * x).sum(axis=1) / n
+        y_mean = (span * values).sum(axis=1) / n
+        dx = np.where(span, x - x_mean[:, None], 0.0)
+        sxx = (dx * dx).sum(axis=1)
+        # a single active period has no slope; the line is flat through it
+        slope = np.where(sxx > 0, (dx * values).sum(axis=1) / sxx, 0.0)
+        slope[n == 0] = np.nan
+    return y_mean - slope * x_mean, slope, first, last
+
+
+def batch_forecast(matrix):
+    """Next-period forecast for every row of an entity x period DataFrame.
+
+    Columns must be consecutive periods (e.g. ``DailyRevenue.monthly()``).
+    Rows that never had revenue are dropped; every remaining row is forecast
+    for the period after the last column, and ``last_period`` is the last
+    one it had revenue in.
+    """
+    values = matrix.to_numpy()
+    intercept, slope, first, last = fit_lines(values)
+    keep = ~np.isnan(slope)
+    periods = matrix.columns
+    result = pd.DataFrame({
+        "first_period": periods[first[keep]],
+        "last_period": periods[last[keep]],
+        "periods": (len(periods) - first)[keep],
+        "last_value": values[keep, -1] if len(periods) else np.zeros(0),
+        "slope": slope[keep],
+        "prediction": (intercept + slope * len(periods))[keep],
+    }, index=matrix.index[keep])
+    result["forecast_period"] = periods[-1] + 1 if len(periods) else None
+    return result.sort_values("prediction", ascending=False)
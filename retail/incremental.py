@@ -0,0 +1,198 @@
+"""Incremental ingest of delta CSVs dropped next to the base export.
+
+New transaction files (same columns as ``OnlineRetail.csv``) are placed in a
+drop directory.  Each one is cleaned with the same rules as the base export,
+persisted as a Feather part under the snapshot cache and recorded in a
+manifest, so it is parsed exactly once; after a restart the parts are
+replayed from disk instead of re-parsing the CSVs.
+
+The manifest belongs to one base snapshot version.  When the base export
+changes, recorded parts are discarded and every file still in the drop
+directory is applied again on top of the new base -- remove deltas from the
+drop directory once they are folded into a new base export.
+
+Only complete files are picked up.  Writers should copy a delta in under a
+name that does not end in ``.csv`` (``2011-12-10.csv.part``) and rename it
+into place; a ``.csv`` file modified less than ``SETTLE_SECONDS`` ago is
+left for a later rerun, so one copied in directly is not read mid-write.
+A file that cannot be parsed or cleaned is recorded in the manifest as
+failed, with the error, and skipped until its content changes.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from pyarrow import feather
+
+from retail.ingest import clean, read_raw
+from retail.store import CACHE_DIR, file_lock, file_sha256, write_atomic
+
+logger = logging.getLogger(__name__)
+
+DROP_DIR = os.environ.get("RETAIL_DROP_DIR", "incoming")
+SETTLE_SECONDS = float(os.environ.get("RETAIL_DROP_SETTLE", "10"))
+
+
+class DeltaStore:
+    """Manifest and persisted parts of the deltas applied to one base version.
+
+    Several server processes share the store: the manifest is only changed
+    inside ``transaction()``, which holds a lock file next to it and re-reads
+    it first, and every part is named after the content hash of its CSV.
+    """
+
+    def __init__(self, base_version, cache_dir=CACHE_DIR):
+        self.base_version = base_version
+        self.parts_dir = os.path.join(cache_dir, "deltas")
+        self.manifest_path = os.path.join(self.parts_dir, "manifest.json")
+        self.lock_path = os.path.join(self.parts_dir, "manifest.lock")
+        self.applied, self.failed = self._load_manifest()
+        self.replayed = set()  # parts this process has already yielded or ingested
+        self.lock = threading.Lock()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path) as fh:
+                manifest = json.load(fh)
+        except (OSError, ValueError):
+            return [], []
+        if manifest.get("base_version") != self.base_version:
+            logger.info("Base export changed; discarding %d recorded deltas", len(manifest.get("applied", [])))
+            return [], []
+        return manifest["applied"], manifest.get("failed", [])
+
+    def _save_manifest(self):
+        def write(tmp):
+            with open(tmp, "w") as fh:
+                json.dump(
+                    {"base_version": self.base_version, "applied": self.applied, "failed": self.failed}, fh, indent=2
+                )
+
+        write_atomic(self.manifest_path, write)
+
+    @contextmanager
+    def transaction(self):
+        """Hold the manifest against other threads and processes, freshly re-read."""
+        with self.lock, file_lock(self.lock_path):
+            self.applied, self.failed = self._load_manifest()
+            yield self
+
+    def replay(self):
+        """Yield ``(label, frame)`` for every recorded delta not yielded yet, oldest first."""
+        for entry in self.applied:
+            if entry["part"] in self.replayed:
+                continue
+            path = os.path.join(self.parts_dir, entry["part"])
+            frame = feather.read_table(path, memory_map=True).to_pandas()
+            self.replayed.add(entry["part"])
+            yield entry["name"], frame
+
+    def pending(self, drop_dir=DROP_DIR, settle=SETTLE_SECONDS):
+        """Complete CSV files in ``drop_dir`` not applied or failed yet, in name order.
+
+        A file is recognised by name, size and mtime; a renamed or touched
+        file is hashed once, and if its content was already applied (or
+        failed) its new name, size and mtime are recorded as an alias of
+        that entry.  Files modified less than ``settle`` seconds ago are
+        skipped.  Call it inside ``transaction()``.
+        """
+        try:
+            entries = sorted(
+                (e for e in os.scandir(drop_dir) if e.is_file() and e.name.lower().endswith(".csv")),
+                key=lambda e: e.name,
+            )
+        except FileNotFoundError:
+            return []
+        known = self.applied + self.failed
+        seen = set()
+        for recorded in known:
+            seen.add((recorded["name"], recorded["size"], recorded["mtime_ns"]))
+            seen.update(tuple(alias) for alias in recorded.get("aliases", []))
+        by_hash = {recorded["sha256"]: recorded for recorded in known}
+        settled = time.time_ns() - int(settle * 1e9)
+        new = []
+        aliased = False
+        for entry in entries:
+            stat = entry.stat()
+            key = (entry.name, stat.st_size, stat.st_mtime_ns)
+            if key in seen:
+                continue
+            if stat.st_mtime_ns > settled:
+                logger.info("Delta %s was modified in the last %g s; waiting for it to settle", entry.path, settle)
+                continue
+            recorded = by_hash.get(file_sha256(entry.path))
+            if recorded is None:
+                new.append(entry.path)
+                continue
+            recorded.setdefault("aliases", []).append(list(key))
+            seen.add(key)
+            aliased = True
+        if aliased:
+            self._save_manifest()
+        return new
+
+    def ingest(self, path):
+        """Clean ``path``, persist it as a part and record it; returns the frame.
+
+        A file that cannot be parsed or cleaned is recorded as failed and
+        None is returned.  Call it inside ``transaction()``.
+        """
+        stat = os.stat(path)
+        sha256 = file_sha256(path)
+        try:
+            frame = clean(read_raw(path))
+        except (KeyError, ValueError) as exc:
+            logger.error("Skipping delta %s: %s: %s", path, type(exc).__name__, exc)
+            self.failed.append({
+                "name": os.path.basename(path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": sha256,
+                "error": f"{type(exc).__name__}: {exc}",
+            })
+            self._save_manifest()
+            return None
+        part = f"{sha256[:16]}.feather"
+        os.makedirs(self.parts_dir, exist_ok=True)
+        write_atomic(
+            os.path.join(self.parts_dir, part),
+            lambda tmp: feather.write_feather(frame, tmp, compression="uncompressed"),
+        )
+        self.applied.append({
+            "name": os.path.basename(path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "part": part,
+            "rows": len(frame),
+        })
+        self._save_manifest()
+        self.replayed.add(part)
+        logger.info("Applied delta %s: %d cleaned rows", path, len(frame))
+        return frame
+
+
+def apply_pending(dataset, store, drop_dir=DROP_DIR, settle=SETTLE_SECONDS):
+    """Fold every new delta into ``dataset``; returns their labels.
+
+    Deltas another server process recorded since this one last looked are
+    replayed from their parts, then new files of ``drop_dir`` are ingested;
+    files that fail to ingest are left out.
+    """
+    applied = []
+    with store.transaction():
+        for label, frame in store.replay():
+            dataset.append(frame, label=label)
+            applied.append(label)
+        for path in store.pending(drop_dir, settle):
+            frame = store.ingest(path)
+            if frame is None:
+                continue
+            name = os.path.basename(path)
+            dataset.append(frame, label=name)
+            applied.append(name)
+    return applied
@@ -0,0 +1,159 @@
+"""Facts behind the KPI trend lines and the business insight cards.
+
+Everything here is derived from aggregates a view already has -- the
+selection's cube slice and monthly revenue series, the distinct-count
+partitions keyed by (Country, YearMonth) and the fitted forecast -- so the
+insights of a selection cost a few small reductions and no pass over the
+rows.
+
+Period-over-period changes compare the last *complete* calendar month of the
+data with the month before it.  A month the data only partly covers -- the
+export ends on 9 December 2011, and a date window may start or end mid-month
+-- would otherwise show up as a collapse in every metric.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from retail.forecast import Forecast, linear_forecast
+from retail.timeseries import complete_months
+
+# Projected monthly growth within this band reads as "stable" demand.
+STABLE_GROWTH = 0.02
+
+QUARTER_MONTHS = {"Q1": (1, 2, 3), "Q2": (4, 5, 6), "Q3": (7, 8, 9), "Q4": (10, 11, 12)}
+
+
+@dataclass
+class Insights:
+    """Computed facts of one selection; None where the data cannot support one."""
+
+    period: pd.Period = None  # last complete month of the selection
+    previous: pd.Period = None  # the month before it
+    changes: dict = field(default_factory=dict)  # metric -> relative change vs previous
+    peak_month: pd.Period = None
+    peak_quarter: str = None  # quarter of the year with the most revenue
+    peak_quarter_share: float = None
+    top_country: str = None
+    top_country_share: float = None
+    share_scope: str = "selection"  # "selection", or "all countries" for one country
+    forecast_growth: float = None  # the fitted trend's change over its last month
+    forecast_fit: float = None  # R² of the trend over the history
+    outlook: str = None  # "growing", "stable" or "declining"
+
+
+def relative_change(current, previous):
+    if previous is None or not previous or current is None or np.isnan(previous) or np.isnan(current):
+        return None
+    return float(current / previous - 1)
+
+
+def month_over_month(monthly, orders, customers, countries, first_day, last_day):
+    """Revenue, Orders, Customers and AOV of the last complete month vs the month before."""
+    months = complete_months(monthly, first_day, last_day)
+    if len(months) < 2:
+        return None, None, {}
+    previous, period = months.index[-2], months.index[-1]
+    values = {}
+    for month in (previous, period):
+        # YearMonth keys of the partitions are monthly Period ordinals
+        revenue = float(months[month])
+        order_count = orders.count(countries, [month.ordinal])
+        values[month] = {
+            "Revenue": revenue,
+            "Orders": order_count,
+            "Customers": customers.count(countries, [month.ordinal]),
+            "AOV": revenue / order_count if order_count else np.nan,
+        }
+    changes = {metric: relative_change(values[period][metric], values[previous][metric]) for metric in values[period]}
+    return period, previous, changes
+
+
+def seasonality(cube, monthly):
+    """Peak calendar month and the quarter of the year with the largest revenue share."""
+    if not len(monthly) or cube.total("Revenue") <= 0:
+        return None, None, None
+    by_month = cube.rollup("Month")
+    quarters = {name: by_month.reindex(list(months), fill_value=0).sum() for name, months in QUARTER_MONTHS.items()}
+    peak_quarter = max(quarters, key=quarters.get)
+    return monthly.idxmax(), peak_quarter, float(quarters[peak_quarter] / by_month.sum())
+
+
+def country_share(cube, all_cube):
+    """Largest country of the selection and its revenue share.
+
+    A single-country selection is measured against all countries instead,
+    since its share of itself says nothing.
+    """
+    by_country = cube.rollup("Country")
+    by_country = by_country[by_country > 0]
+    if by_country.empty:
+        return None, None, "selection"
+    top = by_country.idxmax()
+    if len(by_country) == 1:
+        total = all_cube.total("Revenue")
+        return top, float(by_country[top] / total) if total > 0 else None, "all countries"
+    return top, float(by_country[top] / by_country.sum()), "selection"
+
+
+def trend_outlook(forecast: Forecast, first_day, last_day):
+    """Growth of the fitted line over its last month, its R² and a one-word reading.
+
+    Read off a line through complete months only; a forecast fitted through
+    a partial month is refitted without it, and fewer than two complete
+    months have no trend to read.
+    """
+    complete = complete_months(forecast.history, first_day, last_day)
+    if len(complete) < 2:
+        return None, None, None
+    if len(complete) < len(forecast.history):
+        forecast = linear_forecast(complete)
+    history = forecast.history.to_numpy(dtype=np.float64)
+    trend = forecast.trend
+    if len(history) < 2:
+        return None, None, None
+    growth = relative_change(trend[-1], trend[-2])
+    residual = ((history - trend[:-1]) ** 2).sum()
+    spread = ((history - history.mean()) ** 2).sum()
+    fit = float(1 - residual / spread) if spread > 0 else None
+    if growth is None:
+        outlook = None
+    elif growth > STABLE_GROWTH:
+        outlook = "growing"
+    elif growth < -STABLE_GROWTH:
+        outlook = "declining"
+    else:
+        outlook = "stable"
+    return growth, fit, outlook
+
+
+def compute_insights(source, countries, count_mode, cube, revenue, forecast):
+    """The ``Insights`` of a selection from its view aggregates."""
+    first_day, last_day = source.daily.first_day, source.daily.last_day
+    period, previous, changes = month_over_month(
+        revenue["Monthly"],
+        source.distinct("InvoiceNo", count_mode),
+        source.distinct("CustomerID", count_mode),
+        countries,
+        first_day,
+        last_day,
+    )
+    peak_month, peak_quarter, peak_quarter_share = seasonality(cube, revenue["Monthly"])
+    top_country, top_country_share, share_scope = country_share(cube, source.cube)
+    forecast_growth, forecast_fit, outlook = trend_outlook(forecast, first_day, last_day)
+    return Insights(
+        period=period,
+        previous=previous,
+        changes=changes,
+        peak_month=peak_month,
+        peak_quarter=peak_quarter,
+        peak_quarter_share=peak_quarter_share,
+        top_country=top_country,
+        top_country_share=top_country_share,
+        share_scope=share_scope,
+        forecast_growth=forecast_growth,
+        forecast_fit=forecast_fit,
+        outlook=outlook,
+    )
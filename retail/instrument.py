@@ -0,0 +1,108 @@
+"""Per-rerun stage timings for the dashboard.
+
+Every script run creates one ``RerunTrace`` and wraps each section of the
+page -- loading, filtering, the view computation and each block that renders
+a chart -- in ``trace.stage(name)``.  A stage records its wall time and the
+process RSS when it ends, plus whatever fields the section attaches to the
+record it yields (row counts, frame bytes, cache hit or miss).
+
+``trace.emit()`` writes the records as JSON lines on the
+``retail.instrument`` logger (one ``stage`` event per stage, then one
+``rerun`` summary); point a handler at that logger to ship them to
+monitoring.  ``trace.frame()`` is what the diagnostics panel shows.
+"""
+
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+MIB = 2**20
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None where it can't be read."""
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def rss_bytes():
+    """Resident set size of this process, or None where it can't be read."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    # peak rather than current RSS where /proc is missing
+    return peak_rss_bytes()
+
+
+class RerunTrace:
+    def __init__(self, **context):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.context = context  # constant fields added to every log event
+        self.records = []
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, **fields):
+        # appended on entry so nested stages are listed after their parent
+        record = {"stage": name, **fields}
+        self.records.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["ms"] = (time.perf_counter() - start) * 1e3
+            rss = rss_bytes()
+            record["rss_mib"] = None if rss is None else rss / MIB
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self._started) * 1e3
+
+    def frame(self):
+        df = pd.DataFrame(self.records)
+        if "nbytes" in df:
+            df["mib"] = df.pop("nbytes") / MIB
+        for column in ("rows", "files"):
+            if column in df:
+                df[column] = df[column].astype("Int64")
+        first = [c for c in ("stage", "ms", "rss_mib", "cache", "rows", "mib") if c in df]
+        return df[first + [c for c in df if c not in first]]
+
+    def emit(self):
+        base = {"run": self.run_id, **self.context}
+        for record in self.records:
+            logger.info(json.dumps({"event": "stage", **base, **record}, default=str))
+        logger.info(json.dumps({
+            "event": "rerun",
+            **base,
+            "total_ms": self.total_ms,
+            "stages": len(self.records),
+        }, default=str))
+
+
+class NullTrace:
+    """Stand-in for RerunTrace when nothing is recording."""
+
+    @contextmanager
+    def stage(self, name, **fields):
+        yield {"stage": name, **fields}
+
+
+NULL_TRACE = NullTrace()
@@ -0,0 +1,22 @@
+"""Print the per-column memory saving of the retail schema.
+
+Usage: ``python -m retail.memreport [OnlineRetail.csv]``
+"""
+
+import sys
+
+from retail.ingest import RAW_CSV, clean, read_raw
+from retail.schema import memory_report
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    frame = clean(read_raw(argv[0] if argv else RAW_CSV))
+    report = memory_report(frame)
+    mib = report[["before_bytes", "after_bytes"]] / 2**20
+    report[["before_bytes", "after_bytes"]] = mib
+    print(report.rename(columns={"before_bytes": "before_MiB", "after_bytes": "after_MiB"}).round(2))
+
+
+if __name__ == "__main__":
+    main()
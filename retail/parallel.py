@@ -0,0 +1,97 @@
+"""Partitioned, multi-threaded build of the dashboard aggregates.
+
+A frame is cut into ``RETAIL_WORKERS`` row ranges of roughly equal size, each
+cut moved forward to the next change of (Country, InvoiceDate) so that no
+invoice -- one timestamp, one country -- is split between two ranges and the
+cube's per-cell Orders stay exact.  Every range is aggregated in one pass on
+a thread pool -- cube cells and the daily revenue matrix from the fused
+bincount kernel of ``retail.kernel``, plus the distinct-count partitions --
+and the partials are merged with the same operations appends use.  The numpy
+kernels (bincount, sort, packbits) and pandas' factorize release the GIL for
+the bulk of their work, so threads scale with cores without copying rows
+into worker processes.
+
+The ids of each distinct column are computed once for the whole frame before
+the fan-out: in exact mode they come from the dataset's shared ``IdEncoder``,
+which assigns new ids and so must not run concurrently.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import reduce
+
+import numpy as np
+
+from retail.cube import RetailCube
+from retail.kernel import fused_aggregate
+from retail.sketch import DistinctIndex, distinct_ids
+from retail.timeseries import DailyRevenue
+
+WORKERS = int(os.environ.get("RETAIL_WORKERS", os.cpu_count() or 1))
+
+# Below this many rows per range, thread start-up and the merge cost more
+# than the parallel pass saves.
+MIN_RANGE_ROWS = 100_000
+
+
+@dataclass
+class Aggregates:
+    cube: RetailCube
+    daily: DailyRevenue
+    distinct: dict  # (column, mode) -> DistinctIndex
+
+
+def row_ranges(df, parts=WORKERS):
+    """Up to ``parts`` contiguous ``(start, stop)`` ranges that never split an invoice."""
+    n = len(df)
+    parts = min(parts, n // MIN_RANGE_ROWS)
+    if parts <= 1:
+        return [(0, n)]
+    countries = df["Country"].astype("category").cat.codes.to_numpy()
+    dates = df["InvoiceDate"].to_numpy()
+    # rows that start a new (Country, InvoiceDate) run are the only safe cuts
+    safe = np.flatnonzero((countries[1:] != countries[:-1]) | (dates[1:] != dates[:-1])) + 1
+    targets = np.arange(1, parts) * n // parts
+    cuts = safe[np.minimum(np.searchsorted(safe, targets), len(safe) - 1)] if len(safe) else []
+    bounds = sorted({0, n, *map(int, cuts)})
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def build_aggregates(frame, distinct_keys=(), encoders=None, workers=WORKERS, totals=True):
+    """Cube, daily revenue and the ``distinct_keys`` indexes of ``frame``.
+
+    ``encoders`` maps a column to the ``IdEncoder`` its exact-mode indexes
+    share; ``totals=False`` skips the cube and daily matrix.
+    """
+    encoders = encoders or {}
+    ids = {
+        (column, mode): distinct_ids(frame[column], mode, encoders.get(column))
+        for column, mode in distinct_keys
+    }
+
+    def aggregate(bounds):
+        start, stop = bounds
+        part = frame.iloc[start:stop]
+        cube, daily = fused_aggregate(part) if totals else (None, None)
+        return cube, daily, {key: DistinctIndex.from_ids(part, ids[key][start:stop], key[1]) for key in ids}
+
+    ranges = row_ranges(frame, workers)
+    if len(ranges) == 1:
+        partials = [aggregate(ranges[0])]
+    else:
+        with ThreadPoolExecutor(len(ranges)) as pool:
+            partials = list(pool.map(aggregate, ranges))
+
+    cubes, dailies, distincts = zip(*partials)
+    return Aggregates(
+        cube=RetailCube.concat(cubes) if totals else None,
+        daily=reduce(DailyRevenue.merge, dailies) if totals else None,
+        distinct={key: reduce(DistinctIndex.merge, [d[key] for d in distincts]) for key in ids},
+    )
+
+
+def build_distinct(frame, column, mode, encoder=None, workers=WORKERS):
+    """One distinct-count index of ``frame``, partitioned like ``build_aggregates``."""
+    aggregates = build_aggregates(frame, [(column, mode)], {column: encoder}, workers, totals=False)
+    return aggregates.distinct[(column, mode)]
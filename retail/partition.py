@@ -0,0 +1,94 @@
+"""Country-partitioned layout of the cleaned frame.
+
+The snapshot is stored sorted by Country (then InvoiceDate), so each country's
+rows form one contiguous block.  ``CountryIndex`` records those blocks, and
+selecting countries becomes positional slicing: a zero-copy ``iloc`` view for
+a single country, or one gather over the selected blocks otherwise, in either
+case touching only the selected rows.
+
+Within a block rows are in InvoiceDate order, so a date window narrows each
+block with two binary searches; a week of data costs O(log n) per country
+plus the rows in the window, never a boolean mask over the frame.
+"""
+
+import numpy as np
+import pandas as pd
+
+SORT_ORDER = ["Country", "InvoiceDate"]
+
+
+def partition_by_country(df):
+    """Sort ``df`` into contiguous per-country blocks, oldest invoice first."""
+    return df.sort_values(SORT_ORDER, kind="stable", ignore_index=True)
+
+
+def window(dates, lo, hi, start=None, stop=None):
+    """Row range within ``[lo, hi)`` -- sorted by date -- dated in ``[start, stop)``."""
+    block = dates[lo:hi]
+    first = int(np.searchsorted(block, np.datetime64(start, "ns"))) if start is not None else 0
+    last = int(np.searchsorted(block, np.datetime64(stop, "ns"))) if stop is not None else len(block)
+    return lo + first, lo + max(first, last)
+
+
+class CountryIndex:
+    """Row ranges ``[start, stop)`` of each country in a partitioned frame."""
+
+    def __init__(self, ranges):
+        self.ranges = ranges  # {country: (start, stop)}
+
+    @classmethod
+    def from_sorted(cls, countries):
+        """Index a Country column already grouped into contiguous blocks."""
+        if not isinstance(countries.dtype, pd.CategoricalDtype):
+            countries = countries.astype("category")
+        codes = countries.cat.codes.to_numpy()
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=int)
+        if len(np.unique(codes[starts])) != len(starts):
+            raise ValueError("Country column is not partitioned; run partition_by_country() first")
+        stops = np.r_[starts[1:], len(codes)]
+        categories = countries.cat.categories
+        return cls({
+            categories[code]: (int(start), int(stop))
+            for code, start, stop in zip(codes[starts], starts, stops)
+        })
+
+    @property
+    def countries(self):
+        return sorted(self.ranges)
+
+    def spans(self, countries=None, dates=None, start=None, stop=None):
+        """Sorted, coalesced row ranges covering ``countries`` (all when empty).
+
+        With ``dates`` (the frame's InvoiceDate values) each range is narrowed
+        to the rows with ``start <= date < stop``; either bound may be None.
+        """
+        selected = set(countries) if countries else self.ranges
+        spans = sorted(self.ranges[c] for c in selected if c in self.ranges)
+        if dates is not None and (start is not None or stop is not None):
+            spans = [window(dates, lo, hi, start, stop) for lo, hi in spans]
+            spans = [(lo, hi) for lo, hi in spans if hi > lo]
+        merged = []
+        for start, stop in spans:
+            if merged and merged[-1][1] == start:
+                merged[-1] = (merged[-1][0], stop)
+            else:
+                merged.append((start, stop))
+        return merged
+
+    def rows(self, countries=None):
+        """Number of rows in the selection, without touching the frame."""
+        if not countries:
+            return sum(stop - start for start, stop in self.ranges.values())
+        return sum(stop - start for start, stop in self.spans(countries))
+
+    def select(self, df, countries=None, start=None, stop=None):
+        """Rows of ``df`` for ``countries`` dated in ``[start, stop)``; no filter returns ``df``."""
+        if not countries and start is None and stop is None:
+            return df
+        spans = self.spans(countries, df["InvoiceDate"].to_numpy(), start, stop)
+        if not spans:
+            return df.iloc[0:0]
+        if len(spans) == 1:
+            return df.iloc[spans[0][0]:spans[0][1]]
+        # one gather over the selected positions beats concatenating blocks
+        return df.take(np.concatenate([np.arange(start, stop) for start, stop in spans]))
@@ -0,0 +1,139 @@
+"""Batch-compute dashboard views for common country selections.
+
+Usage::
+
+    python -m retail.precompute
+    python -m retail.precompute --workers 8 --selections selections.json --each-country
+
+Each selection is computed in both distinct-count modes on a process pool;
+every worker opens the dataset once (a memory-mapped snapshot read) and
+computes its share of the views with ``engine.compute_view``.  The views are
+written to one pickle per dataset version under ``<cache>/views/``, which the
+page consults before computing a selection itself.  A store written for an
+older version is simply never read again.
+
+A selections file is a JSON object mapping a name to a list of countries; an
+empty list means all countries.
+"""
+
+import argparse
+import json
+import logging
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from retail import engine
+from retail.ingest import RAW_CSV
+from retail.sketch import MODES
+from retail.store import CACHE_DIR, write_atomic
+
+logger = logging.getLogger(__name__)
+
+VIEWS_DIR = "views"
+
+DEFAULT_SELECTIONS = {
+    "United Kingdom": ["United Kingdom"],
+    "All countries": [],
+    "Top EU markets": ["Germany", "France", "EIRE", "Netherlands", "Spain", "Belgium"],
+}
+
+_worker_source = None
+
+
+def views_path(version, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, VIEWS_DIR, f"{version}.v{engine.VIEW_FORMAT}.pkl")
+
+
+def views_stamp(version, cache_dir=CACHE_DIR):
+    """mtime of the stored views for ``version``, or None when there are none."""
+    try:
+        return os.stat(views_path(version, cache_dir)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def load_views(version, cache_dir=CACHE_DIR):
+    """Stored views of ``version`` keyed like ``engine.view_key``; {} if absent."""
+    try:
+        with open(views_path(version, cache_dir), "rb") as fh:
+            return pickle.load(fh)
+    except (OSError, pickle.UnpicklingError, EOFError) as exc:
+        if not isinstance(exc, FileNotFoundError):
+            logger.warning("Ignoring unreadable view store for %s: %s", version, exc)
+        return {}
+
+
+def _init_worker(csv_path, cache_dir):
+    global _worker_source
+    _worker_source, _ = engine.open_dataset(csv_path, cache_dir)
+
+
+def _compute(task):
+    countries, mode = task
+    return engine.view_key(_worker_source, countries, mode), engine.compute_view(_worker_source, countries, mode)
+
+
+def precompute(selections, csv_path=RAW_CSV, cache_dir=CACHE_DIR, workers=None):
+    """Compute every selection in every count mode and store them; returns the path."""
+    # built (or validated) once here so workers only ever read the snapshot
+    source, _ = engine.open_dataset(csv_path, cache_dir)
+    known = set(source.countries)
+    tasks = []
+    for name, countries in selections.items():
+        missing = sorted(set(countries) - known)
+        if missing:
+            logger.warning("Selection %r: no rows for %s", name, ", ".join(missing))
+            countries = [country for country in countries if country in known]
+            if not countries:
+                continue
+        tasks.extend((list(countries), mode) for mode in MODES)
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(csv_path, cache_dir)) as pool:
+        views = dict(pool.map(_compute, tasks))
+
+    path = views_path(source.version, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def write(tmp):
+        with open(tmp, "wb") as fh:
+            pickle.dump(views, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+    write_atomic(path, write)
+    return path
+
+
+def read_selections(path):
+    with open(path) as fh:
+        selections = json.load(fh)
+    if not isinstance(selections, dict) or not all(isinstance(c, list) for c in selections.values()):
+        raise ValueError(f"{path}: expected an object mapping names to lists of countries")
+    return selections
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute dashboard views for common selections.")
+    parser.add_argument("csv", nargs="?", default=RAW_CSV)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--selections", help="JSON file of {name: [countries]}")
+    parser.add_argument("--each-country", action="store_true", help="also store every single country")
+    parser.add_argument("--workers", type=int, default=None, help="process count (default: CPU count)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    selections = read_selections(args.selections) if args.selections else dict(DEFAULT_SELECTIONS)
+    if args.each_country:
+        source, _ = engine.open_dataset(args.csv, args.cache_dir)
+        selections.update({country: [country] for country in source.countries})
+
+    start = time.perf_counter()
+    path = precompute(selections, args.csv, args.cache_dir, args.workers)
+    logger.info(
+        "Stored %d selections x %d count modes in %s (%.1f s)",
+        len(selections), len(MODES), path, time.perf_counter() - start,
+    )
+
+
+if __name__ == "__main__":
+    main()
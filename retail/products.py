@@ -0,0 +1,213 @@
+"""Product (StockCode) rankings and description search.
+
+``ProductIndex`` keeps revenue and quantity per (Country, YearMonth,
+product) -- the same partitions the distinct counts use, a few thousand
+products each -- plus two lookups, built on the first ``top()`` or
+``search()`` of an index, so the partial indexes of chunks and appended
+segments, which are only ever merged, never pay for them:
+
+* the top ``SUMMARY_K`` products of every partition and of every country
+  over all months, by each measure, so the common "top products of one
+  country (in one month)" question is a dictionary lookup;
+* an inverted index from each description token to the products whose
+  description contains it, so a search intersects a few id arrays instead
+  of scanning descriptions.
+
+Any other selection sums the sales rows of its partitions with one
+``bincount`` over product ids and picks the top K with ``argpartition``;
+neither path touches the transactions.  Product ids come from a shared
+``IdEncoder``, so indexes built from separate segments or chunks merge.
+"""
+
+import bisect
+import re
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from retail.sketch import IdEncoder
+
+MEASURES = ("Revenue", "Quantity")
+TOP_K = 10
+SUMMARY_K = 50
+
+_TOKEN = re.compile(r"[A-Z0-9]+")
+
+
+def tokenize(text):
+    return _TOKEN.findall(str(text).upper())
+
+
+class ProductIndex:
+    def __init__(self, codes, sales, descriptions):
+        self.codes = codes  # pd.Index of StockCodes; position = product id
+        self.sales = sales  # Country, YearMonth, product, Revenue, Quantity; sorted
+        self.descriptions = descriptions  # lines per (product, Description)
+
+    @classmethod
+    def from_frame(cls, df, encoder=None):
+        encoder = encoder or IdEncoder()
+        product = encoder.encode(df["StockCode"])
+        rows = pd.DataFrame({
+            "Country": df["Country"],
+            "YearMonth": df["YearMonth"].to_numpy(),
+            "product": product.astype(np.int32),
+            "Revenue": df["Revenue"].to_numpy(),
+            "Quantity": df["Quantity"].to_numpy().astype(np.int64),
+            "Description": df["Description"],
+        })
+        sales = rows.groupby(["Country", "YearMonth", "product"], observed=True)[list(MEASURES)].sum().reset_index()
+        descriptions = rows.groupby(["product", "Description"], observed=True).size()
+        return cls(encoder.index, sales, descriptions)
+
+    @classmethod
+    def empty(cls):
+        sales = pd.DataFrame({
+            "Country": pd.Categorical([]),
+            "YearMonth": np.array([], dtype="int32"),
+            "product": np.array([], dtype="int32"),
+            "Revenue": np.array([], dtype="float64"),
+            "Quantity": np.array([], dtype="int64"),
+        })
+        descriptions = pd.Series(
+            [], dtype="int64", index=pd.MultiIndex.from_arrays([[], []], names=["product", "Description"])
+        )
+        return cls(pd.Index([], dtype=object), sales, descriptions)
+
+    @classmethod
+    def concat(cls, indexes):
+        """Merge indexes built from disjoint rows with one shared encoder."""
+        indexes = list(indexes)
+        if len(indexes) == 1:
+            return indexes[0]
+        # the encoder only ever grows, so the latest code table covers all
+        codes = max((index.codes for index in indexes), key=len)
+        sales = pd.concat([index.sales for index in indexes], ignore_index=True).astype({"Country": "category"})
+        sales = sales.groupby(["Country", "YearMonth", "product"], observed=True)[list(MEASURES)].sum().reset_index()
+        descriptions = pd.concat([index.descriptions for index in indexes])
+        descriptions = descriptions.groupby(level=["product", "Description"], observed=True).sum()
+        return cls(codes, sales, descriptions)
+
+    def merge(self, other):
+        return ProductIndex.concat([self, other])
+
+    @cached_property
+    def labels(self):
+        """Most frequent Description per product id."""
+        return (
+            self.descriptions.sort_values(ascending=False)
+            .reset_index()
+            .drop_duplicates("product")
+            .set_index("product")["Description"]
+        )
+
+    @cached_property
+    def _upper_codes(self):
+        return pd.Index(self.codes).astype(str).str.upper()
+
+    @cached_property
+    def tokens(self):
+        """Description token -> sorted ids of the products whose description has it."""
+        pairs = self.descriptions.index.to_frame(index=False)
+        pairs["Description"] = pairs["Description"].astype(str)
+        tokens = pairs.assign(token=pairs["Description"].map(tokenize)).explode("token").dropna(subset=["token"])
+        grouped = tokens.groupby("token")["product"].unique()
+        return {token: np.sort(ids.astype(np.int64)) for token, ids in grouped.items()}
+
+    @cached_property
+    def _vocabulary(self):
+        return sorted(self.tokens)
+
+    @cached_property
+    def summaries(self):
+        """(country, year_month or None for all months, measure) -> top rows."""
+        summaries = {}
+        by_country = self.sales.groupby(["Country", "product"], observed=True)[list(MEASURES)].sum().reset_index()
+        for measure in MEASURES:
+            for keys, sales in ((["Country", "YearMonth"], self.sales), (["Country"], by_country)):
+                ranked = sales.sort_values(measure, ascending=False, kind="stable")
+                top = ranked.groupby(keys, observed=True, sort=False).head(SUMMARY_K)
+                for key, rows in top.groupby(keys, observed=True, sort=False):
+                    country, month = key if len(keys) == 2 else (key[0], None)
+                    summaries[(country, month, measure)] = (
+                        rows["product"].to_numpy(), rows["Revenue"].to_numpy(), rows["Quantity"].to_numpy()
+                    )
+        return summaries
+
+    @property
+    def nbytes(self):
+        return int(self.sales.memory_usage(deep=True).sum())
+
+    @property
+    def months(self):
+        return sorted(self.sales["YearMonth"].unique())
+
+    def _selected(self, countries=None, year_month=None):
+        mask = np.ones(len(self.sales), dtype=bool)
+        if countries:
+            mask &= self.sales["Country"].isin(countries).to_numpy()
+        if year_month is not None:
+            mask &= self.sales["YearMonth"].to_numpy() == year_month
+        return self.sales[mask]
+
+    def totals(self, countries=None, year_month=None):
+        """Revenue and Quantity per product id over the selected partitions."""
+        rows = self._selected(countries, year_month)
+        return {
+            measure: np.bincount(rows["product"], weights=rows[measure], minlength=len(self.codes))
+            for measure in MEASURES
+        }
+
+    def _frame(self, ids, revenue, quantity):
+        ids = np.asarray(ids, dtype=np.int64)
+        return pd.DataFrame({
+            "StockCode": np.asarray(self.codes)[ids],
+            "Description": self.labels.reindex(ids).to_numpy(),
+            "Revenue": np.asarray(revenue, dtype=np.float64),
+            "Quantity": np.asarray(quantity).astype(np.int64),
+        })
+
+    def top(self, countries=None, year_month=None, measure="Revenue", k=TOP_K):
+        """The ``k`` best-selling products of a selection by ``measure``."""
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown measure {measure!r}; expected one of {MEASURES}")
+        if countries and len(set(countries)) == 1 and k <= SUMMARY_K:
+            summary = self.summaries.get((next(iter(countries)), year_month, measure))
+            if summary is None:  # nothing sold there
+                return self._frame([], [], [])
+            return self._frame(*(column[:k] for column in summary))
+        totals = self.totals(countries, year_month)
+        values = totals[measure]
+        candidates = np.flatnonzero(values)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-values[candidates], k - 1)[:k]]
+        ids = candidates[np.argsort(-values[candidates], kind="stable")]
+        return self._frame(ids, totals["Revenue"][ids], totals["Quantity"][ids])
+
+    def search(self, query, countries=None, year_month=None, limit=20):
+        """Products whose description has every word of ``query``, best sellers first.
+
+        The last word also matches as a prefix, so results follow typing;
+        a query that is a StockCode prefix matches that code too.
+        """
+        words = tokenize(query)
+        if not words:
+            return self._frame([], [], [])
+        matches = None
+        for i, word in enumerate(words):
+            if i == len(words) - 1:
+                start = bisect.bisect_left(self._vocabulary, word)
+                stop = bisect.bisect_left(self._vocabulary, word + "\uffff")
+                ids = [self.tokens[token] for token in self._vocabulary[start:stop]]
+                ids = np.unique(np.concatenate(ids)) if ids else np.array([], dtype=np.int64)
+            else:
+                ids = self.tokens.get(word, np.array([], dtype=np.int64))
+            matches = ids if matches is None else np.intersect1d(matches, ids, assume_unique=True)
+        if len(words) == 1:
+            matches = np.union1d(matches, np.flatnonzero(self._upper_codes.str.startswith(words[0])))
+
+        totals = self.totals(countries, year_month)
+        matches = matches[totals["Revenue"][matches] != 0]
+        ids = matches[np.argsort(-totals["Revenue"][matches], kind="stable")[:limit]]
+        return self._frame(ids, totals["Revenue"][ids], totals["Quantity"][ids])
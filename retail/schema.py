@@ -0,0 +1,97 @@
+"""Column schema of the cleaned retail frame.
+
+Every dashboard session holds the cleaned frame, so its columns are stored
+in the narrowest dtype that represents them exactly: categoricals for the
+repeated strings, ``int32`` customer IDs and ``int8`` calendar codes.
+``python -m retail.memreport [csv]`` prints how much that saves compared
+with the object/float64 frame pandas infers on its own.
+"""
+
+import pandas as pd
+
+INVOICE_DATE_FORMAT = "%m/%d/%Y %H:%M"
+
+# Label tables for the integer calendar codes; applied to aggregated outputs
+# (at most 12 or 7 rows), never stored per transaction.
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# dtypes handed to read_csv, so the raw frame is already compact
+RAW_DTYPES = {
+    "InvoiceNo": "category",
+    "StockCode": "category",
+    "Description": "category",
+    "Quantity": "int32",
+    "UnitPrice": "float64",  # narrowed once Revenue has been derived from it
+    "CustomerID": "float64",  # nullable in the export; narrowed after dropna
+    "Country": "category",
+}
+
+# Revenue stays float64: totals over hundreds of thousands of float32 rows
+# drift by whole dollars, and Revenue is what every KPI sums.
+SCHEMA = {
+    "InvoiceNo": "category",
+    "StockCode": "category",
+    "Description": "category",
+    "Quantity": "int32",
+    "InvoiceDate": "datetime64[ns]",
+    "UnitPrice": "float32",
+    "CustomerID": "int32",
+    "Country": "category",
+    "Revenue": "float64",
+    "YearMonth": "int32",
+    "Month": "int8",
+    "DayOfWeek": "int8",  # Monday = 0; label with DAY_NAMES
+    "Hour": "int8",
+}
+
+
+def apply_schema(df):
+    """Cast ``df`` to SCHEMA, dropping categories no remaining row uses."""
+    df = df.astype({col: dtype for col, dtype in SCHEMA.items() if col in df.columns})
+    for col, dtype in SCHEMA.items():
+        if isinstance(dtype, str) and dtype == "category" and col in df.columns:
+            df[col] = df[col].cat.remove_unused_categories()
+    return df
+
+
+def validate(df):
+    """Raise ``ValueError`` if ``df`` does not match SCHEMA column for column."""
+    problems = []
+    for col, expected in SCHEMA.items():
+        if col not in df.columns:
+            problems.append(f"missing column {col!r}")
+        elif df[col].dtype != expected:
+            problems.append(f"{col!r} is {df[col].dtype}, expected {expected}")
+    if problems:
+        raise ValueError("Retail frame does not match schema: " + "; ".join(problems))
+    return df
+
+
+def as_inferred(df):
+    """The frame as pandas infers it without a schema (object strings, 64-bit numbers)."""
+    out = df.copy()
+    for col in out.columns:
+        if isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype(object)
+        elif pd.api.types.is_integer_dtype(out[col]):
+            out[col] = out[col].astype("int64")
+        elif pd.api.types.is_float_dtype(out[col]):
+            out[col] = out[col].astype("float64")
+    if "CustomerID" in out.columns:
+        out["CustomerID"] = out["CustomerID"].astype("float64")
+    return out
+
+
+def memory_report(df):
+    """Per-column deep memory of ``df`` against its schema-less equivalent."""
+    before = as_inferred(df).memory_usage(deep=True, index=False)
+    after = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "before_bytes": before,
+        "after_bytes": after,
+    })
+    report.loc["TOTAL"] = ["", before.sum(), after.sum()]
+    report["ratio"] = (report["before_bytes"] / report["after_bytes"]).round(1)
+    return report
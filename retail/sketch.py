@@ -0,0 +1,241 @@
+"""Mergeable distinct-count structures for the Orders and Customers KPIs.
+
+Distinct counts cannot be summed across countries the way revenue can, so the
+cube alone cannot answer "unique customers in these five countries".  Instead
+each (Country, YearMonth) partition keeps a small structure per column, and a
+selection is answered by OR-ing the structures of its partitions:
+
+* ``Bitmap`` -- exact; one bit per dense id (a categorical code or a
+  factorized CustomerID) over the partition's own id span, unioned with
+  bitwise OR.
+* ``HyperLogLog`` -- approximate; ``2**p`` one-byte registers unioned with an
+  element-wise max, with a standard error of ``1.04 / sqrt(2**p)``.
+"""
+
+import numpy as np
+import pandas as pd
+
+EXACT = "exact"
+APPROX = "approx"
+MODES = (EXACT, APPROX)
+
+DEFAULT_PRECISION = 12
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class Bitmap:
+    """Exact set of dense non-negative integer ids, packed eight per byte.
+
+    Only the bytes from the one holding the smallest id are stored; byte 0
+    of ``bits`` covers ids ``8 * offset`` to ``8 * offset + 7``.  Invoice ids
+    are assigned in time order, so a month's bitmap would otherwise be
+    mostly leading zeros for every earlier invoice.
+    """
+
+    error_bound = 0.0
+
+    def __init__(self, bits, offset=0):
+        self.bits = bits
+        self.offset = offset  # in bytes
+
+    @classmethod
+    def from_codes(cls, codes):
+        if len(codes) == 0:
+            return cls(np.zeros(0, dtype=np.uint8))
+        offset = int(codes.min()) // 8
+        dense = np.zeros(int(codes.max()) + 1 - offset * 8, dtype=bool)
+        dense[codes - offset * 8] = True
+        return cls(np.packbits(dense), offset)
+
+    @classmethod
+    def union(cls, bitmaps):
+        bitmaps = [b for b in bitmaps if len(b.bits)]
+        if not bitmaps:
+            return cls(np.zeros(0, dtype=np.uint8))
+        # bitmaps of different partitions cover different id spans; bytes
+        # outside a bitmap's span are all zero
+        offset = min(b.offset for b in bitmaps)
+        out = np.zeros(max(b.offset + len(b.bits) for b in bitmaps) - offset, dtype=np.uint8)
+        for b in bitmaps:
+            out[b.offset - offset:b.offset - offset + len(b.bits)] |= b.bits
+        return cls(out, offset)
+
+    def __or__(self, other):
+        return Bitmap.union([self, other])
+
+    def count(self):
+        return int(_POPCOUNT[self.bits].sum(dtype=np.int64))
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+
+class HyperLogLog:
+    """HyperLogLog cardinality sketch over 64-bit hashes."""
+
+    def __init__(self, registers):
+        self.registers = registers
+
+    @property
+    def p(self):
+        return int(self.registers.size).bit_length() - 1
+
+    @property
+    def error_bound(self):
+        return 1.04 / np.sqrt(self.registers.size)
+
+    @classmethod
+    def empty(cls, p=DEFAULT_PRECISION):
+        return cls(np.zeros(1 << p, dtype=np.uint8))
+
+    @classmethod
+    def from_hashes(cls, hashes, p=DEFAULT_PRECISION):
+        sketch = cls.empty(p)
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if hashes.size:
+            idx = (hashes >> np.uint64(64 - p)).astype(np.intp)
+            rest = hashes & np.uint64((1 << (64 - p)) - 1)
+            # rank = position of the leftmost 1-bit in the remaining 64-p bits
+            msb = np.floor(np.log2(np.maximum(rest, 1).astype(np.float64))).astype(np.int64)
+            rank = np.where(rest == 0, 64 - p + 1, 64 - p - msb).astype(np.uint8)
+            np.maximum.at(sketch.registers, idx, rank)
+        return sketch
+
+    @classmethod
+    def union(cls, sketches):
+        sketches = list(sketches)
+        if not sketches:
+            return cls.empty()
+        return cls(np.maximum.reduce([s.registers for s in sketches]))
+
+    def __or__(self, other):
+        return HyperLogLog.union([self, other])
+
+    def count(self):
+        m = self.registers.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # small-range correction: linear counting is far more accurate here
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+    @property
+    def nbytes(self):
+        return self.registers.nbytes
+
+
+def hash_values(values):
+    """Stable 64-bit hashes of a Series of ids, independent of its dtype's encoding."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # hash each distinct value once, then gather by code
+        return hash_values(pd.Series(values.cat.categories))[values.cat.codes.to_numpy()]
+    if pd.api.types.is_integer_dtype(values):
+        return pd.util.hash_array(values.to_numpy(dtype=np.int64))
+    return pd.util.hash_array(values.to_numpy(dtype=object))
+
+
+def distinct_ids(values, mode, encoder=None):
+    """Per-row ids for a distinct-count structure: hashes (approx) or dense codes (exact)."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown distinct-count mode {mode!r}; expected one of {MODES}")
+    if mode == APPROX:
+        return hash_values(values)
+    if encoder is not None:
+        return encoder.encode(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy()
+    return pd.factorize(values)[0]
+
+
+class IdEncoder:
+    """Assigns dense integer ids to values as they are first seen.
+
+    Used when the id universe is not known up front (streaming and appends);
+    ids of values already seen never change, so earlier bitmaps stay valid.
+    """
+
+    def __init__(self):
+        self.index = pd.Index([], dtype=object)
+
+    def encode(self, values):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return self.encode(pd.Series(values.cat.categories))[values.cat.codes.to_numpy()]
+        values = pd.Index(values.to_numpy(dtype=object))
+        codes = self.index.get_indexer(values)
+        new = codes < 0
+        if new.any():
+            self.index = self.index.append(values[new].unique())
+            codes = self.index.get_indexer(values)
+        return codes
+
+
+class DistinctIndex:
+    """One Bitmap or HyperLogLog per (Country, YearMonth) partition."""
+
+    def __init__(self, mode, parts):
+        self.mode = mode
+        self.parts = parts  # {(country, year_month): sketch}
+
+    @classmethod
+    def from_frame(cls, df, column, mode, encoder=None, p=DEFAULT_PRECISION):
+        """Build the partitions of ``df[column]``.
+
+        In exact mode, indexes that will later be merged must share one
+        ``encoder`` so equal values map to the same bit; without one, ids are
+        the column's own categorical codes or factorization.
+        """
+        return cls.from_ids(df, distinct_ids(df[column], mode, encoder), mode, p)
+
+    @classmethod
+    def from_ids(cls, df, ids, mode, p=DEFAULT_PRECISION):
+        """Build the partitions of precomputed ``ids`` aligned with ``df``'s rows."""
+        if len(df) == 0:
+            return cls(mode, {})
+        countries = df["Country"].astype("category")
+        key = pd.MultiIndex.from_arrays([countries, df["YearMonth"]])
+        codes, uniques = key.factorize()
+        order = np.argsort(codes, kind="stable")
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        parts = {}
+        for group, rows in zip(uniques, np.split(order, bounds)):
+            if mode == APPROX:
+                parts[group] = HyperLogLog.from_hashes(ids[rows], p)
+            else:
+                parts[group] = Bitmap.from_codes(ids[rows])
+        return cls(mode, parts)
+
+    @property
+    def error_bound(self):
+        """Relative standard error of counts (0 for exact mode)."""
+        if self.mode == EXACT:
+            return 0.0
+        return next(iter(self.parts.values())).error_bound if self.parts else 0.0
+
+    @property
+    def nbytes(self):
+        return sum(part.nbytes for part in self.parts.values())
+
+    def merge(self, other):
+        """Partition-wise union with an index built from other rows."""
+        parts = dict(self.parts)
+        for key, sketch in other.parts.items():
+            parts[key] = parts[key] | sketch if key in parts else sketch
+        return DistinctIndex(self.mode, parts)
+
+    def union(self, countries=None, months=None):
+        """Union of every partition of ``countries`` (all when empty), optionally only ``months``."""
+        selected = set(countries) if countries else None
+        months = set(months) if months is not None else None
+        sketches = [
+            s for (country, year_month), s in self.parts.items()
+            if (selected is None or country in selected) and (months is None or year_month in months)
+        ]
+        kind = HyperLogLog if self.mode == APPROX else Bitmap
+        return kind.union(sketches)
+
+    def count(self, countries=None, months=None):
+        return self.union(countries, months).count()
@@ -0,0 +1,494 @@
+"""SQLite query backend: the cleaned rows on disk, aggregates pushed down.
+
+``open_sql`` folds the CSV chunk by chunk (the streaming ingest's cleaning)
+into one SQLite file next to the snapshot, indexed on (Country, InvoiceDate)
+and InvoiceDate, and rebuilds it only when the CSV's fingerprint changes.
+Nothing row-level is kept in memory: ``SqlSource`` serves the engine's read
+surface -- ``cube``, ``daily``, ``distinct()``, ``selected_rows()``,
+``product_index()``, ``customer_index()``, ``cohort_index()``,
+``basket_index()``, ``select()`` and ``window()`` -- by issuing aggregate
+queries whose country and date predicates SQLite evaluates against its
+indexes, so a selection reads only its rows and only the aggregated result
+crosses into pandas.
+
+Every aggregate query result is memoized per (SQL, parameters) in an
+``LRUCache``, so reruns and other sessions repeat no query.  Row-level reads
+-- ``select()`` and the index builds -- are streamed in chunks and never
+cached, so no row set outlives the call that asked for it.  The file is
+opened read-only and memory-mapped, so several Streamlit worker processes on
+one machine share a single copy of the data through the page cache, and the
+data may be larger than RAM.
+
+Distinct counts are always exact here (``COUNT(DISTINCT ...)``); the
+approximate mode answers with the exact count and a zero error bound.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from retail.baskets import BasketIndex
+from retail.cohorts import CohortIndex
+from retail.cube import RetailCube, empty_cube
+from retail.customers import CustomerIndex
+from retail.ingest import RAW_CSV
+from retail.memo import LRUCache
+from retail.products import ProductIndex
+from retail.schema import SCHEMA, apply_schema
+from retail.sketch import EXACT, IdEncoder
+from retail.store import CACHE_DIR, current_fingerprint
+from retail.streaming import DEFAULT_CHUNKSIZE, iter_clean_chunks
+from retail.timeseries import day_numbers
+
+logger = logging.getLogger(__name__)
+
+# Bump when the table layout or indexes change, so older files are rebuilt.
+SQL_LAYOUT_VERSION = 1
+QUERY_CACHE_SIZE = int(os.environ.get("RETAIL_SQL_CACHE_SIZE", "256"))
+MMAP_BYTES = 1 << 30
+
+COLUMNS = {
+    "InvoiceNo": "TEXT",
+    "StockCode": "TEXT",
+    "Description": "TEXT",
+    "Quantity": "INTEGER",
+    "InvoiceDate": "INTEGER",  # nanoseconds since 1970-01-01
+    "UnitPrice": "REAL",
+    "CustomerID": "INTEGER",
+    "Country": "TEXT",
+    "Revenue": "REAL",
+    "YearMonth": "INTEGER",
+    "Month": "INTEGER",
+    "DayOfWeek": "INTEGER",
+    "Hour": "INTEGER",
+    "Day": "INTEGER",  # days since 1970-01-01
+}
+DISTINCT_COLUMNS = ("InvoiceNo", "CustomerID")
+
+# Cube measures with a single-aggregate equivalent over the rows; Orders sums
+# per-cell distinct counts and so goes through the cube.
+TOTALS = {"Revenue": "SUM(Revenue)", "Quantity": "SUM(Quantity)", "Lines": "COUNT(*)"}
+
+
+def database_path(csv_path=RAW_CSV, cache_dir=CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, stem + ".sqlite")
+
+
+def _read_meta(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+    except sqlite3.Error:
+        return None
+    return json.loads(row[0]) if row else None
+
+
+def _write_meta(path, fingerprint):
+    meta = dict(fingerprint, sql_layout=SQL_LAYOUT_VERSION)
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (json.dumps(meta),))
+
+
+def _sql_rows(chunk):
+    """``chunk`` with the plain column types SQLite stores."""
+    rows = pd.DataFrame({
+        column: chunk[column].astype(object) if isinstance(chunk[column].dtype, pd.CategoricalDtype) else chunk[column]
+        for column in SCHEMA
+    })
+    rows["InvoiceDate"] = chunk["InvoiceDate"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    rows["Day"] = day_numbers(chunk["InvoiceDate"])
+    return rows
+
+
+def build_database(csv_path, path, fingerprint, chunksize=DEFAULT_CHUNKSIZE):
+    """Write the cleaned rows of ``csv_path`` to a fresh SQLite file at ``path``."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    rows = 0
+    with closing(sqlite3.connect(tmp)) as conn, conn:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(f"CREATE TABLE sales ({', '.join(f'{name} {kind}' for name, kind in COLUMNS.items())})")
+        for chunk in iter_clean_chunks(csv_path, chunksize):
+            _sql_rows(chunk).to_sql("sales", conn, if_exists="append", index=False)
+            rows += len(chunk)
+        conn.execute("CREATE INDEX sales_country_date ON sales (Country, InvoiceDate)")
+        conn.execute("CREATE INDEX sales_date ON sales (InvoiceDate)")
+        conn.execute("ANALYZE")
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    _write_meta(tmp, fingerprint)
+    os.replace(tmp, path)
+    logger.info("Loaded %d cleaned rows of %s into %s", rows, csv_path, path)
+
+
+class SqlStore:
+    """A read-only connection to the database plus the per-query result cache."""
+
+    def __init__(self, path, version, cache_size=QUERY_CACHE_SIZE):
+        self.path = path
+        self.version = version
+        self.cache = LRUCache(maxsize=cache_size)
+        # one connection shared by the server's threads; queries are serialized
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+        self._lock = threading.Lock()
+
+    def query(self, sql, params=()):
+        """Result of ``sql`` as a DataFrame, cached per (sql, params); do not mutate it."""
+        params = tuple(params)
+
+        def run():
+            with self._lock:
+                return pd.read_sql_query(sql, self._conn, params=params)
+
+        return self.cache.get_or_compute((sql, params), run)
+
+    def chunks(self, sql, params=(), chunksize=DEFAULT_CHUNKSIZE):
+        """Result of ``sql`` as DataFrames of at most ``chunksize`` rows, not cached.
+
+        The connection stays locked until the generator is exhausted or closed.
+        """
+        with self._lock:
+            yield from pd.read_sql_query(sql, self._conn, params=tuple(params), chunksize=chunksize)
+
+
+def open_sql(csv_path=RAW_CSV, cache_dir=CACHE_DIR, chunksize=DEFAULT_CHUNKSIZE):
+    """``SqlSource`` over the database of ``csv_path``, (re)built when stale."""
+    path = database_path(csv_path, cache_dir)
+    meta = _read_meta(path)
+    current = current_fingerprint(csv_path, meta)
+    fresh = (
+        meta is not None
+        and meta.get("sha256") == current["sha256"]
+        and meta.get("format_version") == current["format_version"]
+        and meta.get("sql_layout") == SQL_LAYOUT_VERSION
+    )
+    if not fresh:
+        os.makedirs(cache_dir, exist_ok=True)
+        build_database(csv_path, path, current, chunksize)
+    elif meta.get("mtime_ns") != current["mtime_ns"]:
+        _write_meta(path, current)
+    return SqlSource(SqlStore(path, current["sha256"][:12]))
+
+
+def where(countries=None, start=None, stop=None, months=None):
+    """``WHERE`` clause and parameters for the predicates that are set."""
+    clauses, params = [], []
+    if countries:
+        countries = sorted(set(countries))
+        clauses.append(f"Country IN ({', '.join('?' * len(countries))})")
+        params += countries
+    if start is not None:
+        clauses.append("InvoiceDate >= ?")
+        params.append(pd.Timestamp(start).value)
+    if stop is not None:
+        clauses.append("InvoiceDate < ?")
+        params.append(pd.Timestamp(stop).value)
+    if months is not None:
+        # a month is an InvoiceDate range, which the (Country, InvoiceDate)
+        # index serves; YearMonth itself is not indexed
+        months = [pd.Period(ordinal=int(month), freq="M") for month in sorted(set(months))]
+        clauses.append("(" + " OR ".join(["(InvoiceDate >= ? AND InvoiceDate < ?)"] * len(months)) + ")" if months else "0")
+        for month in months:
+            params += [month.start_time.value, (month + 1).start_time.value]
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+class SqlSource:
+    """The engine's read surface over ``store``, limited to ``[start, stop)``."""
+
+    def __init__(self, store, start=None, stop=None):
+        self.store = store
+        self.start = start
+        self.stop = stop
+        self.cube = SqlCube(self)
+        self.daily = SqlDaily(self)
+        self._products = None
+        self._customers = None
+        self._cohorts = None
+        self._baskets = None
+        self._lock = threading.Lock()
+        if start is None and stop is None:
+            self.version = store.version
+        else:
+            bounds = "..".join("" if bound is None else pd.Timestamp(bound).strftime("%Y-%m-%d") for bound in (start, stop))
+            self.version = f"{store.version}@{bounds}"
+
+    def query(self, sql, countries=None, months=None):
+        """Run ``sql`` (with a ``{where}`` placeholder) under this source's predicates."""
+        clause, params = where(countries, self.start, self.stop, months)
+        return self.store.query(sql.format(where=clause), params)
+
+    def chunks(self, sql, countries=None):
+        """Run ``sql`` like ``query`` but uncached and chunked, with Country as a categorical.
+
+        For the row-sized reads an index is built from, which would otherwise
+        stay in the query cache next to the index made of them.
+        """
+        names = pd.Index(self.countries)  # before the store is locked for the chunks
+        clause, params = where(countries, self.start, self.stop)
+        for chunk in self.store.chunks(sql.format(where=clause), params):
+            if "Country" in chunk:
+                chunk["Country"] = pd.Categorical.from_codes(names.get_indexer(chunk["Country"]), names)
+            yield chunk
+
+    def read(self, sql, countries=None):
+        """All chunks of ``sql`` in one frame; None when there are no rows."""
+        chunks = list(self.chunks(sql, countries))
+        return pd.concat(chunks, ignore_index=True) if chunks else None
+
+    def scalar(self, sql, countries=None, months=None):
+        value = self.query(sql, countries, months).iat[0, 0]
+        return 0 if pd.isna(value) else value
+
+    @property
+    def countries(self):
+        return self.query("SELECT DISTINCT Country FROM sales{where} ORDER BY Country")["Country"].tolist()
+
+    @property
+    def products(self):
+        return int(self.scalar("SELECT COUNT(DISTINCT StockCode) FROM sales{where}"))
+
+    @property
+    def rows(self):
+        return int(self.scalar("SELECT COUNT(*) FROM sales{where}"))
+
+    def selected_rows(self, countries=None):
+        return int(self.scalar("SELECT COUNT(*) FROM sales{where}", countries))
+
+    def distinct(self, column, mode):
+        if column not in DISTINCT_COLUMNS:
+            raise ValueError(f"No distinct counts for {column!r}; expected one of {DISTINCT_COLUMNS}")
+        return SqlDistinct(self, column)
+
+    def select(self, countries=None, start=None, stop=None):
+        """Cleaned rows for ``countries`` dated in ``[start, stop)`` (within this source's window)."""
+        source = self.window(start, stop) if start is not None or stop is not None else self
+        rows = source.read("SELECT * FROM sales{where} ORDER BY Country, InvoiceDate", countries)
+        if rows is None:
+            rows = source.query("SELECT * FROM sales LIMIT 0")
+        rows = rows.drop(columns="Day").assign(InvoiceDate=pd.to_datetime(rows["InvoiceDate"], unit="ns"))
+        return apply_schema(rows)
+
+    def window(self, start=None, stop=None):
+        """This source narrowed to invoices dated in ``[start, stop)``."""
+        if self.start is not None:
+            start = self.start if start is None else max(pd.Timestamp(start), pd.Timestamp(self.start))
+        if self.stop is not None:
+            stop = self.stop if stop is None else min(pd.Timestamp(stop), pd.Timestamp(self.stop))
+        return SqlSource(self.store, start, stop)
+
+    def product_index(self):
+        """ProductIndex from two grouped queries, built on first use."""
+        with self._lock:
+            if self._products is None:
+                self._products = self._product_index()
+            return self._products
+
+    def _product_index(self):
+        descriptions = self.read(
+            "SELECT StockCode, Description, COUNT(*) AS Lines FROM sales{where} GROUP BY StockCode, Description"
+        )
+        if descriptions is None:
+            return ProductIndex.empty()
+        codes = pd.Index(np.sort(descriptions["StockCode"].unique()))
+        parts = [
+            pd.DataFrame({
+                "Country": chunk["Country"],
+                "YearMonth": chunk["YearMonth"].to_numpy().astype(np.int32),
+                "product": codes.get_indexer(chunk["StockCode"]).astype(np.int32),
+                "Revenue": chunk["Revenue"].to_numpy(),
+                "Quantity": chunk["Quantity"].to_numpy().astype(np.int64),
+            })
+            for chunk in self.chunks(
+                "SELECT Country, YearMonth, StockCode, SUM(Revenue) AS Revenue, SUM(Quantity) AS Quantity "
+                "FROM sales{where} GROUP BY Country, YearMonth, StockCode"
+            )
+        ]
+        sales = pd.concat(parts, ignore_index=True).sort_values(["Country", "YearMonth", "product"], ignore_index=True)
+        descriptions = descriptions.dropna(subset=["Description"])
+        descriptions = pd.Series(
+            descriptions["Lines"].to_numpy(),
+            index=pd.MultiIndex.from_arrays(
+                [codes.get_indexer(descriptions["StockCode"]), descriptions["Description"]],
+                names=["product", "Description"],
+            ),
+        )
+        return ProductIndex(codes, sales, descriptions)
+
+    def customer_index(self):
+        """CustomerIndex from one grouped query, built on first use."""
+        with self._lock:
+            if self._customers is None:
+                table = self.read(
+                    "SELECT Country, CustomerID AS customer, MAX(InvoiceDate) AS Last, "
+                    "COUNT(DISTINCT InvoiceNo) AS Orders, SUM(Revenue) AS Revenue "
+                    "FROM sales{where} GROUP BY Country, CustomerID"
+                )
+                if table is None:
+                    self._customers = CustomerIndex.empty()
+                else:
+                    self._customers = CustomerIndex(table.assign(
+                        customer=table["customer"].astype(np.int64),
+                        Last=pd.to_datetime(table["Last"], unit="ns"),
+                        Orders=table["Orders"].astype(np.int64),
+                    ))
+            return self._customers
+
+    def cohort_index(self):
+        """CohortIndex from one grouped query, built on first use."""
+        with self._lock:
+            if self._cohorts is None:
+                table = self.read(
+                    "SELECT Country, CustomerID AS customer, YearMonth, SUM(Revenue) AS Revenue "
+                    "FROM sales{where} GROUP BY Country, CustomerID, YearMonth"
+                )
+                if table is None:
+                    self._cohorts = CohortIndex.empty()
+                else:
+                    self._cohorts = CohortIndex(table.astype({"customer": "int64", "YearMonth": "int32"}))
+            return self._cohorts
+
+    def basket_index(self):
+        """BasketIndex of the (invoice, product) lines, product ids as in ``product_index()``.
+
+        The lines are read in chunks and kept only as integer codes until the
+        incidence matrix is built.
+        """
+        codes = self.product_index().codes
+        with self._lock:
+            if self._baskets is None:
+                invoices = IdEncoder()
+                invoice, product, country = [], [], []
+                names = None
+                for chunk in self.chunks("SELECT InvoiceNo, StockCode, Country FROM sales{where}"):
+                    invoice.append(invoices.encode(chunk["InvoiceNo"]).astype(np.int32))
+                    product.append(codes.get_indexer(chunk["StockCode"]).astype(np.int32))
+                    country.append(chunk["Country"].cat.codes.to_numpy())
+                    names = chunk["Country"].cat.categories
+                if not invoice:
+                    self._baskets = BasketIndex.empty()
+                else:
+                    self._baskets = BasketIndex.from_ids(
+                        np.concatenate(invoice),
+                        np.concatenate(product),
+                        pd.Categorical.from_codes(np.concatenate(country), names),
+                        (len(invoices.index), len(codes)),
+                    ).precompute()
+            return self._baskets
+
+
+class SqlCube:
+    """``RetailCube`` reads answered by a GROUP BY over the selected rows."""
+
+    def __init__(self, source):
+        self.source = source
+
+    @property
+    def countries(self):
+        return self.source.countries
+
+    def slice(self, countries):
+        cells = self.source.query(
+            "SELECT Country, YearMonth, DayOfWeek, Hour, SUM(Revenue) AS Revenue, SUM(Quantity) AS Quantity, "
+            "COUNT(DISTINCT InvoiceNo) AS Orders, COUNT(*) AS Lines "
+            "FROM sales{where} GROUP BY Country, YearMonth, DayOfWeek, Hour",
+            countries,
+        )
+        if cells.empty:
+            return empty_cube()
+        return RetailCube(cells.astype({
+            "Country": "category",
+            "YearMonth": "int32",
+            "DayOfWeek": "int8",
+            "Hour": "int8",
+            "Quantity": "int64",
+            "Orders": "int64",
+            "Lines": "int64",
+        }))
+
+    def rollup(self, dim, measure="Revenue"):
+        return self.slice(None).rollup(dim, measure)
+
+    def total(self, measure):
+        if measure in TOTALS:
+            return self.source.scalar(f"SELECT {TOTALS[measure]} FROM sales{{where}}")
+        return self.slice(None).total(measure)
+
+    @property
+    def nbytes(self):
+        return 0  # nothing is held; results live in the query cache
+
+
+class SqlDaily:
+    """``DailyRevenue`` reads answered by per-day and per-month GROUP BYs."""
+
+    def __init__(self, source):
+        self.source = source
+
+    def _bounds(self):
+        bounds = self.source.query("SELECT MIN(Day) AS first, MAX(Day) AS last FROM sales{where}")
+        return bounds.iat[0, 0], bounds.iat[0, 1]
+
+    @property
+    def first_day(self):
+        first, _ = self._bounds()
+        return 0 if pd.isna(first) else int(first)
+
+    @property
+    def last_day(self):
+        _, last = self._bounds()
+        return -1 if pd.isna(last) else int(last)
+
+    def daily(self, countries=None):
+        """Daily revenue of ``countries`` (all when empty), idle days inside the span filled with 0."""
+        days = self.source.query("SELECT Day, SUM(Revenue) AS Revenue FROM sales{where} GROUP BY Day", countries)
+        if days.empty:
+            return pd.Series([], dtype="float64", index=pd.PeriodIndex([], freq="D"), name="Revenue")
+        first, last = int(days["Day"].min()), int(days["Day"].max())
+        values = np.zeros(last - first + 1)
+        values[days["Day"].to_numpy() - first] = days["Revenue"].to_numpy()
+        index = pd.period_range(pd.Period(ordinal=first, freq="D"), periods=len(values), freq="D")
+        return pd.Series(values, index=index, name="Revenue")
+
+    def monthly(self):
+        """Revenue per country (rows) and calendar month (PeriodIndex columns)."""
+        revenue = self.source.query(
+            "SELECT Country, YearMonth, SUM(Revenue) AS Revenue FROM sales{where} GROUP BY Country, YearMonth"
+        )
+        if revenue.empty:
+            return pd.DataFrame(index=pd.Index([], name="Country"), columns=pd.PeriodIndex([], freq="M"))
+        matrix = revenue.pivot(index="Country", columns="YearMonth", values="Revenue")
+        months = range(int(revenue["YearMonth"].min()), int(revenue["YearMonth"].max()) + 1)
+        matrix = matrix.reindex(columns=months, fill_value=0).fillna(0)
+        matrix.columns = pd.PeriodIndex([pd.Period(ordinal=month, freq="M") for month in months], freq="M")
+        return matrix
+
+    @property
+    def nbytes(self):
+        return 0
+
+
+class SqlDistinct:
+    """``DistinctIndex`` reads answered by ``COUNT(DISTINCT column)``."""
+
+    mode = EXACT
+    error_bound = 0.0
+    nbytes = 0
+
+    def __init__(self, source, column):
+        self.source = source
+        self.column = column
+
+    def count(self, countries=None, months=None):
+        return int(self.source.scalar(f"SELECT COUNT(DISTINCT {self.column}) FROM sales{{where}}", countries, months))
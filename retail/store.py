@@ -0,0 +1,195 @@
+"""Persistent columnar snapshot of the cleaned retail frame.
+
+Parsing ``OnlineRetail.csv`` and deriving the time features takes several
+seconds; reading the cleaned result back from an uncompressed Arrow IPC
+(Feather v2) file is a memory-mapped read.  Each snapshot carries a sidecar
+JSON with the fingerprint of the CSV it was built from, and is rebuilt only
+when that fingerprint no longer matches.  Rows are stored partitioned by
+country (see ``retail.partition``) so selections are contiguous slices.
+
+The file is written as a single record batch, so every column -- numbers,
+timestamps and the codes of the categoricals -- comes back from
+``map_frame`` as a read-only numpy view of the mapped pages rather than a
+copy.  Every session and every server process that opens the snapshot
+attaches to the same page-cache copy of the data: memory stays flat as
+workers are added, and only the small category dictionaries and the derived
+aggregates are per process.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import pandas as pd
+from pyarrow import feather
+
+from retail.ingest import CLEANING_VERSION, RAW_CSV, clean, read_raw
+from retail.partition import partition_by_country
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get("RETAIL_CACHE_DIR", ".retail_cache")
+
+# Snapshots are rebuilt when either the cleaning rules or the on-disk row
+# layout (LAYOUT_VERSION, bumped when the sort order or chunking changes) differ.
+LAYOUT_VERSION = 2
+FORMAT_VERSION = f"{CLEANING_VERSION}.{LAYOUT_VERSION}"
+_HASH_BLOCK = 1 << 20
+
+
+@dataclass
+class Snapshot:
+    frame: pd.DataFrame
+    fingerprint: dict
+    rebuilt: bool
+
+    @property
+    def version(self):
+        """Short content-derived identifier of the dataset."""
+        return self.fingerprint["sha256"][:12]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path):
+    """Size, mtime and content hash of ``path``."""
+    stat = os.stat(path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_sha256(path),
+        "format_version": FORMAT_VERSION,
+    }
+
+
+def _snapshot_paths(csv_path, cache_dir):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    base = os.path.join(cache_dir, stem)
+    return base + ".feather", base + ".meta.json"
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def write_atomic(path, write):
+    # per-process temporary name: workers starting together may both write
+    tmp = f"{path}.{os.getpid()}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on ``path`` against every other process and thread.
+
+    The lock file is created if needed and left in place; a lock is released
+    when the holder exits the block or dies.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _write_meta(meta_path, meta):
+    def write(tmp):
+        with open(tmp, "w") as fh:
+            json.dump(meta, fh, indent=2)
+
+    write_atomic(meta_path, write)
+
+
+def current_fingerprint(csv_path, meta):
+    """Fingerprint of ``csv_path``, reusing the stored hash when stat is unchanged.
+
+    Hashing the CSV is the only expensive part of the check, so it is skipped
+    when size and mtime both match what the snapshot was built from.  A touched
+    but otherwise identical file costs one hash and keeps its snapshot.
+    """
+    stat = os.stat(csv_path)
+    if (
+        meta is not None
+        and meta.get("format_version") == FORMAT_VERSION
+        and meta.get("size") == stat.st_size
+        and meta.get("mtime_ns") == stat.st_mtime_ns
+    ):
+        return dict(meta)
+    return fingerprint(csv_path)
+
+
+def map_frame(data_path):
+    """The snapshot at ``data_path`` with every column a read-only view of the mapped file."""
+    table = feather.read_table(data_path, memory_map=True)
+    return table.to_pandas(split_blocks=True, self_destruct=False)
+
+
+def load_snapshot(csv_path=RAW_CSV, cache_dir=CACHE_DIR):
+    """Return the cleaned frame for ``csv_path``, rebuilding the snapshot if stale."""
+    data_path, meta_path = _snapshot_paths(csv_path, cache_dir)
+    meta = _read_meta(meta_path)
+    current = current_fingerprint(csv_path, meta)
+
+    fresh = (
+        meta is not None
+        and os.path.exists(data_path)
+        and meta.get("sha256") == current["sha256"]
+        and meta.get("format_version") == current["format_version"]
+    )
+    if fresh:
+        frame = map_frame(data_path)
+        if meta.get("mtime_ns") != current["mtime_ns"]:
+            _write_meta(meta_path, current)
+        return Snapshot(frame, current, rebuilt=False)
+
+    logger.info("Rebuilding snapshot of %s", csv_path)
+    frame = partition_by_country(clean(read_raw(csv_path)))
+    # python -m retail.memreport compares against the schema-less frame
+    logger.info(
+        "Cleaned frame: %d rows, %.1f MiB", len(frame), frame.memory_usage(deep=True).sum() / 2**20
+    )
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_atomic(
+            data_path,
+            lambda tmp: feather.write_feather(
+                frame, tmp, compression="uncompressed", chunksize=max(len(frame), 1)
+            ),
+        )
+        _write_meta(meta_path, current)
+    except OSError as exc:
+        logger.warning("Could not persist snapshot to %s: %s", cache_dir, exc)
+        return Snapshot(frame, current, rebuilt=True)
+    # the builder attaches to the published file too, instead of keeping its
+    # private copy of the rows
+    return Snapshot(map_frame(data_path), current, rebuilt=True)
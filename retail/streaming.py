@@ -0,0 +1,150 @@
+"""Chunked ingest that folds the CSV straight into dashboard aggregates.
+
+``load_snapshot`` holds every cleaned row in memory, which is fine for the
+UCI export but not for multi-year, multi-store exports.  ``stream_aggregates``
+reads the CSV ``chunksize`` rows at a time, cleans each chunk with the same
+rules as the snapshot path and keeps only what the page renders: a
+``RetailCube`` of the chunk sums, the daily revenue matrix and per-partition
+distinct-count structures for invoices and customers.  Peak memory is bounded
+by the chunk size and the number of distinct keys, not by the length of the
+file; market baskets are kept as per-country product pair counts
+(``retail.baskets``).
+"""
+
+import logging
+from dataclasses import dataclass
+
+import pandas as pd
+
+from retail.baskets import PairCounts, split_open_invoice
+from retail.cohorts import CohortIndex
+from retail.cube import RetailCube, empty_cube
+from retail.customers import CustomerIndex
+from retail.ingest import CSV_ENCODING, RAW_CSV, clean
+from retail.parallel import build_aggregates
+from retail.products import ProductIndex
+from retail.schema import RAW_DTYPES
+from retail.sketch import MODES, IdEncoder
+from retail.store import fingerprint
+from retail.timeseries import DailyRevenue
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNKSIZE = 250_000
+DISTINCT_COLUMNS = ("InvoiceNo", "CustomerID")
+BASKET_COLUMNS = ["InvoiceNo", "StockCode", "Country"]
+
+# Partial cubes are re-reduced once this many have piled up, so the fold
+# never holds more than a handful of per-chunk groupby results.
+_COMBINE_EVERY = 8
+
+
+def _fold(parts, part):
+    """Append ``part`` to ``parts``, re-reducing them once enough pile up."""
+    parts.append(part)
+    if len(parts) >= _COMBINE_EVERY:
+        parts[:] = [type(part).concat(parts)]
+
+
+def _combine(parts, empty):
+    """Reduce the folded ``parts``, or ``empty()`` if nothing was read."""
+    return type(parts[0]).concat(parts) if parts else empty()
+
+
+@dataclass
+class StreamAggregates:
+    version: str
+    cube: RetailCube
+    daily: DailyRevenue
+    sketches: dict  # (column, mode) -> DistinctIndex
+    catalog: ProductIndex
+    customers: CustomerIndex
+    cohorts: CohortIndex
+    baskets: PairCounts
+    rows: int
+
+    # The same read surface as RetailDataset, so the engine serves both.
+
+    @property
+    def countries(self):
+        return self.cube.countries
+
+    def distinct(self, column, mode):
+        return self.sketches[(column, mode)]
+
+    @property
+    def products(self):
+        return len(self.catalog.codes)
+
+    def product_index(self):
+        return self.catalog
+
+    def customer_index(self):
+        return self.customers
+
+    def cohort_index(self):
+        return self.cohorts
+
+    def basket_index(self):
+        return self.baskets
+
+    def selected_rows(self, countries=None):
+        return int(self.cube.slice(countries).total("Lines"))
+
+
+def iter_clean_chunks(path=RAW_CSV, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield cleaned frames of at most ``chunksize`` raw rows each."""
+    reader = pd.read_csv(path, encoding=CSV_ENCODING, dtype=RAW_DTYPES, chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            yield clean(chunk)
+
+
+def stream_aggregates(path=RAW_CSV, chunksize=DEFAULT_CHUNKSIZE):
+    """Fold ``path`` into a StreamAggregates without materialising all rows."""
+    version = fingerprint(path)["sha256"][:12]
+    parts = []
+    daily = DailyRevenue.empty()
+    distinct = {}
+    encoders = {column: IdEncoder() for column in (*DISTINCT_COLUMNS, "StockCode")}
+    catalogs = []
+    customer_parts = []
+    cohort_parts = []
+    basket_parts = []
+    open_invoice = None  # trailing lines of the last chunk's last invoice
+    rows = 0
+
+    keys = [(column, mode) for column in DISTINCT_COLUMNS for mode in MODES]
+
+    def fold(lines):
+        nonlocal daily
+        aggregates = build_aggregates(lines, keys, encoders)
+        _fold(parts, aggregates.cube)
+        daily = daily.merge(aggregates.daily)
+        for key, part in aggregates.distinct.items():
+            distinct[key] = distinct[key].merge(part) if key in distinct else part
+        _fold(catalogs, ProductIndex.from_frame(lines, encoders["StockCode"]))
+        _fold(customer_parts, CustomerIndex.from_frame(lines, encoders["CustomerID"]))
+        _fold(cohort_parts, CohortIndex.from_frame(lines, encoders["CustomerID"]))
+        _fold(basket_parts, PairCounts.from_frame(lines[BASKET_COLUMNS], encoders["StockCode"]))
+
+    for chunk in iter_clean_chunks(path, chunksize):
+        rows += len(chunk)
+        # an invoice cut by a chunk boundary is held back until it is
+        # complete, so every aggregate sees whole invoices: it counts once in
+        # the cube's and the customers' Orders and is one basket
+        if open_invoice is not None:
+            chunk = pd.concat([open_invoice, chunk], ignore_index=True)
+        lines, open_invoice = split_open_invoice(chunk)
+        if len(lines):
+            fold(lines)
+    if open_invoice is not None and len(open_invoice):
+        fold(open_invoice)
+
+    cube = _combine(parts, empty_cube)
+    catalog = _combine(catalogs, ProductIndex.empty)
+    customers = _combine(customer_parts, CustomerIndex.empty)
+    cohorts = _combine(cohort_parts, CohortIndex.empty)
+    baskets = _combine(basket_parts, PairCounts.empty).precompute()
+    logger.info("Streamed %d cleaned rows of %s into %d cells", rows, path, len(cube.cells))
+    return StreamAggregates(version, cube, daily, distinct, catalog, customers, cohorts, baskets, rows)
@@ -0,0 +1,155 @@
+"""Calendar revenue series at daily, weekly and monthly granularity.
+
+``DailyRevenue`` is a dense Country x Day matrix of revenue built with one
+``bincount`` over the rows.  A country selection sums a handful of matrix
+rows into one daily series, and every coarser granularity is a single
+period groupby of that series, so switching granularity never touches the
+transactions again.  Periods are true calendar periods: December 2010 and
+December 2011 are different months.
+
+The export ends on 9 December 2011 and a date window may start or end
+mid-month, so anything fitted or compared per month first drops the months
+the data only partly covers (``complete_months``).
+"""
+
+import numpy as np
+import pandas as pd
+
+FREQUENCIES = {"Monthly": "M", "Weekly": "W", "Daily": "D"}
+
+
+def day_numbers(dates):
+    return dates.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+
+
+class DailyRevenue:
+    """Revenue per country (rows) and calendar day (columns)."""
+
+    def __init__(self, countries, first_day, matrix):
+        self.countries = list(countries)
+        self.first_day = int(first_day)  # days since 1970-01-01 of column 0
+        self.matrix = matrix
+
+    @classmethod
+    def empty(cls):
+        return cls([], 0, np.zeros((0, 0)))
+
+    @classmethod
+    def from_frame(cls, df):
+        countries = df["Country"].astype("category").cat.remove_unused_categories()
+        days = day_numbers(df["InvoiceDate"])
+        if len(days) == 0:
+            return cls.empty()
+        first_day = days.min()
+        width = int(days.max() - first_day) + 1
+        cells = countries.cat.codes.to_numpy().astype(np.int64) * width + (days - first_day)
+        matrix = np.bincount(
+            cells, weights=df["Revenue"].to_numpy(), minlength=len(countries.cat.categories) * width
+        ).reshape(-1, width)
+        return cls(countries.cat.categories, first_day, matrix)
+
+    @property
+    def last_day(self):
+        return self.first_day + self.matrix.shape[1] - 1
+
+    def merge(self, other):
+        """Sum with a series built from other rows (countries and days may differ)."""
+        if not other.countries:
+            return self
+        if not self.countries:
+            return other
+        countries = sorted(set(self.countries) | set(other.countries))
+        first_day = min(self.first_day, other.first_day)
+        width = max(self.last_day, other.last_day) - first_day + 1
+        matrix = np.zeros((len(countries), width))
+        position = {country: i for i, country in enumerate(countries)}
+        for part in (self, other):
+            rows = [position[c] for c in part.countries]
+            offset = part.first_day - first_day
+            matrix[rows, offset:offset + part.matrix.shape[1]] += part.matrix
+        return DailyRevenue(countries, first_day, matrix)
+
+    def daily(self, countries=None):
+        """Daily revenue of ``countries`` (all when empty), without leading/trailing idle days."""
+        if countries:
+            wanted = set(countries)
+            selected = [i for i, country in enumerate(self.countries) if country in wanted]
+            values = self.matrix[selected].sum(axis=0)
+        else:
+            values = self.matrix.sum(axis=0)
+        active = np.flatnonzero(values)
+        if len(active) == 0:
+            return pd.Series([], dtype="float64", index=pd.PeriodIndex([], freq="D"), name="Revenue")
+        values = values[active[0]:active[-1] + 1]
+        index = pd.period_range(
+            pd.Period(ordinal=self.first_day + int(active[0]), freq="D"), periods=len(values), freq="D"
+        )
+        return pd.Series(values, index=index, name="Revenue")
+
+    def monthly(self):
+        """Revenue per country (rows) and calendar month (PeriodIndex columns)."""
+        if not self.countries:
+            return pd.DataFrame(index=pd.Index([], name="Country"), columns=pd.PeriodIndex([], freq="M"))
+        days = pd.period_range(pd.Period(ordinal=self.first_day, freq="D"), periods=self.matrix.shape[1], freq="D")
+        months = days.asfreq("M")
+        starts = np.flatnonzero(np.r_[True, months.asi8[1:] != months.asi8[:-1]])
+        return pd.DataFrame(
+            np.add.reduceat(self.matrix, starts, axis=1),
+            index=pd.Index(self.countries, name="Country"),
+            columns=months[starts],
+        )
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes
+
+
+def monthly_by(frames, column):
+    """Revenue per value of categorical ``column`` (rows) and calendar month, over ``frames``."""
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame(index=pd.Index([], name=column), columns=pd.PeriodIndex([], freq="M"))
+    keys = pd.api.types.union_categoricals([frame[column] for frame in frames], ignore_order=True)
+    months = np.concatenate([frame["YearMonth"].to_numpy() for frame in frames]).astype(np.int64)
+    revenue = np.concatenate([frame["Revenue"].to_numpy() for frame in frames])
+    first_month = months.min()
+    width = int(months.max() - first_month) + 1
+    matrix = np.bincount(
+        keys.codes.astype(np.int64) * width + (months - first_month),
+        weights=revenue,
+        minlength=len(keys.categories) * width,
+    ).reshape(-1, width)
+    return pd.DataFrame(
+        matrix,
+        index=pd.Index(keys.categories, name=column),
+        columns=pd.period_range(pd.Period(ordinal=first_month, freq="M"), periods=width, freq="M"),
+    )
+
+
+def resample(daily, freq):
+    """Re-bucket a daily PeriodIndex series into ``freq`` ("D", "W" or "M") periods."""
+    if freq == "D":
+        return daily
+    return daily.groupby(daily.index.asfreq(freq)).sum()
+
+
+def revenue_series(daily):
+    """The daily series at every granularity in FREQUENCIES."""
+    return {label: resample(daily, freq) for label, freq in FREQUENCIES.items()}
+
+
+def complete_months(monthly, first_day, last_day):
+    """``monthly`` without end months the days ``first_day``..``last_day`` only partly cover.
+
+    ``monthly`` is a Series of months or a frame with month columns (as from
+    ``DailyRevenue.monthly()``); the days are counted since 1970-01-01, like
+    ``DailyRevenue.first_day``.
+    """
+    first_day, last_day = (pd.Period(ordinal=int(day), freq="D") for day in (first_day, last_day))
+    months = monthly.columns if isinstance(monthly, pd.DataFrame) else monthly.index
+    keep = np.ones(len(months), dtype=bool)
+    if len(months) and months[-1].end_time.normalize() > last_day.start_time:
+        keep[-1] = False
+    if len(months) and months[0].start_time < first_day.start_time:
+        keep[0] = False
+    return monthly.loc[:, keep] if isinstance(monthly, pd.DataFrame) else monthly[keep]
@@ -0,0 +1,37 @@
+"""Fixtures shared by the test modules.
+
+Tests run on a 50k-line synthetic export: ``pytest tests``.
+"""
+
+import pytest
+
+from benchmarks.synthetic import synthetic_csv, synthetic_retail
+from retail import engine
+from retail.ingest import clean
+
+ROWS = 50_000
+SELECTIONS = [[], ["United Kingdom"], ["France", "Germany"]]
+
+
+@pytest.fixture(scope="session")
+def rows():
+    """The cleaned synthetic export."""
+    return clean(synthetic_retail(ROWS))
+
+
+@pytest.fixture(scope="session")
+def export(tmp_path_factory):
+    """Path of the synthetic export as a CSV file."""
+    return synthetic_csv(ROWS, str(tmp_path_factory.mktemp("export")))
+
+
+@pytest.fixture(scope="session")
+def dataset(export, tmp_path_factory):
+    """The live dataset of the export, opened the way the page opens it."""
+    return engine.open_dataset(export, str(tmp_path_factory.mktemp("cache")))[0]
+
+
+@pytest.fixture(params=SELECTIONS, ids=["all", "one", "two"])
+def countries(request):
+    """A country selection: all countries, one, and several."""
+    return request.param
@@ -0,0 +1,44 @@
+"""Co-purchase pairs against a brute-force self-join, and streamed pair counts against the basket index."""
+
+import numpy as np
+import pandas as pd
+
+from retail.baskets import BasketIndex, PairCounts, co_purchases, split_open_invoice
+from retail.sketch import IdEncoder
+
+
+def pandas_pairs(df):
+    lines = df[["InvoiceNo", "StockCode"]].astype(str).drop_duplicates()
+    pairs = lines.merge(lines, on="InvoiceNo")
+    pairs = pairs[pairs["StockCode_x"] < pairs["StockCode_y"]]
+    return pairs.groupby(["StockCode_x", "StockCode_y"]).size()
+
+
+def test_co_purchases_match_brute_force(rows):
+    products = IdEncoder()
+    index = BasketIndex.from_frame(rows, products)
+    rules = co_purchases(index.incidence, top_k=10**6, block=64)
+    assert len(rules.pairs)
+    codes = products.index.astype(str)
+    first = np.asarray(codes[rules.pairs["product"]])
+    second = np.asarray(codes[rules.pairs["partner"]])
+    found = pd.Series(rules.pairs["Baskets"].to_numpy(), index=pd.MultiIndex.from_arrays(
+        [np.minimum(first, second), np.maximum(first, second)]
+    )).sort_index()
+    expected = pandas_pairs(rows)
+    expected = expected[expected >= rules.min_baskets].sort_index()
+    np.testing.assert_array_equal(found.index.to_flat_index(), expected.index.to_flat_index())
+    np.testing.assert_array_equal(found.to_numpy(), expected.to_numpy())
+
+
+def test_streamed_pair_counts_match_basket_index(rows, countries):
+    products = IdEncoder()
+    index = BasketIndex.from_frame(rows, products)
+    parts, open_invoice = [], rows.iloc[:0]
+    for start in range(0, len(rows), 7_777):
+        lines, open_invoice = split_open_invoice(pd.concat([open_invoice, rows.iloc[start:start + 7_777]]))
+        parts.append(PairCounts.from_frame(lines, products))
+    parts.append(PairCounts.from_frame(open_invoice, products))
+    expected, actual = index.rules(countries), PairCounts.concat(parts).rules(countries)
+    assert actual.baskets == expected.baskets
+    pd.testing.assert_frame_equal(actual.pairs, expected.pairs, check_dtype=False)
@@ -0,0 +1,26 @@
+"""Cohort matrices against a pandas pivot of the rows."""
+
+import numpy as np
+import pandas as pd
+
+from retail.cohorts import CohortIndex, cohort_matrix
+
+
+def pandas_pivot(df, countries=None):
+    if countries:
+        df = df[df["Country"].isin(countries)]
+    month = df["YearMonth"].astype(np.int64)
+    first = month.groupby(df["CustomerID"]).transform("min")
+    rows = pd.DataFrame({"Cohort": first, "MonthsSince": month - first, "CustomerID": df["CustomerID"],
+                         "Revenue": df["Revenue"]})
+    grouped = rows.groupby(["Cohort", "MonthsSince"])
+    return grouped["Revenue"].sum().unstack(), grouped["CustomerID"].nunique().unstack()
+
+
+def test_cohort_matrix_matches_pivot(rows, countries):
+    revenue, customers = pandas_pivot(rows, countries)
+    cohorts = cohort_matrix(CohortIndex.from_frame(rows), countries)
+    assert list(revenue.index) == [period.ordinal for period in cohorts.revenue.index]
+    columns = cohorts.revenue.columns
+    np.testing.assert_allclose(revenue.reindex(columns=columns).fillna(0), cohorts.revenue.fillna(0))
+    np.testing.assert_array_equal(customers.reindex(columns=columns).fillna(0), cohorts.customers.fillna(0))
@@ -0,0 +1,50 @@
+"""RFM scores and the Pareto curve against a pandas reduction of the rows."""
+
+import numpy as np
+import pandas as pd
+
+from retail.customers import SEGMENT_NAMES, CustomerIndex, customer_view, pareto, quintiles
+from retail.sketch import IdEncoder
+
+
+def pandas_customers(df, countries=None):
+    if countries:
+        df = df[df["Country"].isin(countries)]
+    return df.groupby(df["CustomerID"].astype(str), observed=True).agg(
+        Last=("InvoiceDate", "max"), Orders=("InvoiceNo", "nunique"), Revenue=("Revenue", "sum")
+    )
+
+
+def test_rfm_matches_pandas(rows, countries):
+    encoder = IdEncoder()
+    scores = CustomerIndex.from_frame(rows, encoder).rfm(countries)
+    scores.index = encoder.index[scores.index].astype(str)
+    expected = pandas_customers(rows, countries).reindex(scores.index)
+
+    as_of = expected["Last"].max().normalize() + pd.Timedelta(days=1)
+    np.testing.assert_array_equal(scores["Recency"], (as_of - expected["Last"]).dt.days)
+    np.testing.assert_array_equal(scores["Frequency"], expected["Orders"])
+    np.testing.assert_allclose(scores["Monetary"], expected["Revenue"])
+    np.testing.assert_array_equal(scores["F"], quintiles(expected["Orders"]))
+    assert scores[["R", "F", "M"]].isin(range(1, 6)).all().all()
+    champions = scores["Segment"] == "Champions"
+    assert ((scores["R"] >= 4) & ((scores["F"] + scores["M"]) / 2 >= 4))[champions].all()
+
+
+def test_pareto_and_segment_shares(rows):
+    view = customer_view(CustomerIndex.from_frame(rows))
+    revenue = np.sort(pandas_customers(rows)["Revenue"].to_numpy())[::-1]
+    top = int(np.ceil(0.2 * len(revenue)))
+
+    assert view.customers == len(revenue)
+    np.testing.assert_allclose(view.top20_share, revenue[:top].sum() / revenue.sum())
+    assert list(view.segments["Segment"]) == SEGMENT_NAMES
+    assert view.segments["Customers"].sum() == len(revenue)
+    np.testing.assert_allclose(view.segments["RevenueShare"].sum(), 1.0)
+    curve = view.pareto
+    np.testing.assert_allclose(curve.iloc[-1], [1.0, 1.0])
+    assert (np.diff(curve["CustomerShare"]) > 0).all() and (np.diff(curve["RevenueShare"]) >= 0).all()
+
+
+def test_pareto_of_no_revenue_is_flat():
+    assert pareto([]).to_numpy().tolist() == [[0.0, 0.0]]
@@ -0,0 +1,28 @@
+"""The engine's entry points over a live dataset."""
+
+import os
+
+import pandas as pd
+import pytest
+
+from retail import engine
+from retail.sketch import EXACT
+
+
+def test_open_dataset_keeps_deltas_under_cache_dir(export, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    _, delta_store = engine.open_dataset(export, cache_dir)
+    assert delta_store.parts_dir == os.path.join(cache_dir, "deltas")
+
+
+def test_date_window_view_matches_rows(rows, dataset):
+    first, last = pd.Timestamp("2011-06-01"), pd.Timestamp("2011-06-30")
+    expected = rows[(rows["InvoiceDate"] >= first) & (rows["InvoiceDate"] < last + pd.Timedelta(days=1))]
+    window = engine.date_window(dataset, first.date(), last.date())
+    view = engine.compute_view(window, [], EXACT)
+
+    assert window.rows == len(expected)
+    assert engine.date_range(window) == (expected["InvoiceDate"].min().date(), expected["InvoiceDate"].max().date())
+    assert view.total_revenue == pytest.approx(expected["Revenue"].sum())
+    assert view.total_orders == expected["InvoiceNo"].nunique()
+    assert window.version.startswith(dataset.version + "@")
@@ -0,0 +1,81 @@
+"""Batch forecasts against the single-series fit, and the shared forecast cache."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from retail import engine
+from retail.forecast import ForecastCache, batch_forecast, linear_forecast, series_fingerprint
+from retail.timeseries import DailyRevenue
+
+
+def assert_matches_linear_forecast(batch, monthly):
+    """Every row of ``batch`` against ``linear_forecast`` from the row's first sale on."""
+    for key, forecast in batch.iterrows():
+        row = monthly.loc[key]
+        active = np.flatnonzero(row.to_numpy())
+        single = linear_forecast(row.iloc[active[0]:])
+        assert forecast["prediction"] == pytest.approx(single.prediction, abs=1e-6), key
+        assert forecast["last_period"] == row.index[active[-1]], key
+        assert forecast["forecast_period"] == monthly.columns[-1] + 1, key
+
+
+def test_batch_forecast_matches_linear_forecast(rows):
+    monthly = DailyRevenue.from_frame(rows).monthly()
+    batch = batch_forecast(monthly)
+    assert len(batch) == len(monthly)
+    assert batch["prediction"].is_monotonic_decreasing
+    assert_matches_linear_forecast(batch, monthly)
+
+
+def test_dormant_rows_are_forecast_for_the_common_next_period():
+    months = pd.period_range("2011-01", "2011-06", freq="M")
+    monthly = pd.DataFrame(
+        [[100.0, 200, 300, 400, 500, 600], [600.0, 500, 400, 0, 0, 0], [0.0] * 6],
+        index=["current", "dormant", "never"], columns=months,
+    )
+    batch = batch_forecast(monthly)
+    assert list(batch.index) == ["current", "dormant"]
+    assert (batch["forecast_period"] == pd.Period("2011-07", "M")).all()
+    assert batch.loc["dormant", "last_period"] == pd.Period("2011-03", "M")
+    assert batch.loc["dormant", "last_value"] == 0
+    assert batch.loc["current", "prediction"] == pytest.approx(700)
+    assert_matches_linear_forecast(batch, monthly)
+
+
+def test_product_forecasts_match_linear_forecast(rows, dataset, countries):
+    batch = engine.product_forecasts(dataset, countries)
+    selected = rows[rows["Country"].isin(countries)] if countries else rows
+    monthly = selected.pivot_table(
+        "Revenue", index=selected["StockCode"].astype(str), columns=selected["InvoiceDate"].dt.to_period("M"),
+        aggfunc="sum", fill_value=0,
+    )
+    monthly = engine.fitted_months(dataset, monthly)
+    assert set(batch.index) == set(monthly.index[(monthly != 0).any(axis=1)])
+    # one fit per series is slow; the top, bottom and some dormant products suffice
+    dormant = batch[batch["last_period"] < batch["forecast_period"] - 1]
+    assert len(dormant)
+    sample = pd.concat([batch.head(20), batch.tail(20), dormant.head(20)])
+    assert_matches_linear_forecast(sample, monthly)
+
+
+def test_forecast_cache_reuses_fits(rows, tmp_path):
+    series = DailyRevenue.from_frame(rows).monthly().sum()
+    cache = ForecastCache(str(tmp_path / "forecasts.json"))
+    first = linear_forecast(series, cache)
+    second = linear_forecast(series, ForecastCache(cache.path))
+    assert second.prediction == first.prediction
+    assert (cache.misses, len(cache)) == (1, 1)
+
+
+def test_processes_share_the_forecast_cache(rows, tmp_path):
+    path = str(tmp_path / "forecasts.json")
+    monthly = DailyRevenue.from_frame(rows).monthly()
+    first, second = ForecastCache(path), ForecastCache(path)
+    linear_forecast(monthly.loc["United Kingdom"], first)
+    linear_forecast(monthly.loc["France"], second)
+
+    reopened = ForecastCache(path)
+    assert len(reopened) == 2
+    for country in ("United Kingdom", "France"):
+        assert reopened.get(series_fingerprint(monthly.loc[country])) is not None
@@ -0,0 +1,127 @@
+"""Delta files appended to a dataset, persisted, and replayed after a restart or by another process."""
+
+import os
+import time
+
+import pytest
+
+from benchmarks.synthetic import synthetic_retail
+from retail import incremental
+from retail.dataset import RetailDataset
+from retail.incremental import DeltaStore, apply_pending
+from retail.ingest import clean
+from retail.store import load_snapshot
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+
+@pytest.fixture
+def drop_dir(tmp_path):
+    directory = tmp_path / "incoming"
+    directory.mkdir()
+    return str(directory)
+
+
+def settle(path):
+    """Date ``path`` back past the drop directory's settle time."""
+    stamp = time.time() - 2 * incremental.SETTLE_SECONDS
+    os.utime(path, (stamp, stamp))
+
+
+def write_delta(drop_dir, name, seed, frame=None):
+    path = os.path.join(drop_dir, name)
+    frame = synthetic_retail(2_000, seed) if frame is None else frame
+    frame.to_csv(path, index=False, encoding="latin1")
+    settle(path)
+    return path
+
+
+def open_live(export, cache_dir):
+    snapshot = load_snapshot(export, cache_dir)
+    dataset = RetailDataset.from_snapshot(snapshot)
+    store = DeltaStore(snapshot.version, cache_dir)
+    for label, frame in store.replay():
+        dataset.append(frame, label)
+    return dataset, store
+
+
+def test_appended_deltas_replay_after_restart(export, cache_dir, drop_dir):
+    dataset, store = open_live(export, cache_dir)
+    base_rows = dataset.rows
+    write_delta(drop_dir, "2011-12-10.csv", seed=1)
+
+    assert apply_pending(dataset, store, drop_dir) == ["2011-12-10.csv"]
+    assert dataset.rows == base_rows + len(clean(synthetic_retail(2_000, 1)))
+    assert apply_pending(dataset, store, drop_dir) == []
+
+    restarted, _ = open_live(export, cache_dir)
+    assert restarted.rows == dataset.rows
+    assert restarted.version == dataset.version
+    assert restarted.cube.total("Revenue") == pytest.approx(dataset.cube.total("Revenue"))
+    assert store.applied[0]["part"] == store.applied[0]["sha256"][:16] + ".feather"
+
+
+def test_processes_share_one_manifest(export, cache_dir, drop_dir):
+    first, first_store = open_live(export, cache_dir)
+    second, second_store = open_live(export, cache_dir)
+    write_delta(drop_dir, "a.csv", seed=1)
+    assert apply_pending(first, first_store, drop_dir) == ["a.csv"]
+
+    write_delta(drop_dir, "b.csv", seed=2)
+    # the second process replays a.csv from its part and ingests only b.csv
+    assert apply_pending(second, second_store, drop_dir) == ["a.csv", "b.csv"]
+    assert apply_pending(first, first_store, drop_dir) == ["b.csv"]
+
+    assert [entry["name"] for entry in DeltaStore(first_store.base_version, cache_dir).applied] == ["a.csv", "b.csv"]
+    assert len({entry["part"] for entry in second_store.applied}) == 2
+    assert first.version == second.version
+    assert first.rows == second.rows
+
+
+def test_touched_delta_is_hashed_once(export, cache_dir, drop_dir, monkeypatch):
+    dataset, store = open_live(export, cache_dir)
+    path = write_delta(drop_dir, "a.csv", seed=1)
+    apply_pending(dataset, store, drop_dir)
+    os.rename(path, os.path.join(drop_dir, "renamed.csv"))
+
+    hashed = []
+    sha256 = incremental.file_sha256
+    monkeypatch.setattr(incremental, "file_sha256", lambda path: hashed.append(path) or sha256(path))
+    for _ in range(3):
+        assert apply_pending(dataset, store, drop_dir) == []
+    assert len(hashed) == 1
+    assert len(store.applied) == 1
+
+
+def test_bad_delta_is_recorded_and_skipped(export, cache_dir, drop_dir):
+    dataset, store = open_live(export, cache_dir)
+    write_delta(drop_dir, "a.csv", seed=1, frame=synthetic_retail(2_000, 1).drop(columns="CustomerID"))
+    write_delta(drop_dir, "b.csv", seed=2)
+
+    assert apply_pending(dataset, store, drop_dir) == ["b.csv"]
+    assert apply_pending(dataset, store, drop_dir) == []
+    failed = DeltaStore(store.base_version, cache_dir).failed
+    assert [entry["name"] for entry in failed] == ["a.csv"]
+    assert "CustomerID" in failed[0]["error"]
+
+    # a corrected file is new content and is applied
+    write_delta(drop_dir, "a.csv", seed=1)
+    assert apply_pending(dataset, store, drop_dir) == ["a.csv"]
+
+
+def test_partial_delta_waits_until_complete(export, cache_dir, drop_dir):
+    dataset, store = open_live(export, cache_dir)
+    complete = synthetic_retail(2_000, 1)
+    path = os.path.join(drop_dir, "a.csv")
+    complete.iloc[:500].to_csv(path, index=False, encoding="latin1")  # still being written
+    write_delta(drop_dir, "b.csv.part", seed=2)
+
+    assert apply_pending(dataset, store, drop_dir) == []
+    complete.to_csv(path, index=False, encoding="latin1")
+    settle(path)
+    assert apply_pending(dataset, store, drop_dir) == ["a.csv"]
+    assert dataset.deltas == ["a.csv"]
+    assert store.applied[0]["rows"] == len(clean(complete))
@@ -0,0 +1,53 @@
+"""Computed KPI trends and insight facts against pandas reductions of the rows."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from retail import engine
+from retail.forecast import linear_forecast
+from retail.insights import trend_outlook
+from retail.sketch import EXACT
+
+
+def monthly_facts(df):
+    month = df["InvoiceDate"].dt.to_period("M")
+    return df.groupby(month).agg(
+        Revenue=("Revenue", "sum"), Orders=("InvoiceNo", "nunique"), Customers=("CustomerID", "nunique")
+    )
+
+
+def test_month_over_month_and_shares(rows, dataset, countries):
+    insights = engine.compute_view(dataset, countries, EXACT).insights
+    selected = rows[rows["Country"].isin(countries)] if countries else rows
+    facts = monthly_facts(selected)
+    facts["AOV"] = facts["Revenue"] / facts["Orders"]
+
+    # the export ends in December 2011, part way through the month
+    assert (insights.previous, insights.period) == (pd.Period("2011-10", "M"), pd.Period("2011-11", "M"))
+    for metric, change in insights.changes.items():
+        expected = facts.loc["2011-11", metric] / facts.loc["2011-10", metric] - 1
+        assert change == pytest.approx(expected), metric
+    assert insights.peak_month == facts["Revenue"].idxmax()
+
+    by_country = selected.groupby("Country", observed=True)["Revenue"].sum()
+    scope = rows["Revenue"].sum() if len(by_country) == 1 else by_country.sum()
+    assert insights.top_country == by_country.idxmax()
+    assert insights.top_country_share == pytest.approx(by_country.max() / scope)
+    assert insights.share_scope == ("all countries" if len(by_country) == 1 else "selection")
+
+
+@pytest.mark.parametrize("slope, outlook", [(50.0, "growing"), (0.0, "stable"), (-50.0, "declining")])
+def test_trend_outlook_reads_the_fitted_line(slope, outlook):
+    months = pd.period_range("2011-01", "2011-06", freq="M")
+    history = pd.Series(1_000 + slope * np.arange(len(months)), index=months)
+    first_day = pd.Period("2011-01-01", "D").ordinal
+    last_day = pd.Period("2011-06-30", "D").ordinal
+    growth, fit, reading = trend_outlook(linear_forecast(history), first_day, last_day)
+
+    assert reading == outlook
+    assert growth == pytest.approx(slope / (1_000 + slope * (len(months) - 1)))
+    assert fit == (pytest.approx(1.0) if slope else None)
+    # a trailing partial month is left out of the reading
+    partial = pd.concat([history, pd.Series([1.0], index=[months[-1] + 1])])
+    assert trend_outlook(linear_forecast(partial), first_day, last_day + 3) == (growth, fit, reading)
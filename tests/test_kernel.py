@@ -0,0 +1,17 @@
+"""The fused aggregation kernel against the groupbys it replaces."""
+
+import numpy as np
+import pandas as pd
+
+from retail.cube import GRAIN, RetailCube
+from retail.kernel import fused_aggregate
+from retail.timeseries import DailyRevenue
+
+
+def test_fused_kernel_matches_groupby(rows):
+    cube, daily = RetailCube.from_frame(rows), DailyRevenue.from_frame(rows)
+    fused, fused_daily = fused_aggregate(rows)
+    expected = cube.cells.sort_values(GRAIN, ignore_index=True)
+    actual = fused.cells.sort_values(GRAIN, ignore_index=True)
+    pd.testing.assert_frame_equal(expected, actual, check_dtype=False, check_categorical=False)
+    np.testing.assert_allclose(daily.matrix, fused_daily.matrix)
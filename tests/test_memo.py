@@ -0,0 +1,33 @@
+"""The per-selection LRU memo."""
+
+import pytest
+
+from retail.memo import LRUCache
+
+
+def test_least_recently_used_key_is_evicted():
+    cache = LRUCache(maxsize=2)
+    computed = []
+
+    def compute(key):
+        return lambda: computed.append(key) or key.upper()
+
+    assert cache.get_or_compute("uk", compute("uk")) == "UK"
+    cache.get_or_compute("fr", compute("fr"))
+    assert cache.get_or_compute("uk", compute("uk")) == "UK"  # hit; fr is now the oldest
+    cache.get_or_compute("de", compute("de"))
+
+    assert "uk" in cache and "de" in cache and "fr" not in cache
+    assert computed == ["uk", "fr", "de"]
+    assert cache.stats() == {
+        "size": 2, "maxsize": 2, "hits": 1, "misses": 3, "evictions": 1, "hit_rate": 0.25,
+    }
+
+
+def test_clear_and_bounds():
+    cache = LRUCache(maxsize=1)
+    cache.get_or_compute("uk", lambda: 1)
+    cache.clear()
+    assert len(cache) == 0
+    with pytest.raises(ValueError):
+        LRUCache(maxsize=0)
@@ -0,0 +1,55 @@
+"""Country row ranges and date windows against boolean masks over the rows."""
+
+import pandas as pd
+import pytest
+
+from retail.partition import CountryIndex, partition_by_country
+
+
+@pytest.fixture(scope="module")
+def partitioned(rows):
+    return partition_by_country(rows)
+
+
+@pytest.fixture(scope="module")
+def index(partitioned):
+    return CountryIndex.from_sorted(partitioned["Country"])
+
+
+def masked(df, countries=None, start=None, stop=None):
+    mask = df["Country"].isin(countries) if countries else pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df["InvoiceDate"] >= start
+    if stop is not None:
+        mask &= df["InvoiceDate"] < stop
+    return df[mask]
+
+
+def test_select_matches_mask(partitioned, index, countries):
+    selected = index.select(partitioned, countries)
+    expected = masked(partitioned, countries)
+    pd.testing.assert_frame_equal(selected.reset_index(drop=True), expected.reset_index(drop=True))
+    assert index.rows(countries) == len(expected)
+
+
+@pytest.mark.parametrize("start, stop", [
+    ("2011-03-07", "2011-03-14"),
+    (None, "2011-01-01 12:00"),
+    ("2011-11-30", None),
+    ("2012-06-01", "2012-07-01"),
+])
+def test_date_window_matches_mask(partitioned, index, countries, start, stop):
+    start, stop = (None if bound is None else pd.Timestamp(bound) for bound in (start, stop))
+    selected = index.select(partitioned, countries, start, stop)
+    expected = masked(partitioned, countries, start, stop)
+    pd.testing.assert_frame_equal(selected.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_unknown_country_selects_nothing(partitioned, index):
+    assert index.select(partitioned, ["Atlantis"]).empty
+    assert index.rows(["Atlantis"]) == 0
+
+
+def test_unpartitioned_rows_are_rejected(rows):
+    with pytest.raises(ValueError, match="not partitioned"):
+        CountryIndex.from_sorted(rows["Country"])
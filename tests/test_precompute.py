@@ -0,0 +1,40 @@
+"""Views stored by the precompute job read back equal to freshly computed ones."""
+
+import os
+
+import pandas as pd
+import pytest
+
+from retail import engine, precompute
+from retail.sketch import MODES
+
+
+def test_stored_views_round_trip(export, dataset, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    selections = {"UK": ["United Kingdom"], "All": [], "Nowhere": ["Atlantis"]}
+    path = precompute.precompute(selections, export, cache_dir, workers=2)
+    assert path == precompute.views_path(dataset.version, cache_dir)
+    assert precompute.views_stamp(dataset.version, cache_dir) == os.stat(path).st_mtime_ns
+
+    views = precompute.load_views(dataset.version, cache_dir)
+    keys = {engine.view_key(dataset, countries, mode) for countries in ([], ["United Kingdom"]) for mode in MODES}
+    assert set(views) == keys
+    for (_, countries, mode), stored in views.items():
+        fresh = engine.compute_view(dataset, list(countries), mode)
+        assert stored.countries == fresh.countries
+        assert (stored.total_orders, stored.total_customers) == (fresh.total_orders, fresh.total_customers)
+        assert stored.total_revenue == pytest.approx(fresh.total_revenue)
+        assert stored.forecast.prediction == pytest.approx(fresh.forecast.prediction)
+        assert stored.insights == fresh.insights
+        pd.testing.assert_series_equal(stored.revenue["Monthly"], fresh.revenue["Monthly"])
+
+
+def test_missing_or_unreadable_store_is_empty(tmp_path):
+    cache_dir = str(tmp_path)
+    assert precompute.load_views("abc", cache_dir) == {}
+    assert precompute.views_stamp("abc", cache_dir) is None
+    path = precompute.views_path("abc", cache_dir)
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as fh:
+        fh.write(b"not a pickle")
+    assert precompute.load_views("abc", cache_dir) == {}
@@ -0,0 +1,51 @@
+"""Product rankings and description search against pandas scans of the rows."""
+
+import numpy as np
+import pytest
+
+from retail.products import ProductIndex, tokenize
+
+
+@pytest.fixture(scope="module")
+def index(rows):
+    return ProductIndex.from_frame(rows)
+
+
+def pandas_totals(df, countries=None, year_month=None):
+    if countries:
+        df = df[df["Country"].isin(countries)]
+    if year_month is not None:
+        df = df[df["YearMonth"] == year_month]
+    return df.groupby(df["StockCode"].astype(str))[["Revenue", "Quantity"]].sum()
+
+
+@pytest.mark.parametrize("measure", ["Revenue", "Quantity"])
+def test_top_matches_groupby(rows, index, countries, measure):
+    for year_month in (None, index.months[-2]):
+        top = index.top(countries, year_month, measure, k=10)
+        expected = pandas_totals(rows, countries, year_month)[measure].nlargest(10)
+        np.testing.assert_allclose(top[measure], expected.to_numpy())
+        if measure == "Revenue":
+            assert list(top["StockCode"]) == list(expected.index)
+
+
+def test_search_matches_description_scan(rows, index, countries):
+    results = index.search("white hea", countries, limit=10**6)
+    totals = pandas_totals(rows, countries)
+    tokens = rows.groupby(rows["StockCode"].astype(str), observed=True)["Description"].agg(
+        lambda descriptions: set().union(*map(tokenize, descriptions.unique()))
+    )
+    matching = tokens[tokens.map(lambda words: "WHITE" in words and any(w.startswith("HEA") for w in words))]
+    expected = totals.reindex(matching.index)["Revenue"]
+    expected = expected[expected.fillna(0) != 0].sort_values(ascending=False)
+
+    assert len(results)
+    assert set(results["StockCode"]) == set(expected.index)
+    assert results["Revenue"].is_monotonic_decreasing
+    assert all("WHITE" in tokenize(description) for description in results["Description"])
+
+
+def test_search_matches_stock_code_prefix(index):
+    codes = index.search("1000", limit=100)["StockCode"]
+    assert len(codes) and all(code.startswith("1000") for code in codes)
+    assert index.search("  ").empty
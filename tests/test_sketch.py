@@ -0,0 +1,21 @@
+"""Mergeable distinct counters against exact counts."""
+
+import numpy as np
+
+from retail.sketch import Bitmap, HyperLogLog, hash_values
+
+
+def test_bitmap_union_counts_distinct_ids():
+    rng = np.random.default_rng(0)
+    parts = [rng.integers(start, start + 5_000, 2_000) for start in (0, 3_000, 40_000, 41_234)]
+    bitmaps = [Bitmap.from_codes(codes) for codes in parts]
+    assert Bitmap.union(bitmaps).count() == len(np.unique(np.concatenate(parts)))
+    assert Bitmap.union([Bitmap.from_codes(np.array([], dtype=np.int64)), bitmaps[2]]).count() == bitmaps[2].count()
+
+
+def test_hyperloglog_union_within_error_bound(rows):
+    ids = rows["InvoiceNo"].astype(str)
+    halves = [HyperLogLog.from_hashes(hash_values(ids.iloc[part])) for part in np.array_split(np.arange(len(ids)), 2)]
+    union = HyperLogLog.union(halves)
+    exact = ids.nunique()
+    assert abs(union.count() - exact) <= 3 * union.error_bound * exact
@@ -0,0 +1,60 @@
+"""The snapshot, stream and SQL sources against each other."""
+
+import pandas as pd
+import pytest
+
+from retail import engine
+from retail.sketch import EXACT
+from retail.sqlstore import open_sql
+from retail.streaming import stream_aggregates
+
+
+@pytest.fixture(scope="module")
+def sources(export, tmp_path_factory):
+    cache_dir = str(tmp_path_factory.mktemp("cache"))
+    dataset, _ = engine.open_dataset(export, cache_dir)
+    return {
+        "snapshot": dataset,
+        "stream": stream_aggregates(export, chunksize=7_777),
+        "sql": open_sql(export, cache_dir),
+    }
+
+
+def test_sources_agree_on_view_totals(sources, countries):
+    views = {name: engine.compute_view(source, countries, EXACT) for name, source in sources.items()}
+    expected = views.pop("snapshot")
+    for name, view in views.items():
+        assert view.total_orders == expected.total_orders, name
+        assert view.total_customers == expected.total_customers, name
+        assert view.total_revenue == pytest.approx(expected.total_revenue), name
+        assert view.avg_items_per_order == pytest.approx(expected.avg_items_per_order), name
+        pd.testing.assert_series_equal(
+            view.revenue["Monthly"], expected.revenue["Monthly"], check_dtype=False, check_names=False
+        )
+
+
+def test_sources_agree_on_customers(sources, countries):
+    views = {name: engine.customer_view(source, countries) for name, source in sources.items()}
+    expected = views.pop("snapshot")
+    for name, view in views.items():
+        assert view.customers == expected.customers, name
+        pd.testing.assert_frame_equal(view.segments, expected.segments, check_dtype=False, obj=name)
+
+
+def test_sql_select_matches_snapshot_rows_uncached(sources, countries):
+    sql = sources["sql"]
+    sql.countries  # cached aggregate the row reads label Country with
+    misses = sql.store.cache.stats()["misses"]
+    rows = sql.select(countries)
+    assert sql.store.cache.stats()["misses"] == misses  # the rows never enter the query cache
+    expected = sources["snapshot"].select(countries)
+    assert len(rows) == len(expected)
+    assert rows["Revenue"].sum() == pytest.approx(expected["Revenue"].sum())
+    assert list(rows.columns) == list(expected.columns)
+    assert sql.select(["Atlantis"]).empty
+
+
+def test_sources_agree_on_cube_orders(rows, sources, countries):
+    selected = rows[rows["Country"].isin(countries)] if countries else rows
+    for name, source in sources.items():
+        assert source.cube.slice(countries).total("Orders") == selected["InvoiceNo"].nunique(), name
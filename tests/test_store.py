@@ -0,0 +1,72 @@
+"""When the columnar snapshot is reused and when it is rebuilt."""
+
+import os
+
+import pytest
+
+from benchmarks.synthetic import synthetic_csv
+from retail import store
+from retail.store import load_snapshot
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    return synthetic_csv(2_000, str(tmp_path))
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    """Paths hashed by the snapshot's freshness check."""
+    hashed = []
+    sha256 = store.file_sha256
+    monkeypatch.setattr(store, "file_sha256", lambda path: hashed.append(path) or sha256(path))
+    return hashed
+
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_unchanged_csv_reuses_snapshot_without_hashing(csv_path, tmp_path, hashes):
+    cache_dir = str(tmp_path / "cache")
+    assert load_snapshot(csv_path, cache_dir).rebuilt
+    del hashes[:]
+    snapshot = load_snapshot(csv_path, cache_dir)
+    assert not snapshot.rebuilt
+    assert hashes == []
+    assert not snapshot.frame["Revenue"].to_numpy().flags.writeable  # a view of the mapped file
+
+
+def test_touched_csv_is_hashed_once_and_kept(csv_path, tmp_path, hashes):
+    cache_dir = str(tmp_path / "cache")
+    version = load_snapshot(csv_path, cache_dir).version
+    bump_mtime(csv_path)
+    del hashes[:]
+    touched = load_snapshot(csv_path, cache_dir)
+    assert not touched.rebuilt and touched.version == version
+    assert not load_snapshot(csv_path, cache_dir).rebuilt
+    assert hashes == [csv_path]
+
+
+@pytest.mark.parametrize("edit", ["append", "same size"])
+def test_changed_csv_rebuilds_snapshot(csv_path, tmp_path, edit):
+    cache_dir = str(tmp_path / "cache")
+    before = load_snapshot(csv_path, cache_dir)
+    with open(csv_path, "r+b") as fh:
+        data = fh.read()
+        if edit == "append":
+            fh.write(data.splitlines(keepends=True)[-1])
+        else:
+            # same size and line count: one quantity digit changes
+            fh.seek(data.rindex(b",1,") + 1)
+            fh.write(b"2")
+    bump_mtime(csv_path)
+
+    after = load_snapshot(csv_path, cache_dir)
+    assert after.rebuilt and after.version != before.version
+    assert after.fingerprint["size"] == os.path.getsize(csv_path)
+    if edit == "append":
+        assert len(after.frame) == len(before.frame) + 1
+    else:
+        assert after.frame["Quantity"].sum() == before.frame["Quantity"].sum() + 1